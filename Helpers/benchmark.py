@@ -0,0 +1,517 @@
+"""
+Benchmarks für den eBKP-H Classifier (ohne API-Calls)
+
+Usage:
+    python Helpers/benchmark.py extraction --rows 100000
+    python Helpers/benchmark.py memory --rows 2000000 --chunksize 100000
+    python Helpers/benchmark.py local --labels projekt_klassifiziert.csv
+    python Helpers/benchmark.py fewshot --labels projekt_klassifiziert.csv [--api]
+    python Helpers/benchmark.py importtime [--max-ms 200]
+    python Helpers/benchmark.py auswertung --rows 200000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import subprocess
+import statistics
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from eBKP_H_Classifier import eBKPHClassifier, extract_elements, EXAMPLE_MIN_CONF, FEW_SHOT_TOKENS
+from ebkp_cache import ClassificationCache, element_signature
+from ebkp_catalog import load_catalog
+from ebkp_aggregation import AggregationCube, EBKP_HAUPTGRUPPEN, frame_fingerprint
+from ebkp_corrections import CorrectionStore
+from few_shot import signature_element
+from local_classifier import LocalClassifier, element_text, evaluate
+
+DEFAULT_MAPPING = {
+    'kategorie': 'Kategorie',
+    'typ': 'Typ',
+    'familie': 'Familie',
+    'zusatzinfo': 'Zusatzinfo'
+}
+
+# Abhängigkeiten, die beim Import des Classifiers nicht geladen werden sollen
+HEAVY_MODULES = ('pandas', 'anthropic', 'dotenv', 'tqdm')
+
+# Vokabular für synthetische Revit-Exporte
+_KATEGORIEN = ['Waende', 'Tueren', 'Fenster', 'Decken', 'Leuchten', 'Rohre', 'Luftkanaele', 'Stuetzen']
+_FAMILIEN = ['Basic Wall', 'M_Single-Flush', 'M_Fixed', 'Floor', 'Downlight', 'Pipe Types', None]
+_ZUSATZ = ['EG', 'OG1', 'OG2', 'UG', '', None, 'nan']
+
+
+def synthetic_export(rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Erzeugt einen synthetischen Revit-Export mit typischen Lücken (NaN, 'nan', Whitespace).
+
+    Args:
+        rows: Anzahl Zeilen
+        seed: Zufalls-Seed (reproduzierbar)
+
+    Returns:
+        DataFrame mit Kategorie, Typ, Familie, Zusatzinfo, Menge
+    """
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        'Kategorie': [rng.choice(_KATEGORIEN) for _ in range(rows)],
+        'Typ': [f" Typ {rng.randint(1, 60)} " for _ in range(rows)],
+        'Familie': [rng.choice(_FAMILIEN) for _ in range(rows)],
+        'Zusatzinfo': [rng.choice(_ZUSATZ) for _ in range(rows)],
+        'Menge': [rng.random() * 100 for _ in range(rows)],
+    })
+
+
+def write_synthetic_csv(path: str, rows: int, block: int = 200_000):
+    """Schreibt einen synthetischen Export blockweise (wie ein Revit-Export: ';', utf-8-sig)"""
+    for start in range(0, rows, block):
+        frame = synthetic_export(min(block, rows - start), seed=start)
+        frame.to_csv(path, sep=';', index=False, encoding='utf-8-sig',
+                     mode='w' if start == 0 else 'a', header=start == 0)
+
+
+class OfflineClassifier(eBKPHClassifier):
+    """
+    Classifier ohne API-Calls: jedes Element bekommt einen Code aus seiner Kategorie.
+    Misst nur Einlesen, Deduplizierung, Zusammenführen und Schreiben.
+    """
+
+    def __init__(self):
+        super().__init__(api_key='offline', use_cache=False)
+
+    def _request_batch(self, elements, debug=False, log_file=None, stream=False, on_element=None, stage=None):
+        return [
+            {'code': f"X{len(elem['kategorie']):02d}", 'desc': elem['kategorie'], 'conf': 0.9}
+            for elem in elements
+        ]
+
+
+def _peak_memory_mb() -> float:
+    """
+    Maximaler Speicherverbrauch dieses Prozesses in MB: RSS (Linux/macOS),
+    unter Windows die Python-Allokationen via tracemalloc (muss laufen).
+    """
+    try:
+        import resource
+    except ImportError:
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: Bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def legacy_extract(df: pd.DataFrame, column_mapping: dict) -> list:
+    """Bisherige Extraktion aus classify_csv (iterrows + safe_str pro Zelle) als Referenz"""
+    elements = []
+    for _, row in df.iterrows():
+        def safe_str(val):
+            if pd.isna(val) or val is None or str(val).lower() == 'nan':
+                return ''
+            return str(val).strip()
+
+        elements.append({
+            'kategorie': safe_str(row.get(column_mapping['kategorie'], '')),
+            'typ': safe_str(row.get(column_mapping['typ'], '')),
+            'familie': safe_str(row.get(column_mapping['familie'], '')),
+            'zusatzinfo': safe_str(row.get(column_mapping['zusatzinfo'], ''))
+        })
+    return elements
+
+
+def _timed(func, *args, repeat: int = 3):
+    """Bestes Ergebnis aus 'repeat' Läufen (Sekunden, Rückgabewert)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_extraction(rows: int, repeat: int):
+    """Vergleicht iterrows/safe_str mit extract_elements"""
+    df = synthetic_export(rows)
+    print(f"=== Element-Extraktion ({rows:,} Zeilen, best of {repeat}) ===")
+
+    legacy_time, legacy = _timed(legacy_extract, df, DEFAULT_MAPPING, repeat=repeat)
+    vector_time, vector = _timed(extract_elements, df, DEFAULT_MAPPING, repeat=repeat)
+
+    if legacy != vector:
+        mismatches = sum(a != b for a, b in zip(legacy, vector))
+        print(f"⚠ Ergebnisse unterscheiden sich in {mismatches} Zeilen")
+    else:
+        print(f"✓ Ergebnisse identisch")
+
+    print(f"  - iterrows/safe_str: {legacy_time:.3f}s ({rows / legacy_time:,.0f} Zeilen/s)")
+    print(f"  - extract_elements:  {vector_time:.3f}s ({rows / vector_time:,.0f} Zeilen/s)")
+    print(f"  - Speedup: {legacy_time / vector_time:.1f}x")
+
+
+def memory_run(csv_path: str, chunksize: int):
+    """Kind-Prozess: klassifiziert die CSV offline und meldet Peak-RSS und Laufzeit als JSON"""
+    output = os.path.splitext(csv_path)[0] + f'_out_{chunksize or "full"}.csv'
+    classifier = OfflineClassifier()
+
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        import tracemalloc
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            classifier.classify_csv(csv_path, output_csv=output, show_progress=False,
+                                    chunksize=chunksize or None,
+                                    checkpoint_file=output + '.checkpoint.jsonl')
+        finally:
+            sys.stdout = stdout
+
+    print(json.dumps({
+        'seconds': time.perf_counter() - start,
+        'peak_mb': _peak_memory_mb(),
+        'rows': classifier.stats['rows'],
+    }))
+
+
+def bench_memory(rows: int, chunksize: int):
+    """Vergleicht Peak-Speicher von ganzer CSV vs. Chunk-Modus (je ein eigener Prozess)"""
+    print(f"=== Speicher classify_csv ({rows:,} Zeilen, Chunk-Größe {chunksize:,}) ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'synthetic_export.csv')
+        write_synthetic_csv(csv_path, rows)
+        print(f"✓ Synthetischer Export: {os.path.getsize(csv_path) / 1e6:,.0f} MB")
+
+        for label, size in (('ganze CSV', 0), ('Chunk-Modus', chunksize)):
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), 'memory-run', csv_path, str(size)],
+                capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                print(f"⚠ {label} fehlgeschlagen:\n{completed.stderr[-2000:]}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"  - {label:<12} Peak {result['peak_mb']:,.0f} MB, {result['seconds']:.1f}s "
+                  f"({result['rows']:,} Zeilen)")
+
+
+def _importtime(statement: str) -> dict:
+    """
+    Führt 'statement' in einem frischen Prozess mit python -X importtime aus.
+
+    Returns:
+        Dict Modulname → kumulierte Importzeit in ms (alle geladenen Module)
+    """
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        capture_output=True, text=True, cwd=repo_dir
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr[-2000:])
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative) / 1000
+    return modules
+
+
+def bench_importtime(repeat: int, max_ms: float = None) -> bool:
+    """
+    Misst den Import des Classifiers (wie die Streamlit-Seiten) und den Kaltstart
+    der CLI, jeweils in frischen Prozessen (Median über 'repeat' Läufe).
+
+    Returns:
+        False, wenn der Import-Median über max_ms liegt oder schwere Module lädt
+    """
+    print(f"=== Importzeit eBKP_H_Classifier ({repeat} Läufe) ===")
+
+    module = 'Helpers.eBKP_H_Classifier'
+    statement = f'import {module}'
+    runs = [_importtime(statement) for _ in range(repeat)]
+    import_ms = statistics.median(run[module] for run in runs)
+    heavy = sorted({name.split('.')[0] for run in runs for name in run} & set(HEAVY_MODULES))
+
+    cli_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eBKP_H_Classifier.py'), '--help'],
+            capture_output=True, check=True
+        )
+        cli_seconds.append(time.perf_counter() - start)
+
+    print(f"  - Modul-Import ({statement}): {import_ms:,.0f} ms")
+    print(f"  - CLI Kaltstart (--help): {statistics.median(cli_seconds) * 1000:,.0f} ms")
+    print(f"  - Schwere Module beim Import: {', '.join(heavy) if heavy else 'keine'}")
+
+    ok = not heavy
+    if max_ms is not None and import_ms > max_ms:
+        print(f"⚠ Modul-Import {import_ms:,.0f} ms über dem Limit von {max_ms:,.0f} ms")
+        ok = False
+    if heavy:
+        print(f"⚠ Beim Import geladen: {', '.join(heavy)} (sollten erst bei Bedarf geladen werden)")
+    return ok
+
+
+def _labelled_elements(labels_csv: str = None, cache_path: str = None) -> dict:
+    """
+    Gelabelte Elemente (Signatur → Code): aus einem klassifizierten CSV
+    (Spalte 'eBKP_Code') oder aus allen Einträgen des Klassifizierungs-Caches
+    plus manuellen Korrekturen (Korrekturen haben Vorrang).
+    """
+    labelled = {}
+    if labels_csv:
+        df = pd.read_csv(labels_csv, sep=';', encoding='utf-8-sig')
+        conf = df['eBKP_Confidence'] if 'eBKP_Confidence' in df else pd.Series(1.0, index=df.index)
+        keep = conf >= EXAMPLE_MIN_CONF
+        elements = extract_elements(df[keep], DEFAULT_MAPPING)
+        for element, code in zip(elements, df.loc[keep, 'eBKP_Code']):
+            labelled.setdefault(element_signature(element), str(code))
+        return labelled
+
+    cache = ClassificationCache(cache_path)
+    for signature, result in cache.items(all_contexts=True):
+        if result.get('conf', 0.0) >= EXAMPLE_MIN_CONF:
+            labelled.setdefault(signature, result['code'])
+    cache.close()
+
+    corrections = CorrectionStore()
+    for signature, result in corrections.items():
+        labelled[signature] = result['code']
+    corrections.close()
+    return labelled
+
+
+def _split(labelled: dict, holdout: float):
+    """Deterministischer Split nach Signatur-Hash in (Beispiele, Held-out)"""
+    train, test = [], []
+    for signature, code in labelled.items():
+        bucket = int(hashlib.sha256(signature.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+        (test if bucket < holdout else train).append((signature, code))
+    return train, test
+
+
+def bench_local(labels_csv: str, cache_path: str, holdout: float):
+    """Hit-Rate und Übereinstimmung des lokalen Classifiers mit der API (Held-out-Set)"""
+    catalog = load_catalog()
+    labelled = {sig: code for sig, code in _labelled_elements(labels_csv, cache_path).items()
+                if code in catalog}
+    if not labelled:
+        print("⚠ Keine gelabelten Elemente gefunden (Cache leer bzw. --labels angeben)")
+        return
+
+    train, test = _split(labelled, holdout)
+
+    print(f"=== Lokaler Classifier ({len(train):,} Beispiele, {len(test):,} Held-out) ===")
+    start = time.perf_counter()
+    local = LocalClassifier(catalog, train)
+    print(f"✓ Index: {len(local.labels):,} Dokumente in {time.perf_counter() - start:.2f}s")
+
+    elements = [signature_element(signature) for signature, _ in test]
+    start = time.perf_counter()
+    report = evaluate(local, elements, [code for _, code in test])
+    elapsed = time.perf_counter() - start
+    print(f"✓ {len(elements):,} Vorhersagen in {elapsed:.2f}s "
+          f"({len(elements) / max(elapsed, 1e-9):,.0f} Elemente/s)")
+
+    for row in report:
+        print(f"  - Schwellenwert {row['threshold']:.0%}: Hit-Rate {row['hit_rate']:.1%} "
+              f"({row['hits']:,}), Übereinstimmung mit API {row['agreement']:.1%}")
+
+
+def bench_fewshot(labels_csv: str, cache_path: str, holdout: float, k: int, tokens: int,
+                  batch_size: int, use_api: bool):
+    """
+    Few-Shot Beispiele im Batch-Prompt: Prompt-Tokens pro Element und Treffer der
+    Beispiele (offline) bzw. Genauigkeit, Tokens und Nachfragen pro Element (--api).
+    """
+    catalog = load_catalog()
+    labelled = {sig: code for sig, code in _labelled_elements(labels_csv, cache_path).items()
+                if code in catalog}
+    if not labelled:
+        print("⚠ Keine gelabelten Elemente gefunden (Cache leer bzw. --labels angeben)")
+        return
+
+    train, test = _split(labelled, holdout)
+    elements = [signature_element(signature) for signature, _ in test]
+    labels = [code for _, code in test]
+    print(f"=== Few-Shot (k={k}, Budget {tokens} Tokens, {len(train):,} Beispiele, "
+          f"{len(test):,} Held-out) ===")
+
+    def make_classifier(few_shot_k: int, api_key: str = None) -> eBKPHClassifier:
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                return eBKPHClassifier(api_key=api_key, use_cache=False, use_corrections=False,
+                                       few_shot_k=few_shot_k, few_shot_tokens=tokens, examples=train)
+            finally:
+                sys.stdout = stdout
+
+    if not use_api:
+        # Offline: Prompt-Grösse und ob das ähnlichste Beispiel den richtigen Code trägt
+        for few_shot_k in (0, k):
+            classifier = make_classifier(few_shot_k, api_key='offline')
+            prompt_tokens = sum(
+                classifier._estimate_tokens(classifier._build_batch_prompt(elements[start:start + batch_size]))
+                for start in range(0, len(elements), batch_size)
+            )
+            print(f"  - k={few_shot_k}: Ø {prompt_tokens / len(elements):.1f} Prompt-Tokens/Element "
+                  f"({classifier.stats['few_shot_examples']:,} Beispiele)")
+
+        retriever = make_classifier(k, api_key='offline')._few_shot_retriever()
+        top = [retriever.index.search(element_text(elem), 1) for elem in elements]
+        agree = sum(bool(hit) and retriever.index.labels[hit[0][1]] == label for hit, label in zip(top, labels))
+        print(f"  - Ähnlichstes Beispiel hat den richtigen Code: {agree / len(elements):.1%}")
+        print("Hinweis: Genauigkeit und Nachfragen mit --api messen (echte API-Calls)")
+        return
+
+    for few_shot_k in (0, k):
+        classifier = make_classifier(few_shot_k)
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                results = classifier.classify_elements(elements, batch_size=batch_size)
+            finally:
+                sys.stdout = stdout
+
+        stats = classifier.stats
+        correct = sum(result['code'] == label for result, label in zip(results, labels))
+        print(f"  - k={few_shot_k}: Genauigkeit {correct / len(elements):.1%}, "
+              f"Ø {stats['input_tokens'] / len(elements):.1f} Input- / "
+              f"{stats['output_tokens'] / len(elements):.1f} Output-Tokens/Element, "
+              f"{stats['reasked_elements'] / len(elements):.3f} Nachfragen/Element, "
+              f"{stats['invalid_codes']} ungültige Codes, {stats['api_calls']} API-Calls")
+
+
+def legacy_auswertung(df: pd.DataFrame) -> dict:
+    """Bisherige Berechnung der Auswertungs-Seite pro Rerun (apply, value_counts, groupby pro Gruppe) als Referenz"""
+    def hauptgruppe(code):
+        if pd.isna(code) or not code:
+            return 'Unbekannt'
+        text = str(code).strip()
+        return text[0].upper() if text and text[0].upper() in EBKP_HAUPTGRUPPEN else 'Unbekannt'
+
+    def untergruppe(code):
+        if pd.isna(code) or not code:
+            return 'Unbekannt'
+        text = str(code).strip()
+        return text.split('.')[0] if '.' in text else text[:2]
+
+    df = df.copy()
+    df['BKP_Hauptgruppe'] = df['BKP_Code'].apply(hauptgruppe)
+    df['BKP_Untergruppe'] = df['BKP_Code'].apply(untergruppe)
+    df['BKP_Hauptgruppe'].value_counts()
+    df.groupby('BKP_Hauptgruppe')['Kosten'].sum()
+
+    codes = {}
+    for hg in sorted(df['BKP_Hauptgruppe'].unique()):
+        hg_df = df[df['BKP_Hauptgruppe'] == hg].copy()
+        for ug, ug_df in hg_df.groupby('BKP_Untergruppe'):
+            for (code, _), code_df in ug_df.groupby(['BKP_Code', 'BKP_Beschreibung']):
+                codes[(hg, ug, code)] = codes.get((hg, ug, code), 0) + len(code_df)
+    return codes
+
+
+def bench_auswertung(rows: int, repeat: int):
+    """Vergleicht die bisherige Berechnung pro Rerun mit Würfel-Aufbau und Cache-Treffer (Fingerprint)"""
+    rng = random.Random(42)
+    catalog = load_catalog()
+    all_codes = catalog.level_codes(2) + catalog.level_codes(3)[:200] + ['ERROR', 'UNKNOWN']
+    df = synthetic_export(rows)
+    df['BKP_Code'] = [rng.choice(all_codes) for _ in range(rows)]
+    df['BKP_Beschreibung'] = df['BKP_Code'].map(catalog.description)
+    df['Kosten'] = [rng.random() * 5000 for _ in range(rows)]
+    print(f"=== Auswertung ({rows:,} Zeilen, {len(all_codes)} Codes, best of {repeat}) ===")
+
+    legacy_time, legacy = _timed(legacy_auswertung, df, repeat=repeat)
+    build_time, cube = _timed(AggregationCube.build, df, repeat=repeat)
+    hash_time, _ = _timed(frame_fingerprint, df, repeat=repeat)
+
+    counts = {
+        (r['BKP_Hauptgruppe'], r['BKP_Untergruppe'], r['BKP_Code']): r['Anzahl']
+        for r in cube.cube.to_dict('records')
+    }
+    print("✓ Ergebnisse identisch" if counts == legacy else "⚠ Ergebnisse unterscheiden sich")
+
+    print(f"  - apply/groupby pro Rerun:  {legacy_time * 1000:.0f} ms")
+    print(f"  - Würfel aufbauen (1x):     {build_time * 1000:.0f} ms")
+    print(f"  - Rerun (Fingerprint, Cache-Treffer): {hash_time * 1000:.0f} ms")
+    print(f"  - Speedup Rerun: {legacy_time / hash_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks für den eBKP-H Classifier')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    extraction = subparsers.add_parser('extraction', help='iterrows vs. vektorisierte Extraktion')
+    extraction.add_argument('--rows', type=int, default=100_000, help='Anzahl Zeilen (default: 100000)')
+    extraction.add_argument('--repeat', type=int, default=3, help='Wiederholungen (default: 3)')
+
+    memory = subparsers.add_parser('memory', help='Peak-Speicher ganze CSV vs. Chunk-Modus')
+    memory.add_argument('--rows', type=int, default=2_000_000, help='Anzahl Zeilen (default: 2000000)')
+    memory.add_argument('--chunksize', type=int, default=100_000, help='Chunk-Größe (default: 100000)')
+
+    local = subparsers.add_parser('local', help='Hit-Rate/Übereinstimmung lokaler Classifier vs. API')
+    local.add_argument('--labels', help='Klassifiziertes CSV (default: Einträge aus dem Cache)')
+    local.add_argument('--cache-path', help='Pfad zur Cache-Datei (default: Cache/ebkp_classification_cache.sqlite)')
+    local.add_argument('--holdout', type=float, default=0.2, help='Anteil Held-out (default: 0.2)')
+
+    fewshot = subparsers.add_parser('fewshot', help='Few-Shot Beispiele: Tokens und Genauigkeit pro Element')
+    fewshot.add_argument('--labels', help='Klassifiziertes CSV (default: Cache + Korrekturen)')
+    fewshot.add_argument('--cache-path', help='Pfad zur Cache-Datei (default: Cache/ebkp_classification_cache.sqlite)')
+    fewshot.add_argument('--holdout', type=float, default=0.2, help='Anteil Held-out (default: 0.2)')
+    fewshot.add_argument('-k', type=int, default=3, help='Beispiele pro Element (default: 3)')
+    fewshot.add_argument('--tokens', type=int, default=FEW_SHOT_TOKENS,
+                         help=f'Token-Budget pro Batch (default: {FEW_SHOT_TOKENS})')
+    fewshot.add_argument('-b', '--batch-size', type=int, default=30, help='Batch-Größe (default: 30)')
+    fewshot.add_argument('--api', action='store_true',
+                         help='Held-out-Set über die API klassifizieren (kostet Tokens)')
+
+    importtime = subparsers.add_parser('importtime', help='Importzeit (python -X importtime) und CLI Kaltstart')
+    importtime.add_argument('--repeat', type=int, default=5, help='Läufe pro Messung (default: 5)')
+    importtime.add_argument('--max-ms', type=float,
+                            help='Exit-Code 1, wenn der Modul-Import länger dauert (für CI)')
+
+    auswertung = subparsers.add_parser('auswertung', help='Auswertung: apply/groupby pro Rerun vs. Aggregations-Würfel')
+    auswertung.add_argument('--rows', type=int, default=200_000, help='Anzahl Zeilen (default: 200000)')
+    auswertung.add_argument('--repeat', type=int, default=3, help='Wiederholungen (default: 3)')
+
+    # Intern: ein einzelner Messlauf in eigenem Prozess
+    memory_child = subparsers.add_parser('memory-run')
+    memory_child.add_argument('csv_path')
+    memory_child.add_argument('chunksize', type=int)
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'extraction':
+        bench_extraction(args.rows, args.repeat)
+    elif args.benchmark == 'memory':
+        bench_memory(args.rows, args.chunksize)
+    elif args.benchmark == 'local':
+        bench_local(args.labels, args.cache_path, args.holdout)
+    elif args.benchmark == 'fewshot':
+        bench_fewshot(args.labels, args.cache_path, args.holdout, args.k, args.tokens,
+                      args.batch_size, args.api)
+    elif args.benchmark == 'importtime':
+        if not bench_importtime(args.repeat, args.max_ms):
+            sys.exit(1)
+    elif args.benchmark == 'auswertung':
+        bench_auswertung(args.rows, args.repeat)
+    elif args.benchmark == 'memory-run':
+        memory_run(args.csv_path, args.chunksize)
@@ -6,24 +6,203 @@ Optimiert für:
 - Kosteneffizienz: Batch-Verarbeitung + Prompt Caching
 - Flexibilität: CLI + Streamlit Integration
 - Wartbarkeit: Dynamischer Katalog aus CSV
+- Schneller Import: pandas, anthropic, dotenv und tqdm werden erst bei Bedarf geladen
+  (Streamlit-Seiten importieren das Modul bei jedem Rerun)
 """
 
 import os
+import copy
 import json
-import pandas as pd
-from typing import Dict, List
-from dotenv import load_dotenv
-from anthropic import Anthropic
+import time
+import hashlib
+import threading
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 try:
-    from tqdm import tqdm
-    TQDM_AVAILABLE = True
+    from .ebkp_cache import ClassificationCache, element_signature, context_hash, SIGNATURE_FIELDS
+    from .rate_limiter import RequestScheduler
+    from .json_stream import JsonObjectStream
+    from .ebkp_checkpoint import ClassificationCheckpoint
+    from .ebkp_catalog import load_catalog
+    from .local_classifier import LocalClassifier
+    from .ebkp_corrections import CorrectionStore
+    from .few_shot import FewShotRetriever, signature_element
+    from .progress import Throttle, UPDATES_PER_SECOND, rates, total_tokens, format_duration
 except ImportError:
-    TQDM_AVAILABLE = False
-    print("Hinweis: 'tqdm' nicht installiert. Progress-Bar nicht verfügbar.")
+    from ebkp_cache import ClassificationCache, element_signature, context_hash, SIGNATURE_FIELDS
+    from rate_limiter import RequestScheduler
+    from json_stream import JsonObjectStream
+    from ebkp_checkpoint import ClassificationCheckpoint
+    from ebkp_catalog import load_catalog
+    from local_classifier import LocalClassifier
+    from ebkp_corrections import CorrectionStore
+    from few_shot import FewShotRetriever, signature_element
+    from progress import Throttle, UPDATES_PER_SECOND, rates, total_tokens, format_duration
+
+# Kosteneffizientes Modell
+MODEL = "claude-3-5-haiku-20241022"
+
+# Geteilter HTTP-Client: Verbindungen so lange offen halten (TLS-Handshake nur einmal)
+KEEPALIVE_SECONDS = 60.0
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Minimale Länge eines cachebaren Prompt-Prefix (Haiku: 2048, Sonnet/Opus: 1024 Tokens)
+MIN_CACHEABLE_TOKENS = 2048
+
+# Maximale Anzahl Nachfragen für fehlende/unlesbare Elemente eines Batches
+MAX_REASKS = 2
+
+# Adaptive Batch-Grösse: Budgets pro Request
+MAX_OUTPUT_TOKENS = 4096        # Obergrenze für max_tokens pro Batch
+MAX_BATCH_INPUT_TOKENS = 8000   # Obergrenze für Element-Zeilen pro Batch
+MAX_ADAPTIVE_BATCH_SIZE = 100   # Obergrenze Elemente pro Batch
+OUTPUT_SAFETY_FACTOR = 1.3      # Reserve auf die gemessenen Output-Tokens pro Element
+
+# Bestätigte Beispiele (lokaler Index, Few-Shot): Korrekturen + sichere Cache-Einträge
+EXAMPLE_MIN_CONF = 0.8
+
+# Few-Shot: Token-Budget für die Beispielzeilen pro Batch
+FEW_SHOT_TOKENS = 300
+
+# Hierarchischer Modus: Hauptgruppe lokal bestimmen ab dieser Confidence (sonst Level-1 Prompt)
+GROUP_THRESHOLD = 0.6
+
+_env_loaded = False
+
+
+def load_env():
+    """Lädt die .env Datei (einmal, erst bei Bedarf statt beim Import)"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(api_key: str, base_url: str = None):
+    """
+    Anthropic Client pro (API-Key, Endpunkt), im ganzen Prozess geteilt.
+
+    Alle Classifier desselben Keys (auch über Streamlit-Reruns und Benutzer hinweg)
+    verwenden denselben Connection-Pool mit Keep-Alive. Retries übernimmt der
+    RequestScheduler (max_retries=0), damit er Throttling sieht.
 
-# .env Datei laden
-load_dotenv()
+    Args:
+        api_key: Anthropic API Key
+        base_url: Alternativer API-Endpunkt (optional)
+
+    Returns:
+        anthropic.Anthropic
+    """
+    key = (api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            from anthropic import Anthropic, DefaultHttpxClient, DEFAULT_CONNECTION_LIMITS
+
+            # Limits-Klasse des HTTP-Pakets, das anthropic verwendet
+            limits = type(DEFAULT_CONNECTION_LIMITS)(
+                max_connections=DEFAULT_CONNECTION_LIMITS.max_connections,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_SECONDS
+            )
+            _clients[key] = Anthropic(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                http_client=DefaultHttpxClient(limits=limits)
+            )
+        return _clients[key]
+
+
+def _progress_bar(total: int):
+    """tqdm Progress-Bar oder None (tqdm nicht installiert)"""
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        print("Hinweis: 'tqdm' nicht installiert. Progress-Bar nicht verfügbar.")
+        return None
+    return tqdm(total=total, desc="Klassifizierung", unit="elem", mininterval=1.0 / UPDATES_PER_SECOND)
+
+
+def detect_csv_encoding(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Bestimmt das Encoding eines Revit-Exports: 'utf-8-sig', sonst 'latin1'.
+    Liest die Datei blockweise (konstanter Speicherbedarf, auch für grosse Exporte).
+    """
+    import codecs
+
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                decoder.decode(block, final=not block)
+                if not block:
+                    return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'latin1'
+
+
+def _integral_as_int(values: 'pd.Series') -> 'pd.Series':
+    """Float-Spalte (Zahlen mit Lücken) → ganzzahlige Werte als Integer-Text, sonst unverändert"""
+    import pandas as pd
+
+    if not pd.api.types.is_float_dtype(values):
+        return values
+    integral = values.notna() & (values % 1 == 0) & (values.abs() < 2 ** 53)
+    if not integral.any():
+        return values
+    values = values.astype(object)
+    values[integral] = values[integral].astype('int64').astype(str)
+    return values
+
+
+def extract_elements(df: 'pd.DataFrame', column_mapping: Dict[str, str]) -> List[Dict]:
+    """
+    Extrahiert die Element-Infos aus einem DataFrame (vektorisiert, ohne iterrows).
+
+    Jede gemappte Spalte wird in einem Durchgang bereinigt: NaN → '', als String,
+    Whitespace entfernt, 'nan' Texte → ''. Ganzzahlige Werte in Zahlen-Spalten
+    werden ohne '.0' geschrieben (223.0 → '223'), damit die Signatur nicht davon
+    abhängt, ob die CSV als Text (classify_csv) oder mit Typ-Erkennung (Upload)
+    gelesen wurde. Fehlende oder nicht gemappte Spalten ergeben leere Werte.
+
+    Args:
+        df: Input DataFrame (z.B. Revit Export)
+        column_mapping: Feld → Spaltenname, z.B. {'kategorie': 'Kategorie', 'typ': 'Typ'}
+
+    Returns:
+        Liste von Dicts mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
+    """
+    columns = []
+    for field in SIGNATURE_FIELDS:
+        column = column_mapping.get(field)
+        if column and column in df.columns:
+            values = _integral_as_int(df[column]).fillna('').astype(str).str.strip()
+            values = values.mask(values.str.lower() == 'nan', '')
+            columns.append(values.tolist())
+        else:
+            columns.append([''] * len(df))
+
+    return [dict(zip(SIGNATURE_FIELDS, row)) for row in zip(*columns)]
+
+
+class PromptStage(NamedTuple):
+    """System Prompt und Antwortformat eines Klassifizierungs-Schritts"""
+    system_prompt: str
+    level: int          # Level der zurückgegebenen Codes
+    prefix: str = ''    # Codes müssen mit diesem Prefix beginnen (Hauptgruppe im Schritt 2)
+    label: str = 'Level 1+2'
+    example: str = '[{"id":1,"code":"C02","desc":"Wandkonstruktion","conf":0.95},{"id":2,"code":"F03","desc":"Innentüren","conf":0.90}]'
 
 
 class eBKPHClassifier:
@@ -32,15 +211,55 @@ class eBKPHClassifier:
     Optimiert für minimalen Token-Verbrauch durch Batch-Verarbeitung und Prompt Caching.
     """
 
-    def __init__(self, ebkp_csv_path: str = None, api_key: str = None):
+    def __init__(
+        self,
+        ebkp_csv_path: str = None,
+        api_key: str = None,
+        use_cache: bool = True,
+        cache_path: str = None,
+        base_url: str = None,
+        scheduler: RequestScheduler = None,
+        local_threshold: float = None,
+        use_corrections: bool = True,
+        corrections_path: str = None,
+        few_shot_k: int = 0,
+        few_shot_tokens: int = FEW_SHOT_TOKENS,
+        examples: List[Tuple[str, str]] = None,
+        target_level: int = 2,
+        hierarchical: bool = False,
+        group_threshold: Optional[float] = GROUP_THRESHOLD,
+        model: str = MODEL,
+        client=None
+    ):
         """
         Initialisiert den Classifier mit eBKP-H Katalog (Level 1+2).
 
         Args:
             ebkp_csv_path: Pfad zur eBKP-H CSV (default: Helpers/eBKP-H.csv)
             api_key: Anthropic API Key (optional, sonst aus .env)
+            use_cache: Persistenten Klassifizierungs-Cache verwenden
+            cache_path: Pfad zur Cache-Datei (default: Cache/ebkp_classification_cache.sqlite)
+            base_url: Alternativer API-Endpunkt (z.B. lokaler Test-Server, optional)
+            scheduler: RequestScheduler für Rate-Limits/Retries (default: Limits aus API-Headern)
+            local_threshold: Elemente mit lokaler Confidence ab diesem Wert ohne API-Call
+                             beantworten (None = aus, siehe local_classifier.py)
+            use_corrections: Manuelle Korrekturen (Seite "BKP Bearbeiten") vor Cache und API anwenden
+            corrections_path: Pfad zum Korrektur-Speicher (default: Cache/ebkp_corrections.sqlite)
+            few_shot_k: Ähnlichste bestätigte Beispiele pro Element im Batch-Prompt (0 = aus)
+            few_shot_tokens: Token-Budget für alle Beispiele eines Batches
+            examples: Bestätigte Beispiele als (Signatur, Code) für Few-Shot und lokalen
+                      Index (default: Korrekturen + sichere Cache-Einträge)
+            target_level: Level der zurückgegebenen Codes (> 2 nur hierarchisch)
+            hierarchical: Zwei Schritte: Hauptgruppe (Level 1), dann nur deren Teilbaum
+                          bis target_level (kleinere Prompts, tiefere Codes)
+            group_threshold: Hauptgruppe lokal bestimmen ab dieser Confidence
+                             (None = immer über den Level-1 Prompt)
+            model: Claude Modell (default: MODEL)
+            client: Anthropic Client (default: shared_client für API-Key und base_url)
         """
         # API Key
+        if not api_key:
+            load_env()
         self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
         if not self.api_key:
             raise ValueError(
@@ -48,47 +267,328 @@ class eBKPHClassifier:
                 "Bitte in .env setzen oder als Parameter übergeben."
             )
 
-        # Anthropic Client
-        self.client = Anthropic(api_key=self.api_key)
-        self.model = "claude-3-5-haiku-20241022"  # Kosteneffizientes Modell
+        # Anthropic Client (Retries übernimmt der Scheduler, damit er Throttling sieht)
+        self.client = client or shared_client(self.api_key, base_url)
+        self.scheduler = scheduler or RequestScheduler()
+        self.model = model
+        self.target_level = target_level  # Level der zurückgegebenen Codes (siehe System Prompt)
+        self.hierarchical = hierarchical
+        self.group_threshold = group_threshold
+
+        # eBKP-H Katalog laden (Index aus Cache/ebkp_catalog.pickle, default: Helpers/eBKP-H.csv)
+        self.catalog = load_catalog(ebkp_csv_path)
+        num_level_1 = len(self.catalog.level_codes(1))
+        num_level_2 = len(self.catalog.level_codes(2))
+
+        print(f"✓ eBKP-H Katalog geladen: {num_level_1 + num_level_2} Codes "
+              f"(Level 1: {num_level_1}, Level 2: {num_level_2})")
+
+        if not 2 <= target_level <= max(self.catalog.levels):
+            raise ValueError(f"target_level muss zwischen 2 und {max(self.catalog.levels)} liegen")
+        if target_level > 2 and not hierarchical:
+            raise ValueError("target_level > 2 nur im hierarchischen Modus (hierarchical=True)")
+
+        if hierarchical:
+            # Schritt 1: nur Hauptgruppen; Schritt 2: ein vorgebauter Teilbaum-Prompt pro Gruppe
+            self.system_prompt = self._build_group_prompt()
+            self._stage = PromptStage(
+                self.system_prompt, level=1, label='Hauptgruppe (Level 1)',
+                example='[{"id":1,"code":"C","desc":"Konstruktion Gebäude","conf":0.95}]'
+            )
+            self._group_stages = {group: self._build_subtree_stage(group) for group in self.catalog.level_codes(1)}
+
+            subtree_tokens = [self._estimate_tokens(stage.system_prompt) for stage in self._group_stages.values()]
+            flat_tokens = self._estimate_tokens('\n'.join(
+                line for level in range(1, target_level + 1) for line in self.catalog.lines(level)
+            ))
+            print(f"✓ Hierarchischer Modus (Level {target_level}): Hauptgruppen-Prompt "
+                  f"~{self._estimate_tokens(self.system_prompt)} Tokens, Teilbäume "
+                  f"Ø ~{sum(subtree_tokens) // len(subtree_tokens)} / max ~{max(subtree_tokens)} Tokens "
+                  f"(flacher Katalog: ~{flat_tokens} Tokens)")
+        else:
+            # System Prompt generieren (wird als cachebarer Block gesendet)
+            self.system_prompt = self._build_system_prompt()
+            self._stage = PromptStage(self.system_prompt, level=target_level)
+            self._group_stages = {}
+
+            if self._estimate_tokens(self.system_prompt) < MIN_CACHEABLE_TOKENS:
+                print(f"Hinweis: System Prompt (~{self._estimate_tokens(self.system_prompt)} Tokens) "
+                      f"liegt unter dem Prompt-Caching-Minimum von {MIN_CACHEABLE_TOKENS} Tokens.")
+
+        # Persistenter Cache: Schlüssel hängt von Katalog, Prompts und Modell ab
+        self.cache = None
+        if use_cache:
+            self.cache = ClassificationCache(
+                cache_path,
+                context=context_hash(
+                    self.catalog.fingerprint, self.system_prompt, self.model,
+                    *[stage.system_prompt for stage in self._group_stages.values()]
+                )
+            )
 
-        # eBKP-H Katalog laden
-        if ebkp_csv_path is None:
-            # Default: Helpers/eBKP-H.csv relativ zu diesem Script
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            ebkp_csv_path = os.path.join(script_dir, 'eBKP-H.csv')
+        # Manuelle Korrekturen: haben Vorrang vor Cache und Modell
+        self.corrections = CorrectionStore(corrections_path) if use_corrections else None
+
+        # Lokale Vorklassifizierung und Few-Shot (Indizes werden beim ersten Cache-Miss aufgebaut)
+        self.local_threshold = local_threshold
+        self.few_shot_k = few_shot_k
+        self.few_shot_tokens = few_shot_tokens
+        self._examples = examples
+        self._indexes = {}  # 'local', 'groups', 'few_shot' → (Korrektur-Stand, Index), von session() Kopien geteilt
+        self._local_lock = threading.Lock()
+
+        # Laufzeit-Statistik (API-Calls, Cache-Treffer) – von Worker-Threads geteilt
+        self._stats_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self.stats = self._new_stats()
+
+    @staticmethod
+    def _new_stats(output_tokens_per_element: float = 30.0) -> Dict:
+        """Leere Laufzeit-Statistik"""
+        return {
+            'api_calls': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'cache_read_tokens': 0,
+            'cache_write_tokens': 0,
+            'truncated_batches': 0,
+            'reasked_elements': 0,
+            'missing_elements': 0,
+            'repaired_codes': 0,
+            'invalid_codes': 0,
+            'local_hits': 0,
+            'corrected_elements': 0,
+            'few_shot_examples': 0,
+            'local_groups': 0,
+            'output_tokens_per_element': output_tokens_per_element  # wird aus response.usage gelernt
+        }
+
+    def session(self) -> 'eBKPHClassifier':
+        """
+        Leichte Kopie für einen Lauf: teilt Katalog, Prompts, Client, Scheduler,
+        Cache und lokale Indizes, hat aber eine eigene Statistik. So kann ein
+        langlebiger Classifier (z.B. st.cache_resource) von mehreren Läufen und
+        Benutzern gleichzeitig verwendet werden, ohne deren Zähler zu vermischen.
 
-        if not os.path.exists(ebkp_csv_path):
-            raise FileNotFoundError(f"eBKP-H Katalog nicht gefunden: {ebkp_csv_path}")
+        Returns:
+            eBKPHClassifier mit leerer Statistik
+        """
+        run = copy.copy(self)
+        run._stats_lock = threading.Lock()
+        with self._stats_lock:
+            run.stats = self._new_stats(self.stats['output_tokens_per_element'])
+        return run
+
+    def _count(self, key: str, n: int = 1):
+        """Erhöht einen Statistik-Zähler (thread-safe)"""
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + n
+
+    def _record_usage(self, usage):
+        """Summiert Token-Verbrauch inkl. Prompt-Cache-Reads/-Writes aus response.usage"""
+        with self._stats_lock:
+            self.stats['input_tokens'] += usage.input_tokens or 0
+            self.stats['output_tokens'] += usage.output_tokens or 0
+            self.stats['cache_read_tokens'] += getattr(usage, 'cache_read_input_tokens', 0) or 0
+            self.stats['cache_write_tokens'] += getattr(usage, 'cache_creation_input_tokens', 0) or 0
+
+    def _lookup_known(self, signatures: List[str]) -> Dict[str, Dict]:
+        """
+        Bereits bekannte Ergebnisse ohne API-Call: manuelle Korrekturen (exakt und
+        unscharf) vor Cache-Einträgen. Codes werden wie API-Antworten auf das
+        Ziel-Level gebracht; nicht reparierbare Codes (nicht im Katalog, nur
+        Hauptgruppe) gelten als Miss.
 
-        # CSV einlesen und Level 1+2 filtern
-        df = pd.read_csv(ebkp_csv_path, encoding='utf-8-sig')
-        self.ebkp_catalog = df[df['Level'].isin([1, 2])].copy()
+        Returns:
+            Dict Signatur → Ergebnis (nur Treffer)
+        """
+        corrected = self.corrections.lookup(signatures) if self.corrections is not None else {}
+        corrected = self._known_results(corrected)
+        if corrected:
+            self._count('corrected_elements', sum(sig in corrected for sig in signatures))
+
+        open_signatures = [sig for sig in signatures if sig not in corrected]
+        cached = self.cache.get_many(open_signatures) if self.cache is not None and open_signatures else {}
+        known = self._known_results(cached)
+        if self.cache is not None:
+            self._count('cache_hits', sum(sig in known for sig in open_signatures))
+            self._count('cache_misses', sum(sig not in known for sig in open_signatures))
+
+        known.update(corrected)
+        return known
+
+    def _known_results(self, found: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Korrektur- oder Cache-Treffer mit Code auf target_level (Beschreibung aus dem Katalog, falls repariert)"""
+        known = {}
+        for sig, result in found.items():
+            code = str(result.get('code') or '').strip()
+            valid_code = self.catalog.repair(code, level=self.target_level, leaf_ok=self.hierarchical) if code else None
+            if valid_code is None:
+                continue
+            if valid_code != code:
+                result = dict(result, code=valid_code, desc=self.catalog.description(valid_code))
+            known[sig] = result
+        return known
+
+    def _confirmed_examples(self) -> List[Tuple[str, str]]:
+        """
+        Bestätigte Klassifizierungen als (Signatur, Code): manuelle Korrekturen und
+        sichere Cache-Einträge (Korrekturen haben Vorrang), oder die übergebenen Beispiele.
+        """
+        if self._examples is not None:
+            return list(self._examples)
+
+        confirmed = {}
+        if self.cache is not None:
+            for signature, result in self.cache.items():
+                if result.get('conf', 0.0) >= EXAMPLE_MIN_CONF and result.get('code') in self.catalog:
+                    confirmed[signature] = result['code']
+        if self.corrections is not None:
+            for signature, result in self.corrections.items():
+                if result.get('code') in self.catalog:
+                    confirmed[signature] = result['code']
+        return list(confirmed.items())
+
+    def _index(self, name: str, build: Callable[[], object]):
+        """
+        Geteilter Index aus den bestätigten Beispielen. Wird neu gebaut, sobald sich
+        der Korrektur-Speicher geändert hat (auch durch andere Instanzen oder die
+        Seite "BKP Bearbeiten"), damit neue Korrekturen nicht erst nach einem
+        Neustart wirken.
 
-        print(f"✓ eBKP-H Katalog geladen: {len(self.ebkp_catalog)} Codes "
-              f"(Level 1: {len(df[df['Level'] == 1])}, "
-              f"Level 2: {len(df[df['Level'] == 2])})")
+        Args:
+            name: 'local', 'groups' oder 'few_shot'
+            build: Baut den Index
 
-        # System Prompt generieren (wird gecacht von Anthropic)
-        self.system_prompt = self._build_system_prompt()
+        Returns:
+            Aktueller Index
+        """
+        with self._local_lock:
+            version = None
+            if self._examples is None and self.corrections is not None:
+                version = self.corrections.version()
+            entry = self._indexes.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, build())
+                self._indexes[name] = entry
+            return entry[1]
+
+    def _few_shot_retriever(self) -> FewShotRetriever:
+        """Few-Shot Index über die bestätigten Beispiele"""
+        return self._index(
+            'few_shot', lambda: FewShotRetriever(self._confirmed_examples(), per_element=self.few_shot_k)
+        )
+
+    def _local_classifier(self) -> LocalClassifier:
+        """Lokaler Index aus Katalog + bestätigten Beispielen"""
+        def build():
+            local = LocalClassifier(self.catalog, self._confirmed_examples(), level=self.target_level)
+            print(f"✓ Lokaler Index: {len(local.labels)} Dokumente "
+                  f"({local.num_examples} bestätigte Beispiele)")
+            return local
+
+        return self._index('local', build)
+
+    def _group_classifier(self) -> LocalClassifier:
+        """Lokaler Index für die Hauptgruppe (Level 1) im hierarchischen Modus"""
+        return self._index('groups', lambda: LocalClassifier(self.catalog, self._confirmed_examples(), level=1))
+
+    def _answer_locally(self, elements: List[Dict], signatures: List[str], results: List[Optional[Dict]]):
+        """
+        Beantwortet offene Positionen (None) lokal, wenn die Confidence den
+        Schwellenwert erreicht. Lokale Antworten werden nicht gecacht.
+        """
+        local = self._local_classifier()
+        predictions = {}
+        hits = 0
+        for i, result in enumerate(results):
+            if result is not None:
+                continue
+            if signatures[i] not in predictions:
+                predictions[signatures[i]] = local.predict(elements[i])
+            prediction = predictions[signatures[i]]
+            if prediction is not None and prediction['conf'] >= self.local_threshold:
+                results[i] = prediction
+                hits += 1
+        self._count('local_hits', hits)
+
+    def _system_blocks(self, system_prompt: str = None) -> List[Dict]:
+        """System Prompt als cachebarer Content-Block (Anthropic Prompt Caching)"""
+        return [{
+            "type": "text",
+            "text": system_prompt or self.system_prompt,
+            "cache_control": {"type": "ephemeral"}
+        }]
+
+    def _update_output_estimate(self, output_tokens: int, num_results: int):
+        """Gleitender Mittelwert der Output-Tokens pro klassifiziertem Element"""
+        if num_results <= 0:
+            return
+        observed = output_tokens / num_results
+        with self._stats_lock:
+            current = self.stats['output_tokens_per_element']
+            self.stats['output_tokens_per_element'] = 0.7 * current + 0.3 * observed
+
+    def _max_tokens_for(self, num_elements: int) -> int:
+        """max_tokens passend zur Batch-Grösse (gemessene Tokens/Element + Reserve)"""
+        per_element = self.stats['output_tokens_per_element']
+        return min(MAX_OUTPUT_TOKENS, int(num_elements * per_element * OUTPUT_SAFETY_FACTOR) + 64)
+
+    def _adaptive_batch_size(self, elements: List[Dict], start: int, max_concurrency: int = 1) -> int:
+        """
+        Bestimmt die Grösse des nächsten Batches ab Position 'start'.
+
+        So gross wie möglich, ohne dass die erwarteten Output-Tokens MAX_OUTPUT_TOKENS
+        oder die Element-Zeilen MAX_BATCH_INPUT_TOKENS überschreiten. Bei Parallelität
+        werden die Elemente auf mindestens max_concurrency Batches verteilt.
+        """
+        per_element = self.stats['output_tokens_per_element'] * OUTPUT_SAFETY_FACTOR
+        limit = min(MAX_ADAPTIVE_BATCH_SIZE, max(1, int((MAX_OUTPUT_TOKENS - 64) / per_element)))
+
+        if max_concurrency > 1:
+            limit = min(limit, max(1, -(-len(elements) // max_concurrency)))
+
+        size = 0
+        input_tokens = 0
+        for elem in elements[start:start + limit]:
+            line_tokens = self._estimate_tokens(self._format_element(elem))
+            if size and input_tokens + line_tokens > MAX_BATCH_INPUT_TOKENS:
+                break
+            input_tokens += line_tokens
+            size += 1
+        return max(1, size)
+
+    def _message_params(self, prompt: str, max_tokens: int = 2000, system_prompt: str = None) -> Dict:
+        """Parameter für messages.create (auch für Message Batches verwendet)"""
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": self._system_blocks(system_prompt),  # ← cache_control: ephemeral
+            "messages": [{
+                "role": "user",
+                "content": prompt
+            }]
+        }
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Grobe Token-Schätzung (~3.5 Zeichen pro Token für deutschen Text)"""
+        return int(len(text) / 3.5) + 1
 
     def _build_system_prompt(self) -> str:
         """
         Baut kompakten System Prompt mit eBKP-H Katalog (Level 1+2).
-        Dieser Prompt wird von Anthropic gecacht für 5 Minuten.
+        Wird mit cache_control gesendet und von Anthropic 5 Minuten gecacht
+        (sofern er das Caching-Minimum erreicht).
 
         Returns:
             System Prompt String (kompakt formatiert)
         """
-        # Level 1 Codes (Hauptgruppen)
-        level_1 = self.ebkp_catalog[self.ebkp_catalog['Level'] == 1]
-        level_1_lines = [f"{row['Code']}: {row['Description']}"
-                         for _, row in level_1.iterrows()]
-
-        # Level 2 Codes (Untergruppen)
-        level_2 = self.ebkp_catalog[self.ebkp_catalog['Level'] == 2]
-        level_2_lines = [f"{row['Code']}: {row['Description']}"
-                         for _, row in level_2.iterrows()]
+        # Level 1 Codes (Hauptgruppen) und Level 2 Codes (Untergruppen)
+        level_1_lines = self.catalog.lines(1)
+        level_2_lines = self.catalog.lines(2)
 
         prompt = f"""eBKP-H Klassifizierung (Schweizer Baukostenplan)
 
@@ -114,96 +614,267 @@ Regeln:
 
         return prompt
 
-    def _build_batch_prompt(self, elements: List[Dict]) -> str:
+    def _build_group_prompt(self) -> str:
+        """
+        System Prompt für Schritt 1 im hierarchischen Modus: nur die Hauptgruppen.
+
+        Returns:
+            System Prompt String
+        """
+        prompt = f"""eBKP-H Klassifizierung (Schweizer Baukostenplan) – Schritt 1: Hauptgruppe
+
+Du bist ein Experte für Bauwesen und Kostenkalkulation nach eBKP-H Standard.
+
+LEVEL 1 (Hauptgruppen):
+{chr(10).join(self.catalog.lines(1))}
+
+Aufgabe: Bestimme die eBKP-H Hauptgruppe (Level 1) von Bauelementen basierend auf:
+- Kategorie (z.B. Waende, Tueren, Decken, Beleuchtung)
+- Typ (z.B. "Interior - Partition (92mm Stud)")
+- Familie (z.B. "Basic Wall", "M_Single-Flush")
+- Zusatzinfo (optional)
+
+Regeln:
+1. Gib IMMER genau eine Hauptgruppe zurück (nur der Buchstabe, z.B. "C")
+2. Confidence: 0.9+ = sicher, 0.7-0.9 = wahrscheinlich, <0.7 = unsicher
+3. Antworte NUR mit dem angeforderten JSON Format, KEIN zusätzlicher Text"""
+
+        return prompt
+
+    def _build_subtree_stage(self, group: str) -> PromptStage:
+        """
+        Schritt 2 im hierarchischen Modus: System Prompt mit dem Teilbaum einer
+        Hauptgruppe bis target_level (einmal pro Gruppe vorgebaut, von Anthropic
+        pro Gruppe gecacht).
+
+        Args:
+            group: Hauptgruppe (Level 1 Code, z.B. 'C')
+
+        Returns:
+            PromptStage für diese Gruppe
+        """
+        level = self.target_level
+        codes = [
+            code for code in self.catalog.with_prefix(group)
+            if 2 <= self.catalog.get(code).level <= level
+        ]
+        lines = [f"{code}: {self.catalog.description(code)}" for code in codes]
+        targets = [code for code in codes if self.catalog.get(code).level == level] or codes
+
+        prompt = f"""eBKP-H Klassifizierung (Schweizer Baukostenplan) – Hauptgruppe {group}: {self.catalog.description(group)}
+
+Du bist ein Experte für Bauwesen und Kostenkalkulation nach eBKP-H Standard.
+Die Bauelemente gehören zur Hauptgruppe {group}.
+
+CODES (Level 2-{level}):
+{chr(10).join(lines)}
+
+Aufgabe: Klassifiziere Bauelemente nach eBKP-H Level {level} basierend auf:
+- Kategorie (z.B. Waende, Tueren, Decken, Beleuchtung)
+- Typ (z.B. "Interior - Partition (92mm Stud)")
+- Familie (z.B. "Basic Wall", "M_Single-Flush")
+- Zusatzinfo (optional)
+
+Regeln:
+1. Gib IMMER einen Code aus der Liste auf Level {level} zurück (z.B. "{targets[0]}"); hat ein Code keine Untercodes, diesen Code
+2. Falls unsicher zwischen mehreren Codes, wähle den spezifischsten
+3. Confidence: 0.9+ = sicher, 0.7-0.9 = wahrscheinlich, <0.7 = unsicher
+4. Antworte NUR mit dem angeforderten JSON Format, KEIN zusätzlicher Text"""
+
+        example = json.dumps(
+            [{'id': 1, 'code': targets[0], 'desc': self.catalog.description(targets[0]), 'conf': 0.95}],
+            ensure_ascii=False, separators=(',', ':')
+        )
+        return PromptStage(prompt, level=level, prefix=group, label=f"Level {level}", example=example)
+
+    @staticmethod
+    def _format_element(elem: Dict) -> str:
+        """Formatiert ein Element kompakt für den Prompt (ohne Nummer)"""
+        parts = []
+
+        # Sichere String-Konvertierung (behandelt NaN, None, float, etc.)
+        kategorie = str(elem.get('kategorie', '')).strip() if elem.get('kategorie') not in [None, '', 'nan', 'NaN'] else ''
+        typ = str(elem.get('typ', '')).strip() if elem.get('typ') not in [None, '', 'nan', 'NaN'] else ''
+        familie = str(elem.get('familie', '')).strip() if elem.get('familie') not in [None, '', 'nan', 'NaN'] else ''
+        zusatzinfo = str(elem.get('zusatzinfo', '')).strip() if elem.get('zusatzinfo') not in [None, '', 'nan', 'NaN'] else ''
+
+        if kategorie:
+            parts.append(f"Kat: {kategorie}")
+        if typ:
+            parts.append(f"Typ: {typ}")
+        if familie:
+            parts.append(f"Fam: {familie}")
+        if zusatzinfo:
+            parts.append(f"Info: {zusatzinfo}")
+
+        return ', '.join(parts) if parts else "(keine Info)"
+
+    def _format_example(self, elem: Dict, code: str) -> str:
+        """Formatiert ein bestätigtes Beispiel kompakt für den Prompt"""
+        return f"- {self._format_element(elem)} → {code}"
+
+    def _build_batch_prompt(self, elements: List[Dict], stage: PromptStage = None) -> str:
         """
         Baut kompakten User Prompt für Batch-Klassifizierung.
 
         Args:
             elements: Liste von Elementen mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
+            stage: Klassifizierungs-Schritt (default: flach bzw. Hauptgruppe)
 
         Returns:
             User Prompt String
         """
+        stage = stage or self._stage
+
         # Elemente formatieren (kompakt)
-        element_lines = []
-        for i, elem in enumerate(elements, 1):
-            parts = []
-
-            # Sichere String-Konvertierung (behandelt NaN, None, float, etc.)
-            kategorie = str(elem.get('kategorie', '')).strip() if elem.get('kategorie') not in [None, '', 'nan', 'NaN'] else ''
-            typ = str(elem.get('typ', '')).strip() if elem.get('typ') not in [None, '', 'nan', 'NaN'] else ''
-            familie = str(elem.get('familie', '')).strip() if elem.get('familie') not in [None, '', 'nan', 'NaN'] else ''
-            zusatzinfo = str(elem.get('zusatzinfo', '')).strip() if elem.get('zusatzinfo') not in [None, '', 'nan', 'NaN'] else ''
-
-            if kategorie:
-                parts.append(f"Kat: {kategorie}")
-            if typ:
-                parts.append(f"Typ: {typ}")
-            if familie:
-                parts.append(f"Fam: {familie}")
-            if zusatzinfo:
-                parts.append(f"Info: {zusatzinfo}")
-
-            line = f"{i}. {', '.join(parts)}" if parts else f"{i}. (keine Info)"
-            element_lines.append(line)
-
-        prompt = f"""Klassifiziere diese {len(elements)} Bauelemente nach eBKP-H (Level 1+2):
+        element_lines = [f"{i}. {self._format_element(elem)}" for i, elem in enumerate(elements, 1)]
+
+        # Ähnlichste bestätigte Beispiele (Few-Shot, innerhalb des Token-Budgets)
+        examples_block = ''
+        if self.few_shot_k > 0:
+            examples = self._few_shot_retriever().select(
+                elements, self.few_shot_tokens, self._estimate_tokens, self._format_example,
+                prefix=stage.prefix
+            )
+            if examples:
+                self._count('few_shot_examples', len(examples))
+                example_lines = [self._format_example(signature_element(sig), code) for sig, code in examples]
+                examples_block = f"""Bestätigte Beispiele ähnlicher Elemente:
+{chr(10).join(example_lines)}
+
+"""
+
+        prompt = f"""{examples_block}Klassifiziere diese {len(elements)} Bauelemente nach eBKP-H ({stage.label}):
 
 {chr(10).join(element_lines)}
 
 Antworte NUR mit diesem JSON Array (keine Markdown, kein Text davor/danach):
-[{{"id":1,"code":"C02","desc":"Wandkonstruktion","conf":0.95}},{{"id":2,"code":"F03","desc":"Innentüren","conf":0.90}}]"""
+{stage.example}"""
 
         return prompt
 
-    def _parse_batch_response(self, response_text: str) -> List[Dict]:
+    def _parse_batch_response(
+        self,
+        response_text: str,
+        num_elements: int,
+        count_codes: bool = True,
+        stage: PromptStage = None
+    ) -> List[Optional[Dict]]:
         """
         Parst JSON Response von Claude API.
 
+        Rettet jedes wohlgeformte Objekt, auch wenn das Array als Ganzes kaputt
+        oder abgeschnitten ist. Die Zuordnung erfolgt über das 'id' Feld (1-basiert),
+        nicht über die Reihenfolge in der Antwort.
+
         Args:
             response_text: Raw Response Text von API
+            num_elements: Anzahl Elemente im Batch
+            count_codes: Reparierte/ungültige Codes in der Statistik zählen
+                         (False, wenn der Stream-Parser sie schon gezählt hat)
+            stage: Klassifizierungs-Schritt (Level/Hauptgruppe der erwarteten Codes)
 
         Returns:
-            Liste von Dicts mit 'code', 'desc', 'conf'
+            Liste mit num_elements Einträgen: Dict mit 'code', 'desc', 'conf'
+            oder None für fehlende/unlesbare Elemente
         """
+        # Bereinige Response (entferne Markdown Code Blocks falls vorhanden)
+        content = response_text.strip()
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            content = content.split("```")[1].split("```")[0].strip()
+
+        # Alle einzeln parsebaren {...} Objekte einsammeln
+        decoder = json.JSONDecoder()
+        objects = []
+        pos = 0
+        while True:
+            start = content.find('{', pos)
+            if start < 0:
+                break
+            try:
+                obj, end = decoder.raw_decode(content, start)
+            except json.JSONDecodeError:
+                pos = start + 1
+                continue
+            if isinstance(obj, dict):
+                objects.append(obj)
+            pos = end
+
+        results = [None] * num_elements
+        has_ids = any('id' in obj for obj in objects)
+
+        for order, obj in enumerate(objects):
+            result = self._result_from_object(obj, count_codes=count_codes, stage=stage)
+            if result is None:
+                continue
+
+            # Position über 'id', Fallback auf Reihenfolge wenn die Antwort keine IDs hat
+            try:
+                position = int(obj['id']) - 1 if has_ids else order
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not 0 <= position < num_elements or results[position] is not None:
+                continue
+
+            results[position] = result
+
+        parsed = sum(r is not None for r in results)
+        if parsed < num_elements:
+            print(f"⚠ Warnung: Nur {parsed} von {num_elements} Elementen aus Response gelesen")
+
+        return results
+
+    def _result_from_object(
+        self,
+        obj: Dict,
+        count_codes: bool = True,
+        stage: PromptStage = None
+    ) -> Optional[Dict]:
+        """
+        Normalisiert ein Antwort-Objekt zu 'code', 'desc', 'conf'.
+
+        Der Code wird gegen den Katalog geprüft und wenn möglich repariert
+        (Schreibweise, zu tiefes Level, eindeutiger Tippfehler). Die Beschreibung
+        kommt dann aus dem Katalog. Im hierarchischen Schritt 2 muss der Code
+        zur Hauptgruppe gehören; Zweige, die nicht bis zum Level reichen, gelten
+        mit ihrem tiefsten Code.
+
+        Returns:
+            Dict oder None (kein Code bzw. ungültig → wird gezielt nachgefragt)
+        """
+        code = obj.get('code') or obj.get('bkp_code')
+        if not code:
+            return None
+
+        stage = stage or self._stage
+        raw_code = str(code).strip()
+        valid_code = self.catalog.repair(raw_code, level=stage.level, leaf_ok=bool(stage.prefix))
+        if valid_code is not None and not valid_code.startswith(stage.prefix):
+            valid_code = None
+        if valid_code is None:
+            if count_codes:
+                self._count('invalid_codes')
+            return None
+        if valid_code != raw_code and count_codes:
+            self._count('repaired_codes')
+
         try:
-            # Bereinige Response (entferne Markdown Code Blocks falls vorhanden)
-            content = response_text.strip()
-
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-
-            # Finde JSON Array in der Response
-            start_idx = content.find('[')
-            end_idx = content.rfind(']') + 1
-            if start_idx >= 0 and end_idx > start_idx:
-                content = content[start_idx:end_idx]
-
-            # Parse JSON
-            results = json.loads(content)
-
-            # Formatiere Ergebnisse (standardisiere Keys)
-            formatted = []
-            for r in results:
-                formatted.append({
-                    'code': r.get('code') or r.get('bkp_code', 'UNKNOWN'),
-                    'desc': r.get('desc') or r.get('description', ''),
-                    'conf': float(r.get('conf') or r.get('confidence', 0.5))
-                })
-
-            return formatted
-
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {e}")
-            print(f"Response: {response_text[:200]}")
-            # Fallback: Leere Ergebnisse mit ERROR
-            return [{'code': 'ERROR', 'desc': 'Parse Error', 'conf': 0.0}] * 10
-
-        except Exception as e:
-            print(f"Unerwarteter Fehler beim Parsing: {e}")
-            return [{'code': 'ERROR', 'desc': str(e), 'conf': 0.0}] * 10
+            conf = float(obj.get('conf') or obj.get('confidence', 0.5))
+        except (TypeError, ValueError):
+            conf = 0.5
+
+        return {
+            'code': valid_code,
+            'desc': self.catalog.description(valid_code) or obj.get('desc') or obj.get('description', ''),
+            'conf': conf
+        }
+
+    @staticmethod
+    def _fill_missing(results: List[Optional[Dict]]) -> List[Dict]:
+        """Ersetzt fehlende Ergebnisse durch MISSING"""
+        return [r or {'code': 'MISSING', 'desc': 'No result', 'conf': 0.0} for r in results]
 
     def classify_element(
         self,
@@ -243,7 +914,9 @@ Antworte NUR mit diesem JSON Array (keine Markdown, kein Text davor/danach):
         self,
         elements: List[Dict],
         debug: bool = False,
-        log_file: str = None
+        log_file: str = None,
+        stream: bool = False,
+        on_element: Callable[[int, Dict], None] = None
     ) -> List[Dict]:
         """
         Klassifiziert einen Batch von Elementen (30-50 empfohlen).
@@ -252,6 +925,9 @@ Antworte NUR mit diesem JSON Array (keine Markdown, kein Text davor/danach):
             elements: Liste von Dicts mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
             debug: Debug-Ausgaben aktivieren
             log_file: Pfad zu Log-Datei für Response-Logging (optional)
+            stream: Streaming API verwenden (Ergebnisse pro Element statt pro Batch)
+            on_element: Callback(position, result), genau einmal pro Element –
+                        mit stream=True sobald das Element in der Antwort steht
 
         Returns:
             Liste von Dicts mit 'code', 'desc', 'conf'
@@ -259,74 +935,729 @@ Antworte NUR mit diesem JSON Array (keine Markdown, kein Text davor/danach):
         if not elements:
             return []
 
+        delivered = set()
+
+        def deliver(i: int, result: Dict):
+            if on_element and i not in delivered:
+                delivered.add(i)
+                on_element(i, result)
+
+        # Korrekturen und Cache: nur unbekannte Elemente gehen an die API
+        signatures = [element_signature(elem) for elem in elements]
+        known = self._lookup_known(signatures)
+
+        results = [known.get(sig) for sig in signatures]
+        miss_idx = [i for i, r in enumerate(results) if r is None]
+
+        if debug and (self.cache is not None or self.corrections is not None):
+            print(f"Korrekturen/Cache: {len(elements) - len(miss_idx)} Treffer, {len(miss_idx)} Misses")
+
+        # Sichere Misses lokal beantworten
+        if miss_idx and self.local_threshold is not None:
+            self._answer_locally(elements, signatures, results)
+            if debug:
+                print(f"Lokal: {len(miss_idx) - sum(r is None for r in results)} beantwortet")
+            miss_idx = [i for i, r in enumerate(results) if r is None]
+
+        for i, result in enumerate(results):
+            if result is not None:
+                deliver(i, result)
+
+        if miss_idx:
+            # Gleiche Signaturen innerhalb des Batches nur einmal anfragen
+            unique_misses = {}
+            for i in miss_idx:
+                unique_misses.setdefault(signatures[i], []).append(i)
+            unique_positions = list(unique_misses.values())
+
+            def deliver_unique(u: int, result: Dict):
+                for i in unique_positions[u]:
+                    deliver(i, result)
+
+            miss_results = self._classify_unknown(
+                [elements[positions[0]] for positions in unique_positions],
+                debug=debug, log_file=log_file, stream=stream,
+                on_element=deliver_unique if on_element else None
+            )
+            fresh = dict(zip(unique_misses, miss_results))
+            for i in miss_idx:
+                results[i] = fresh[signatures[i]]
+
+            if self.cache is not None:
+                self.cache.put_many(fresh)
+
+        # Was noch nicht gemeldet wurde (Nachfragen, MISSING, ohne Streaming)
+        for i, result in enumerate(results):
+            deliver(i, result)
+
+        return results
+
+    def _classify_unknown(
+        self,
+        elements: List[Dict],
+        debug: bool = False,
+        log_file: str = None,
+        stream: bool = False,
+        on_element: Callable[[int, Dict], None] = None
+    ) -> List[Dict]:
+        """
+        Klassifiziert Elemente ohne bekanntes Ergebnis über die API.
+
+        Flach: ein Request mit dem ganzen Level 1+2 Katalog. Hierarchisch:
+        Schritt 1 bestimmt die Hauptgruppe (lokal, wenn sicher genug, sonst über den
+        kurzen Level-1 Prompt), Schritt 2 sendet pro Gruppe nur deren Teilbaum.
+
+        Returns:
+            Liste von Dicts mit 'code', 'desc', 'conf'
+        """
+        if not self.hierarchical:
+            return self._request_with_reask(
+                elements, debug=debug, log_file=log_file, stream=stream, on_element=on_element
+            )
+
+        # Schritt 1: Hauptgruppe
+        groups = [None] * len(elements)
+        if self.group_threshold is not None:
+            local = self._group_classifier()
+            for i, elem in enumerate(elements):
+                prediction = local.predict(elem)
+                if prediction is not None and prediction['conf'] >= self.group_threshold:
+                    groups[i] = prediction['code']
+            self._count('local_groups', sum(group is not None for group in groups))
+
+        results = [None] * len(elements)
+        open_idx = [i for i, group in enumerate(groups) if group is None]
+        if open_idx:
+            group_results = self._request_with_reask(
+                [elements[i] for i in open_idx], debug=debug, log_file=log_file, stage=self._stage
+            )
+            for i, result in zip(open_idx, group_results):
+                if result['code'] in self._group_stages:
+                    groups[i] = result['code']
+                else:
+                    results[i] = result  # ERROR/MISSING bleibt Endergebnis
+
+        # Schritt 2: pro Hauptgruppe nur deren Teilbaum
+        by_group = {}
+        for i, group in enumerate(groups):
+            if group is not None:
+                by_group.setdefault(group, []).append(i)
+
+        for group, positions in by_group.items():
+            if debug:
+                print(f"Hauptgruppe {group}: {len(positions)} Elemente")
+            subtree_results = self._request_with_reask(
+                [elements[i] for i in positions], debug=debug, log_file=log_file, stream=stream,
+                on_element=(lambda j, result, positions=positions: on_element(positions[j], result))
+                if on_element else None,
+                stage=self._group_stages[group]
+            )
+            for i, result in zip(positions, subtree_results):
+                results[i] = result
+
+        return results
+
+    def _request_with_reask(
+        self,
+        elements: List[Dict],
+        debug: bool = False,
+        log_file: str = None,
+        stream: bool = False,
+        on_element: Callable[[int, Dict], None] = None,
+        stage: PromptStage = None
+    ) -> List[Dict]:
+        """
+        Sendet einen Batch und fragt fehlende/unlesbare Elemente gezielt nach.
+
+        Nur die IDs ohne gültiges Ergebnis werden in einem kleineren Folge-Batch
+        erneut gesendet (max. MAX_REASKS Runden). Was dann noch fehlt, wird MISSING.
+
+        Returns:
+            Liste von Dicts mit 'code', 'desc', 'conf'
+        """
+        results = self._request_batch(
+            elements, debug=debug, log_file=log_file, stream=stream, on_element=on_element, stage=stage
+        )
+
+        for _ in range(MAX_REASKS):
+            missing = [i for i, r in enumerate(results) if r is None]
+            if not missing:
+                break
+
+            self._count('reasked_elements', len(missing))
+            if debug:
+                print(f"Nachfrage für {len(missing)} fehlende Elemente: IDs {[i + 1 for i in missing]}")
+
+            retry_results = self._request_batch(
+                [elements[i] for i in missing], debug=debug, log_file=log_file, stream=stream,
+                on_element=(lambda j, result, missing=missing: on_element(missing[j], result))
+                if on_element else None,
+                stage=stage
+            )
+            for i, result in zip(missing, retry_results):
+                results[i] = result
+
+        self._count('missing_elements', sum(r is None for r in results))
+        return self._fill_missing(results)
+
+    def _stream_message(
+        self,
+        params: Dict,
+        streamed: List[Optional[Dict]],
+        on_element: Callable[[int, Dict], None] = None,
+        stage: PromptStage = None
+    ):
+        """
+        Führt einen Streaming-Request aus und trägt jedes fertige Objekt sofort
+        in 'streamed' ein. Bei einem Retry werden bereits erhaltene Elemente
+        nicht erneut gemeldet.
+
+        Returns:
+            Finale Message (mit usage und stop_reason)
+        """
+        parser = JsonObjectStream()
+        order = 0
+
+        with self.client.messages.stream(**params) as stream:
+            self.scheduler.update_limits(getattr(stream.response, 'headers', None))
+
+            for chunk in stream.text_stream:
+                for obj in parser.feed(chunk):
+                    result = self._result_from_object(obj, stage=stage)
+                    order += 1
+                    if result is None:
+                        continue
+                    try:
+                        position = int(obj['id']) - 1 if 'id' in obj else order - 1
+                    except (TypeError, ValueError):
+                        continue
+                    if not 0 <= position < len(streamed) or streamed[position] is not None:
+                        continue
+
+                    streamed[position] = result
+                    if on_element:
+                        on_element(position, result)
+
+            return stream.get_final_message()
+
+    def _request_batch(
+        self,
+        elements: List[Dict],
+        debug: bool = False,
+        log_file: str = None,
+        stream: bool = False,
+        on_element: Callable[[int, Dict], None] = None,
+        stage: PromptStage = None
+    ) -> List[Dict]:
+        """
+        Sendet einen Batch an die Claude API (ohne Cache).
+
+        Args:
+            elements: Liste von Dicts mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
+            debug: Debug-Ausgaben aktivieren
+            log_file: Pfad zu Log-Datei für Response-Logging (optional)
+            stream: Streaming API verwenden
+            on_element: Callback(position, result) pro gestreamtem Element
+            stage: Klassifizierungs-Schritt (System Prompt, Level; default: flach bzw. Hauptgruppe)
+
+        Returns:
+            Liste von Dicts mit 'code', 'desc', 'conf' (None = fehlend/unlesbar,
+            ERROR = API-Fehler nach allen Retries; bereits gestreamte Elemente
+            bleiben auch bei einem Abbruch erhalten)
+        """
         # Batch Prompt bauen
-        prompt = self._build_batch_prompt(elements)
+        stage = stage or self._stage
+        prompt = self._build_batch_prompt(elements, stage)
+        streamed = [None] * len(elements)
 
         if debug:
             print(f"\n=== DEBUG: Batch-Klassifizierung ({len(elements)} Elemente) ===")
             print(f"Prompt (erste 300 Zeichen):\n{prompt[:300]}...\n")
 
+        from anthropic import APIError
+
+        # API Call über Scheduler (Token-Buckets, Backoff, adaptive Parallelität).
+        # Nur API-Fehler werden zu ERROR; Fehler aus on_element (z.B. JobCancelled) propagieren.
+        self._count('api_calls')
+        max_tokens = self._max_tokens_for(len(elements))
+        params = self._message_params(prompt, max_tokens, stage.system_prompt)
+        if stream:
+            request = lambda: self._stream_message(params, streamed, on_element, stage)
+        else:
+            request = lambda: self.client.messages.with_raw_response.create(**params)
         try:
-            # API Call
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=2000,  # Genug für ~50 Elemente
-                system=self.system_prompt,  # ← Wird gecacht!
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
+            response = self.scheduler.call(
+                request,
+                input_tokens=self._estimate_tokens(stage.system_prompt + prompt),
+                output_tokens=int(max_tokens / OUTPUT_SAFETY_FACTOR)
             )
+        except APIError as e:
+            print(f"Fehler bei API-Call: {e}")
+            return self._error_results(streamed, e)
 
+        try:
             # Response extrahieren
             response_text = response.content[0].text
+            usage = response.usage
+            self._record_usage(usage)
+            cache_read = getattr(usage, 'cache_read_input_tokens', 0) or 0
+            cache_write = getattr(usage, 'cache_creation_input_tokens', 0) or 0
 
             # Logging in Datei (falls gewünscht)
             if log_file:
                 from datetime import datetime
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                with open(log_file, 'a', encoding='utf-8') as f:
+                with self._log_lock, open(log_file, 'a', encoding='utf-8') as f:
                     f.write(f"\n{'='*80}\n")
                     f.write(f"Timestamp: {timestamp}\n")
                     f.write(f"Batch: {len(elements)} Elemente\n")
-                    f.write(f"Tokens: Input={response.usage.input_tokens}, Output={response.usage.output_tokens}\n")
+                    f.write(f"Tokens: Input={usage.input_tokens}, Output={usage.output_tokens}, "
+                            f"Cache-Read={cache_read}, Cache-Write={cache_write}\n")
                     f.write(f"\nPrompt:\n{prompt}\n")
                     f.write(f"\nResponse:\n{response_text}\n")
                     f.write(f"{'='*80}\n")
 
             if debug:
                 print(f"Response (erste 300 Zeichen):\n{response_text[:300]}...\n")
-                print(f"Token Usage: Input={response.usage.input_tokens}, "
-                      f"Output={response.usage.output_tokens}")
+                print(f"Token Usage: Input={usage.input_tokens}, "
+                      f"Output={usage.output_tokens}, "
+                      f"Cache-Read={cache_read}, Cache-Write={cache_write}")
+
+            # Abgeschnittene Antwort → Schätzung wächst über parsed-Anzahl automatisch
+            if response.stop_reason == 'max_tokens':
+                self._count('truncated_batches')
+                print(f"⚠ Warnung: Antwort bei max_tokens={max_tokens} abgeschnitten "
+                      f"({len(elements)} Elemente)")
+
+            results = self._parse_batch_response(
+                response_text, len(elements), count_codes=not stream, stage=stage
+            )
+            # Gestreamte Ergebnisse haben Vorrang (bereits an den Aufrufer gemeldet)
+            results = [s or r for s, r in zip(streamed, results)]
+            self._update_output_estimate(usage.output_tokens, sum(r is not None for r in results))
 
-            # Response parsen
-            results = self._parse_batch_response(response_text)
+            return results
 
-            # Sicherstellen, dass wir für jedes Element ein Ergebnis haben
-            if len(results) < len(elements):
-                print(f"⚠ Warnung: Nur {len(results)} von {len(elements)} "
-                      f"Elementen klassifiziert")
-                # Fülle fehlende Ergebnisse auf
-                while len(results) < len(elements):
-                    results.append({'code': 'MISSING', 'desc': 'No result', 'conf': 0.0})
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+            print(f"Fehler beim Lesen der Antwort: {e}")
+            return self._error_results(streamed, e)
 
-            return results[:len(elements)]  # Schneide auf exakte Länge
+    @staticmethod
+    def _error_results(streamed: List[Optional[Dict]], error: Exception) -> List[Dict]:
+        """Fallback: ERROR für alle Elemente, die nicht schon gestreamt wurden"""
+        error = {'code': 'ERROR', 'desc': str(error), 'conf': 0.0}
+        return [r or error for r in streamed]
 
-        except Exception as e:
-            print(f"Fehler bei API-Call: {e}")
-            # Fallback: ERROR für alle Elemente
-            return [{'code': 'ERROR', 'desc': str(e), 'conf': 0.0}] * len(elements)
+    def classify_elements(
+        self,
+        elements: List[Dict],
+        batch_size: int = None,
+        max_concurrency: int = 1,
+        debug: bool = False,
+        log_file: str = None,
+        on_batch_done: Callable[[List[int], List[Dict]], None] = None,
+        stream: bool = False,
+        on_element: Callable[[int, Dict], None] = None
+    ) -> List[Dict]:
+        """
+        Klassifiziert eine Liste von Elementen in Batches, optional parallel.
+
+        Ohne feste batch_size wird jeder Batch erst beim Absenden geplant: so gross
+        wie möglich, gemessen an den bisher beobachteten Output-Tokens pro Element
+        (siehe _adaptive_batch_size). max_tokens wird pro Batch passend gesetzt.
+
+        Args:
+            elements: Liste von Dicts mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
+            batch_size: Feste Batch-Grösse (None = adaptiv)
+            max_concurrency: Maximale Anzahl gleichzeitiger API-Requests (1 = sequenziell)
+            debug: Debug-Ausgaben aktivieren
+            log_file: Pfad zu Log-Datei für Response-Logging (optional)
+            on_batch_done: Callback(positionen, results), sobald ein Batch fertig ist.
+                           Wird im aufrufenden Thread ausgeführt (Streamlit-kompatibel).
+            stream: Streaming API verwenden (Ergebnisse pro Element statt pro Batch)
+            on_element: Callback(position, result) pro Element, ebenfalls im
+                        aufrufenden Thread. Kommt vor on_batch_done des Batches.
+
+        Returns:
+            Liste von Dicts mit 'code', 'desc', 'conf' (Input-Reihenfolge)
+        """
+        results = [None] * len(elements)
+        next_pos = 0
+
+        def next_batch() -> List[int]:
+            nonlocal next_pos
+            size = batch_size or self._adaptive_batch_size(elements, next_pos, max_concurrency)
+            positions = list(range(next_pos, min(next_pos + size, len(elements))))
+            next_pos = positions[-1] + 1
+            return positions
+
+        def finish(positions: List[int], batch_results: List[Dict]):
+            for i, result in zip(positions, batch_results):
+                results[i] = result
+            if on_batch_done:
+                on_batch_done(positions, batch_results)
+
+        def element_callback(positions: List[int], emit: Callable[[int, Dict], None]):
+            # Batch-Position → Position in 'elements'
+            if on_element is None:
+                return None
+            return lambda j, result: emit(positions[j], result)
+
+        if max_concurrency <= 1:
+            while next_pos < len(elements):
+                positions = next_batch()
+                finish(positions, self.classify_batch(
+                    [elements[i] for i in positions], debug=debug, log_file=log_file,
+                    stream=stream, on_element=element_callback(positions, on_element)
+                ))
+            return results
+
+        # Element-Events aus den Worker-Threads an den aufrufenden Thread übergeben
+        events = Queue()
+
+        def drain_events():
+            while True:
+                try:
+                    position, result = events.get_nowait()
+                except Empty:
+                    return
+                on_element(position, result)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            pending = {}
+
+            while next_pos < len(elements) or pending:
+                # Fenster auffüllen: nie mehr als max_concurrency Requests in-flight
+                while next_pos < len(elements) and len(pending) < max_concurrency:
+                    positions = next_batch()
+                    future = pool.submit(
+                        self.classify_batch, [elements[i] for i in positions], debug, log_file,
+                        stream, element_callback(positions, lambda i, r: events.put((i, r)))
+                    )
+                    pending[future] = positions
+
+                # Mit on_element regelmässig aufwachen, um Element-Events weiterzureichen
+                done, _ = wait(
+                    pending, timeout=0.1 if on_element else None, return_when=FIRST_COMPLETED
+                )
+                if on_element:
+                    drain_events()
+                for future in done:
+                    finish(pending.pop(future), future.result())
+
+        return results
+
+    def classify_bulk(
+        self,
+        elements: List[Dict],
+        job_file: str,
+        batch_size: int = None,
+        poll_interval: float = 60.0
+    ) -> List[Dict]:
+        """
+        Klassifiziert Elemente offline über die Message Batches API (50% günstiger,
+        Ergebnisse innerhalb von 24h). Job-ID und Batch→Element-Zuordnung werden in
+        job_file gespeichert, damit ein abgebrochener Lauf weiter pollen kann.
+
+        Args:
+            elements: Liste von Dicts mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
+            job_file: Pfad zur Job-Datei (JSON)
+            batch_size: Elemente pro Request innerhalb des Batch-Jobs (None = adaptiv)
+            poll_interval: Sekunden zwischen Status-Abfragen
+
+        Returns:
+            Liste von Dicts mit 'code', 'desc', 'conf' (Input-Reihenfolge)
+        """
+        from datetime import datetime
+
+        if self.hierarchical:
+            raise ValueError("Bulk-Modus unterstützt den hierarchischen Modus nicht")
+
+        signatures = [element_signature(elem) for elem in elements]
+        results = [None] * len(elements)
+
+        # Korrekturen und Cache-Treffer brauchen keinen Batch-Request
+        known = self._lookup_known(signatures)
+        for i, sig in enumerate(signatures):
+            results[i] = known.get(sig)
+        todo = [i for i, r in enumerate(results) if r is None]
+
+        if todo and self.local_threshold is not None:
+            self._answer_locally(elements, signatures, results)
+            todo = [i for i, r in enumerate(results) if r is None]
+
+        if not todo:
+            return results
+
+        # Requests bilden: custom_id → Positionen in 'elements'
+        todo_elements = [elements[i] for i in todo]
+        mapping = {}
+        start = 0
+        while start < len(todo):
+            size = batch_size or self._adaptive_batch_size(todo_elements, start)
+            mapping[f"batch-{len(mapping):05d}"] = todo[start:start + size]
+            start += size
+        fingerprint = hashlib.sha256(
+            json.dumps([self.model, self.system_prompt, [signatures[i] for i in todo]]).encode('utf-8')
+        ).hexdigest()
+
+        # Bestehenden Job fortsetzen (gleiche Elemente, gleicher Prompt)?
+        job = None
+        if os.path.exists(job_file):
+            with open(job_file, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+            if job.get('fingerprint') != fingerprint:
+                print(f"⚠ Job-Datei passt nicht zum aktuellen Input, neuer Job wird erstellt")
+                job = None
+            else:
+                print(f"✓ Setze Batch-Job fort: {job['batch_id']}")
+
+        client = self.client.with_options(max_retries=5)
+
+        if job is None:
+            requests = [
+                {
+                    "custom_id": custom_id,
+                    "params": self._message_params(
+                        self._build_batch_prompt([elements[i] for i in positions]),
+                        self._max_tokens_for(len(positions))
+                    )
+                }
+                for custom_id, positions in mapping.items()
+            ]
+            batch = client.messages.batches.create(requests=requests)
+            self._count('api_calls')
+
+            job = {
+                'batch_id': batch.id,
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'model': self.model,
+                'fingerprint': fingerprint,
+                'mapping': mapping
+            }
+            with open(job_file, 'w', encoding='utf-8') as f:
+                json.dump(job, f, indent=2)
+            print(f"✓ Batch-Job erstellt: {batch.id} ({len(requests)} Requests, Job-Datei: {job_file})")
+
+        # Pollen bis der Job beendet ist
+        while True:
+            batch = client.messages.batches.retrieve(job['batch_id'])
+            counts = batch.request_counts
+            if batch.processing_status == 'ended':
+                break
+            print(f"  Batch-Job {batch.processing_status}: {counts.succeeded} fertig, "
+                  f"{counts.processing} in Bearbeitung...")
+            time.sleep(poll_interval)
+
+        # Ergebnisse zusammenführen
+        for entry in client.messages.batches.results(job['batch_id']):
+            positions = job['mapping'].get(entry.custom_id)
+            if positions is None:
+                continue
+
+            if entry.result.type == 'succeeded':
+                message = entry.result.message
+                self._record_usage(message.usage)
+                batch_results = self._fill_missing(
+                    self._parse_batch_response(message.content[0].text, len(positions))
+                )
+            else:
+                batch_results = [{'code': 'ERROR', 'desc': f"Batch {entry.result.type}", 'conf': 0.0}] * len(positions)
+
+            for i, result in zip(positions, batch_results):
+                results[i] = result
+
+        # Nicht zurückgelieferte Requests markieren
+        results = self._fill_missing(results)
+
+        if self.cache is not None:
+            self.cache.put_many({signatures[i]: results[i] for i in todo})
+
+        job['status'] = 'merged'
+        with open(job_file, 'w', encoding='utf-8') as f:
+            json.dump(job, f, indent=2)
+
+        return results
+
+    def _classify_live(
+        self,
+        elements: List[Dict],
+        batch_size: int,
+        max_concurrency: int,
+        show_progress: bool,
+        debug: bool,
+        log_file: str,
+        stream: bool = False,
+        on_batch_done: Callable[[List[int], List[Dict]], None] = None
+    ) -> List[Dict]:
+        """
+        Klassifiziert Elemente interaktiv (Batches, optional parallel) mit Progress-Bar.
+        Mit stream=True läuft die Progress-Bar pro Element statt pro Batch.
+        on_batch_done wird zusätzlich nach jedem Batch aufgerufen (z.B. Checkpoint).
+        Fortschritt (Elemente/s, ETA, Tokens/s) wird höchstens UPDATES_PER_SECOND mal
+        pro Sekunde ausgegeben, nicht pro Batch.
+        """
+        # Progress-Bar Setup
+        pbar = _progress_bar(len(elements)) if show_progress else None
+
+        total = len(elements)
+        done = {'batches': 0, 'elements': 0}
+        started = time.monotonic()
+        throttle = Throttle(UPDATES_PER_SECOND)
+
+        def report():
+            progress = rates(done['elements'], total, time.monotonic() - started, total_tokens(self.stats))
+            if pbar:
+                pbar.set_postfix_str(f"{progress['tokens_per_second']:,.0f} Tokens/s", refresh=False)
+            else:
+                print(f"{done['elements']}/{total} Elemente ({done['batches']} Batches) | "
+                      f"{progress['elements_per_second']:.1f} Elemente/s | "
+                      f"ETA {format_duration(progress['eta'])} | "
+                      f"{progress['tokens_per_second']:,.0f} Tokens/s")
+
+        def batch_done(positions: List[int], batch_results: List[Dict]):
+            if on_batch_done:
+                on_batch_done(positions, batch_results)
+            done['batches'] += 1
+            done['elements'] += len(positions)
+            if debug:
+                print(f"Batch {done['batches']} "
+                      f"(Elemente {positions[0] + 1}-{positions[-1] + 1}) fertig")
+            if pbar and not stream:
+                pbar.update(len(positions))
+            if throttle.due(force=not pbar and done['elements'] >= total):
+                report()
+
+        def on_element(position: int, result: Dict):
+            pbar.update(1)
+
+        # Batches verarbeiten (Ergebnisse kommen in Input-Reihenfolge zurück)
+        all_results = self.classify_elements(
+            elements,
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+            debug=debug,
+            log_file=log_file,
+            on_batch_done=batch_done,
+            stream=stream,
+            on_element=on_element if (pbar and stream) else None
+        )
+
+        if pbar:
+            pbar.close()
+
+        return all_results
+
+    def _classify_frame(
+        self,
+        df: 'pd.DataFrame',
+        column_mapping: Dict[str, str],
+        dedup: bool,
+        known: Dict[str, Dict],
+        checkpoint: ClassificationCheckpoint,
+        done: Dict,
+        run: Dict
+    ) -> 'pd.DataFrame':
+        """
+        Klassifiziert einen DataFrame (komplette CSV oder ein Chunk) und ergänzt
+        die Spalten eBKP_Code, eBKP_Beschreibung, eBKP_Confidence.
+
+        Args:
+            df: Zeilen des Revit-Exports (Index = Zeilennummer in der CSV)
+            column_mapping: Feld → Spaltenname
+            dedup: Identische Elemente nur einmal klassifizieren
+            known: Bereits klassifizierte Signaturen aus früheren Chunks (wird ergänzt)
+            checkpoint: Checkpoint für fertige Elemente
+            done: Bereits im Checkpoint vorhandene Ergebnisse (resume)
+            run: Lauf-Parameter für _classify_live / classify_bulk
+
+        Returns:
+            df mit den drei neuen Spalten
+        """
+        import pandas as pd
+
+        # Element-Infos extrahieren (vektorisiert, mit sicherer NaN-Behandlung)
+        elements = extract_elements(df, column_mapping)
+
+        # Deduplizierung: gleiche Signatur → nur ein Element klassifizieren
+        element_sigs = pd.Series([element_signature(e) for e in elements], index=df.index)
+        if dedup:
+            signatures = element_sigs
+            keep = ~signatures.duplicated() & ~signatures.isin(known.keys())
+            work_keys = signatures[keep].tolist()
+            elements = [e for e, k in zip(elements, keep) if k]
+        else:
+            signatures = pd.Series(range(len(elements)), index=df.index)
+            keep = pd.Series(True, index=df.index)
+            work_keys = signatures.tolist()
+
+        self.stats['rows'] += len(df)
+        self.stats['unique_elements'] += len(elements)
+
+        # Checkpoint-Schlüssel: (Zeilen-Index, Signatur) des klassifizierten Elements
+        checkpoint_keys = list(zip(element_sigs[keep].index.tolist(), element_sigs[keep].tolist()))
+
+        todo = [j for j, key in enumerate(checkpoint_keys) if key not in done]
+        todo_elements = [elements[j] for j in todo]
+        self.stats['resumed_elements'] += len(elements) - len(todo)
+
+        def save_checkpoint(positions: List[int], batch_results: List[Dict]):
+            checkpoint.append(
+                (checkpoint_keys[todo[p]], result) for p, result in zip(positions, batch_results)
+            )
+
+        if run['bulk']:
+            todo_results = self.classify_bulk(
+                todo_elements,
+                job_file=run['job_file'],
+                batch_size=run['batch_size'],
+                poll_interval=run['poll_interval']
+            )
+            save_checkpoint(list(range(len(todo_results))), todo_results)
+        else:
+            todo_results = self._classify_live(
+                todo_elements, run['batch_size'], run['max_concurrency'], run['show_progress'],
+                run['debug'], run['log_file'], stream=run['stream'], on_batch_done=save_checkpoint
+            )
+
+        # Ergebnisse aus Checkpoint (resume) und diesem Lauf zusammensetzen
+        fresh = dict(zip(todo, todo_results))
+        all_results = [done.get(key) or fresh[j] for j, key in enumerate(checkpoint_keys)]
+
+        # Ergebnisse per Join auf alle Zeilen zurückverteilen
+        if dedup:
+            known.update(zip(work_keys, all_results))
+            frame_keys = signatures.unique().tolist()
+            results_df = pd.DataFrame([known[k] for k in frame_keys], index=frame_keys)
+        else:
+            results_df = pd.DataFrame(all_results, index=work_keys)
+        results_df = results_df.reindex(columns=['code', 'desc', 'conf'])
+
+        joined = signatures.to_frame('key').join(results_df, on='key')
+        df['eBKP_Code'] = joined['code'].to_numpy()
+        df['eBKP_Beschreibung'] = joined['desc'].to_numpy()
+        df['eBKP_Confidence'] = joined['conf'].to_numpy()
+        return df
 
     def classify_csv(
         self,
         input_csv: str,
         output_csv: str = None,
         column_mapping: Dict[str, str] = None,
-        batch_size: int = 40,
+        batch_size: int = None,
         show_progress: bool = True,
         debug: bool = False,
-        log_file: str = None
-    ) -> pd.DataFrame:
+        log_file: str = None,
+        dedup: bool = True,
+        max_concurrency: int = 1,
+        bulk: bool = False,
+        job_file: str = None,
+        poll_interval: float = 60.0,
+        stream: bool = False,
+        resume: bool = False,
+        checkpoint_file: str = None,
+        chunksize: int = None
+    ) -> Optional['pd.DataFrame']:
         """
         Klassifiziert komplette CSV-Datei mit eBKP-H Codes.
 
@@ -335,24 +1666,40 @@ Antworte NUR mit diesem JSON Array (keine Markdown, kein Text davor/danach):
             output_csv: Pfad zur Output-CSV (optional, sonst kein Export)
             column_mapping: Custom Spalten-Mapping (optional)
                            z.B. {'kategorie': 'Category', 'typ': 'Type'}
-            batch_size: Elemente pro API-Call (30-50 empfohlen)
+            batch_size: Elemente pro API-Call (None = adaptiv nach gemessenem Token-Verbrauch)
             show_progress: Progress-Bar anzeigen (benötigt tqdm)
             debug: Debug-Ausgaben aktivieren
             log_file: Pfad zu Log-Datei für API-Response-Logging (optional)
+            dedup: Identische Elemente (gleiche Signatur) nur einmal klassifizieren
+            max_concurrency: Maximale Anzahl paralleler API-Requests (1 = sequenziell)
+            bulk: Offline über die Message Batches API klassifizieren (günstiger, nicht interaktiv)
+            job_file: Job-Datei für den Bulk-Modus (default: <output/input>.bulkjob.json)
+            poll_interval: Sekunden zwischen Status-Abfragen im Bulk-Modus
+            stream: Streaming API verwenden (Fortschritt pro Element)
+            resume: Abgebrochenen Lauf fortsetzen (fertige Elemente aus dem Checkpoint übernehmen)
+            checkpoint_file: Checkpoint-Datei (default: <output/input>.checkpoint.jsonl)
+            chunksize: Zeilen pro Chunk (None = ganze CSV laden). Jeder Chunk wird
+                       klassifiziert und sofort an output_csv angehängt; der Speicherbedarf
+                       hängt dann von der Chunk-Grösse ab, nicht von der Modellgrösse.
 
         Returns:
             DataFrame mit neuen Spalten: eBKP_Code, eBKP_Beschreibung, eBKP_Confidence
+            (None im Chunk-Modus – das Ergebnis steht in output_csv)
         """
+        if chunksize and not output_csv:
+            raise ValueError("chunksize benötigt output_csv (Ergebnisse werden pro Chunk geschrieben)")
+        if chunksize and bulk:
+            raise ValueError("Bulk-Modus und chunksize können nicht kombiniert werden")
+        if bulk and self.hierarchical:
+            raise ValueError("Bulk-Modus unterstützt den hierarchischen Modus nicht")
+
+        import pandas as pd
+
         print(f"\n=== eBKP-H Klassifizierung ===")
         print(f"Input: {input_csv}")
 
-        # CSV einlesen (unterstützt verschiedene Encodings)
-        try:
-            df = pd.read_csv(input_csv, sep=';', encoding='utf-8-sig')
-        except UnicodeDecodeError:
-            df = pd.read_csv(input_csv, sep=';', encoding='latin1')
-
-        print(f"✓ {len(df)} Zeilen eingelesen")
+        # Encoding bestimmen (utf-8-sig, Fallback latin1)
+        encoding = detect_csv_encoding(input_csv)
 
         # Standard Column Mapping
         if column_mapping is None:
@@ -363,24 +1710,19 @@ Antworte NUR mit diesem JSON Array (keine Markdown, kein Text davor/danach):
                 'zusatzinfo': 'Zusatzinfo'
             }
 
-        # Element-Infos extrahieren (mit sicherer NaN-Behandlung)
-        elements = []
-        for _, row in df.iterrows():
-            # Sichere Konvertierung: behandelt NaN, None, float
-            def safe_str(val):
-                if pd.isna(val) or val is None or str(val).lower() == 'nan':
-                    return ''
-                return str(val).strip()
-
-            elements.append({
-                'kategorie': safe_str(row.get(column_mapping['kategorie'], '')),
-                'typ': safe_str(row.get(column_mapping['typ'], '')),
-                'familie': safe_str(row.get(column_mapping['familie'], '')),
-                'zusatzinfo': safe_str(row.get(column_mapping['zusatzinfo'], ''))
-            })
-
-        # Batch-Klassifizierung mit Progress
-        print(f"Klassifizierung (Batch-Size: {batch_size})...")
+        # Checkpoint: fertige Elemente überspringen (resume) oder neu beginnen
+        if checkpoint_file is None:
+            checkpoint_file = os.path.splitext(output_csv or input_csv)[0] + '.checkpoint.jsonl'
+        checkpoint = ClassificationCheckpoint(checkpoint_file)
+        if resume:
+            done = checkpoint.load()
+            print(f"✓ Fortsetzen: {len(done)} Elemente im Checkpoint ({checkpoint_file})")
+        else:
+            checkpoint.reset()
+            done = {}
+
+        if bulk and job_file is None:
+            job_file = os.path.splitext(output_csv or input_csv)[0] + '.bulkjob.json'
 
         # Log-Datei initialisieren
         if log_file:
@@ -389,68 +1731,133 @@ Antworte NUR mit diesem JSON Array (keine Markdown, kein Text davor/danach):
                 f.write(f"eBKP-H Klassifizierung Log\n")
                 f.write(f"Gestartet: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write(f"Input CSV: {input_csv}\n")
-                f.write(f"Elemente: {len(elements)}\n")
-                f.write(f"Batch-Größe: {batch_size}\n")
+                f.write(f"Chunk-Größe: {chunksize or 'ganze Datei'}\n")
+                f.write(f"Batch-Größe: {batch_size or 'adaptiv'}\n")
                 f.write(f"{'='*80}\n")
             print(f"✓ Log-Datei erstellt: {log_file}")
 
-        all_results = []
-
-        # Progress-Bar Setup
-        if show_progress and TQDM_AVAILABLE:
-            pbar = tqdm(total=len(elements), desc="Klassifizierung", unit="elem")
+        run = {
+            'batch_size': batch_size,
+            'max_concurrency': max_concurrency,
+            'show_progress': show_progress,
+            'debug': debug,
+            'log_file': log_file,
+            'stream': stream,
+            'bulk': bulk,
+            'job_file': job_file,
+            'poll_interval': poll_interval,
+        }
+        for key in ('rows', 'unique_elements', 'resumed_elements'):
+            self.stats[key] = 0
+
+        # Laufende Zusammenfassung (im Chunk-Modus liegt nie alles im Speicher)
+        summary = {'conf_sum': 0.0, 'conf_min': None, 'codes': {}, 'descs': {}}
+
+        def summarize(frame: 'pd.DataFrame'):
+            conf = frame['eBKP_Confidence']
+            summary['conf_sum'] += float(conf.sum())
+            frame_min = float(conf.min()) if len(frame) else None
+            if frame_min is not None and (summary['conf_min'] is None or frame_min < summary['conf_min']):
+                summary['conf_min'] = frame_min
+            for code, count in frame['eBKP_Code'].value_counts().items():
+                summary['codes'][code] = summary['codes'].get(code, 0) + int(count)
+            firsts = frame.drop_duplicates('eBKP_Code')
+            for code, desc in zip(firsts['eBKP_Code'], firsts['eBKP_Beschreibung']):
+                summary['descs'].setdefault(code, desc)
+
+        # Gemappte Spalten als Text lesen: sonst wird der Typ pro Chunk inferiert
+        # ('223' vs. '223.0') und Signaturen, Cache- und Checkpoint-Schlüssel hängen
+        # von der Chunk-Grösse ab
+        text_columns = {column: str for column in column_mapping.values() if column}
+
+        known = {}
+        print(f"Klassifizierung (Batch-Size: {batch_size or 'adaptiv'}, parallel: {max_concurrency})...")
+        start_time = time.monotonic()
+
+        if chunksize:
+            reader = pd.read_csv(input_csv, sep=';', encoding=encoding, dtype=text_columns, chunksize=chunksize)
+            for number, chunk in enumerate(reader):
+                chunk = self._classify_frame(chunk, column_mapping, dedup, known, checkpoint, done, run)
+                chunk.to_csv(
+                    output_csv, sep=';', index=False, encoding='utf-8-sig',
+                    mode='w' if number == 0 else 'a', header=number == 0
+                )
+                summarize(chunk)
+                print(f"✓ Chunk {number + 1}: {self.stats['rows']:,} Zeilen geschrieben "
+                      f"({self.stats['unique_elements']:,} Elemente klassifiziert)")
+            df = None
         else:
-            pbar = None
-
-        # Batches verarbeiten
-        num_batches = (len(elements) + batch_size - 1) // batch_size
-        for batch_idx in range(num_batches):
-            start_idx = batch_idx * batch_size
-            end_idx = min(start_idx + batch_size, len(elements))
-            batch = elements[start_idx:end_idx]
-
-            if debug or (not show_progress):
-                print(f"Batch {batch_idx + 1}/{num_batches} "
-                      f"(Elemente {start_idx + 1}-{end_idx})...")
-
-            # Klassifizierung
-            batch_results = self.classify_batch(batch, debug=debug, log_file=log_file)
-            all_results.extend(batch_results)
-
-            # Progress update
-            if pbar:
-                pbar.update(len(batch))
-
-        if pbar:
-            pbar.close()
-
-        # Ergebnisse in DataFrame schreiben
-        df['eBKP_Code'] = [r['code'] for r in all_results]
-        df['eBKP_Beschreibung'] = [r['desc'] for r in all_results]
-        df['eBKP_Confidence'] = [r['conf'] for r in all_results]
+            df = pd.read_csv(input_csv, sep=';', encoding=encoding, dtype=text_columns)
+            print(f"✓ {len(df)} Zeilen eingelesen")
+            df = self._classify_frame(df, column_mapping, dedup, known, checkpoint, done, run)
+            summarize(df)
+
+        rows = self.stats['rows']
+        unique = self.stats['unique_elements']
+        elapsed = time.monotonic() - start_time
+        classified = unique - self.stats['resumed_elements']
+        self.stats['dedup_ratio'] = rows / unique if unique else 1.0
+        self.stats['elapsed_seconds'] = elapsed
+        self.stats['elements_per_second'] = classified / elapsed if elapsed > 0 else 0.0
+
+        if dedup:
+            print(f"✓ Deduplizierung: {rows} Zeilen → {unique} eindeutige Elemente "
+                  f"(Faktor {self.stats['dedup_ratio']:.1f}x)")
+        if resume:
+            print(f"✓ {self.stats['resumed_elements']} von {unique} Elementen aus Checkpoint übernommen")
 
         # Statistik
         print(f"\n✓ Klassifizierung abgeschlossen!")
-        print(f"  - {len(df)} Elemente klassifiziert")
-        print(f"  - Durchschnittliche Confidence: {df['eBKP_Confidence'].mean():.1%}")
-        print(f"  - Niedrigste Confidence: {df['eBKP_Confidence'].min():.1%}")
+        print(f"  - {rows} Elemente klassifiziert")
+        if dedup:
+            print(f"  - {unique} eindeutige Elemente an Classifier "
+                  f"(Reduktion {1 - unique / max(rows, 1):.1%})")
+        print(f"  - Durchschnittliche Confidence: {summary['conf_sum'] / max(rows, 1):.1%}")
+        print(f"  - Niedrigste Confidence: {summary['conf_min'] or 0.0:.1%}")
+        if self.cache is not None:
+            print(f"  - Cache: {self.stats['cache_hits']} Treffer, "
+                  f"{self.stats['cache_misses']} Misses, {self.stats['api_calls']} API-Calls")
+        print(f"  - Tokens: Input={self.stats['input_tokens']:,}, Output={self.stats['output_tokens']:,}, "
+              f"Cache-Read={self.stats['cache_read_tokens']:,}, "
+              f"Cache-Write={self.stats['cache_write_tokens']:,}")
+        truncation_rate = self.stats['truncated_batches'] / max(self.stats['api_calls'], 1)
+        print(f"  - Durchsatz: {self.stats['elements_per_second']:.1f} Elemente/s, "
+              f"Ø {self.stats['output_tokens_per_element']:.1f} Output-Tokens/Element, "
+              f"Truncation-Rate {truncation_rate:.1%}")
+        if self.stats['corrected_elements']:
+            print(f"  - Korrekturen: {self.stats['corrected_elements']} Elemente aus manuellen Korrekturen")
+        if self.stats['few_shot_examples']:
+            print(f"  - Few-Shot: {self.stats['few_shot_examples']} Beispiele in "
+                  f"{self.stats['api_calls']} API-Calls")
+        if self.hierarchical:
+            print(f"  - Hierarchisch (Level {self.target_level}): {self.stats['local_groups']} "
+                  f"Hauptgruppen lokal bestimmt")
+        if self.local_threshold is not None:
+            print(f"  - Lokal: {self.stats['local_hits']} Elemente ohne API-Call beantwortet "
+                  f"(Schwellenwert {self.local_threshold:.0%})")
+        if self.stats['repaired_codes'] or self.stats['invalid_codes']:
+            print(f"  - Codes: {self.stats['repaired_codes']} repariert, "
+                  f"{self.stats['invalid_codes']} ungültig (nachgefragt)")
+        sched = self.scheduler.stats
+        if sched['retries'] or sched['wait_seconds']:
+            print(f"  - Rate-Limits: {sched['throttled']}x gedrosselt, {sched['retries']} Retries, "
+                  f"{sched['wait_seconds']:.1f}s gewartet, min. Parallelität {sched['min_concurrency']}")
 
         # Top 5 Codes
         print(f"\nTop 5 eBKP Codes:")
-        top_codes = df['eBKP_Code'].value_counts().head(5)
-        for code, count in top_codes.items():
-            desc = df[df['eBKP_Code'] == code]['eBKP_Beschreibung'].iloc[0]
-            print(f"  - {code} ({desc}): {count}x")
+        top_codes = sorted(summary['codes'].items(), key=lambda item: -item[1])[:5]
+        for code, count in top_codes:
+            print(f"  - {code} ({summary['descs'][code]}): {count}x")
 
-        # Optional: CSV exportieren
+        # Optional: CSV exportieren (im Chunk-Modus bereits geschrieben)
         if output_csv:
-            df.to_csv(output_csv, sep=';', index=False, encoding='utf-8-sig')
+            if df is not None:
+                df.to_csv(output_csv, sep=';', index=False, encoding='utf-8-sig')
             print(f"\n✓ Output gespeichert: {output_csv}")
 
         return df
 
 
-# Convenience-Funktion für einfache Nutzung
 def classify_revit_element(kategorie: str = "", typ: str = "", **kwargs) -> Dict:
     """
     Quick-Helper: Klassifiziert ein einzelnes Element.
@@ -485,6 +1892,12 @@ Beispiele:
   # Custom Batch-Size und Debug
   python eBKP_H_Classifier.py input.csv -b 50 --debug
 
+  # 4 Batches parallel senden
+  python eBKP_H_Classifier.py input.csv -j 4
+
+  # Offline über Message Batches API (Job-Datei erlaubt Fortsetzen nach Neustart)
+  python eBKP_H_Classifier.py input.csv -o output.csv --bulk
+
   # Ohne Progress-Bar
   python eBKP_H_Classifier.py input.csv --no-progress
         """
@@ -492,12 +1905,55 @@ Beispiele:
 
     parser.add_argument('input_csv', help='Input CSV Datei (z.B. Revit Export)')
     parser.add_argument('-o', '--output', help='Output CSV Datei (optional)')
-    parser.add_argument('-b', '--batch-size', type=int, default=40,
-                        help='Batch-Größe (30-50 empfohlen, default: 40)')
+    parser.add_argument('-b', '--batch-size', type=int, default=None,
+                        help='Feste Batch-Größe (default: adaptiv nach Token-Verbrauch)')
+    parser.add_argument('-j', '--concurrency', type=int, default=1,
+                        help='Maximale Anzahl paralleler API-Requests (default: 1)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Streaming API verwenden (Ergebnisse pro Element)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Abgebrochenen Lauf aus dem Checkpoint fortsetzen')
+    parser.add_argument('--checkpoint',
+                        help='Checkpoint-Datei (default: <output>.checkpoint.jsonl)')
+    parser.add_argument('--chunksize', type=int,
+                        help='CSV in Chunks lesen und pro Chunk schreiben (für sehr grosse Exporte)')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Offline über die Message Batches API klassifizieren (50%% günstiger)')
+    parser.add_argument('--job-file',
+                        help='Job-Datei für --bulk (default: <output>.bulkjob.json)')
+    parser.add_argument('--poll-interval', type=float, default=60.0,
+                        help='Sekunden zwischen Status-Abfragen im Bulk-Modus (default: 60)')
+    parser.add_argument('--rpm', type=float,
+                        help='Requests pro Minute (default: aus API-Headern)')
+    parser.add_argument('--itpm', type=float,
+                        help='Input-Tokens pro Minute (default: aus API-Headern)')
+    parser.add_argument('--otpm', type=float,
+                        help='Output-Tokens pro Minute (default: aus API-Headern)')
     parser.add_argument('--no-progress', action='store_true',
                         help='Progress-Bar deaktivieren')
     parser.add_argument('--debug', action='store_true',
                         help='Debug-Modus (zeigt API Requests/Responses)')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='Identische Elemente nicht zusammenfassen')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Persistenten Klassifizierungs-Cache deaktivieren')
+    parser.add_argument('--cache-path',
+                        help='Pfad zur Cache-Datei (default: Cache/ebkp_classification_cache.sqlite)')
+    parser.add_argument('--no-corrections', action='store_true',
+                        help='Manuelle Korrekturen (Seite "BKP Bearbeiten") nicht anwenden')
+    parser.add_argument('--few-shot', type=int, default=0, metavar='K',
+                        help='K ähnlichste bestätigte Beispiele pro Element in den Prompt (default: 0 = aus)')
+    parser.add_argument('--few-shot-tokens', type=int, default=FEW_SHOT_TOKENS,
+                        help=f'Token-Budget für Beispiele pro Batch (default: {FEW_SHOT_TOKENS})')
+    parser.add_argument('--level', type=int, default=2,
+                        help='Level der Codes (default: 2; > 2 nur mit --hierarchical)')
+    parser.add_argument('--hierarchical', action='store_true',
+                        help='Zweistufig: erst Hauptgruppe, dann nur deren Teilbaum im Prompt')
+    parser.add_argument('--group-threshold', type=float, default=GROUP_THRESHOLD,
+                        help=f'Hauptgruppe lokal bestimmen ab dieser Confidence (default: {GROUP_THRESHOLD})')
+    parser.add_argument('--local-threshold', type=float,
+                        help='Elemente mit lokaler Confidence ab diesem Wert ohne API-Call '
+                             'beantworten (z.B. 0.8, default: aus)')
 
     args = parser.parse_args()
 
@@ -508,7 +1964,23 @@ Beispiele:
 
     try:
         # Classifier initialisieren
-        classifier = eBKPHClassifier()
+        classifier = eBKPHClassifier(
+            use_cache=not args.no_cache,
+            cache_path=args.cache_path,
+            local_threshold=args.local_threshold,
+            use_corrections=not args.no_corrections,
+            few_shot_k=args.few_shot,
+            few_shot_tokens=args.few_shot_tokens,
+            target_level=args.level,
+            hierarchical=args.hierarchical,
+            group_threshold=args.group_threshold,
+            scheduler=RequestScheduler(
+                requests_per_minute=args.rpm,
+                input_tokens_per_minute=args.itpm,
+                output_tokens_per_minute=args.otpm,
+                max_concurrency=args.concurrency
+            )
+        )
 
         # Klassifizierung ausführen
         df = classifier.classify_csv(
@@ -516,7 +1988,16 @@ Beispiele:
             output_csv=args.output,
             batch_size=args.batch_size,
             show_progress=not args.no_progress,
-            debug=args.debug
+            debug=args.debug,
+            dedup=not args.no_dedup,
+            max_concurrency=args.concurrency,
+            bulk=args.bulk,
+            job_file=args.job_file,
+            poll_interval=args.poll_interval,
+            stream=args.stream,
+            resume=args.resume,
+            checkpoint_file=args.checkpoint,
+            chunksize=args.chunksize
         )
 
         # Erfolg
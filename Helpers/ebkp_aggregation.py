@@ -0,0 +1,236 @@
+"""
+Aggregation für die eBKP-H Auswertung
+
+Statt pro Rerun BKP-Spalten mit .apply() abzuleiten und für jede Haupt- und
+Untergruppe erneut zu filtern und zu gruppieren, wird einmal ein Würfel
+(Hauptgruppe × Untergruppe × Code) mit Anzahl und Summen der Kennzahlen
+(Kosten, Fläche, Menge) gebaut. Alle Ebenen darüber sind Summen über die
+wenigen Würfel-Zeilen; die Zeilen einer Untergruppe liegen als Positionen vor.
+
+Die Seite hält den Würfel pro Inhalts-Hash des DataFrames (frame_fingerprint),
+Reruns ohne geänderte Daten rechnen nichts neu.
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# eBKP-H Hauptgruppen Definition
+EBKP_HAUPTGRUPPEN = {
+    'C': 'Bauwerk - Rohbau',
+    'D': 'Bauwerk - Technik',
+    'E': 'Bauwerk - Ausbau',
+    'F': 'Umgebung',
+    'G': 'Baunebenkosten'
+}
+
+# Gruppe für fehlende oder unbekannte Codes
+UNKNOWN = 'Unbekannt'
+
+# Spalten der Kennzahlen (Fläche: erste vorhandene Variante)
+KOSTEN_COLUMN = 'Kosten'
+FLAECHE_COLUMNS = ('Fläche (m²)', 'Fläche')
+MENGE_COLUMN = 'Menge'
+
+# Schlüssel des Würfels
+HIERARCHY = ['BKP_Hauptgruppe', 'BKP_Untergruppe', 'BKP_Code']
+
+
+def flaeche_column(columns: Iterable[str]) -> Optional[str]:
+    """Name der Flächen-Spalte ('Fläche (m²)' oder 'Fläche') oder None"""
+    columns = set(columns)
+    return next((col for col in FLAECHE_COLUMNS if col in columns), None)
+
+
+def measure_columns(columns: Iterable[str]) -> List[str]:
+    """Vorhandene Kennzahl-Spalten in der Reihenfolge Kosten, Fläche, Menge"""
+    columns = list(columns)
+    measures = [KOSTEN_COLUMN] if KOSTEN_COLUMN in columns else []
+    flaeche = flaeche_column(columns)
+    if flaeche:
+        measures.append(flaeche)
+    if MENGE_COLUMN in columns:
+        measures.append(MENGE_COLUMN)
+    return measures
+
+
+def hierarchy_columns(codes: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hauptgruppe ('C' aus 'C1.1') und Untergruppe ('C1' aus 'C1.1') pro Zeile.
+
+    Die String-Operationen laufen vektorisiert über die eindeutigen Codes
+    (meist < 100) und werden danach per Position auf alle Zeilen verteilt.
+
+    Args:
+        codes: Spalte BKP_Code
+
+    Returns:
+        (hauptgruppe, untergruppe) als Arrays in Zeilen-Reihenfolge
+    """
+    positions, uniques = pd.factorize(codes, use_na_sentinel=True)
+    hauptgruppe, untergruppe = _hierarchy(uniques)
+    return hauptgruppe.take(positions), untergruppe.take(positions)
+
+
+def _hierarchy(uniques) -> Tuple[np.ndarray, np.ndarray]:
+    """Hauptgruppe/Untergruppe pro eindeutigem Code, plus ein letzter Eintrag für fehlende Codes"""
+    raw = pd.Index(uniques, dtype=object).astype(str)
+    text = raw.str.strip()
+    empty = np.asarray(raw == '')
+
+    first = text.str[:1].str.upper()
+    hauptgruppe = np.where(first.isin(list(EBKP_HAUPTGRUPPEN)) & ~empty, first, UNKNOWN)
+
+    # Alles bis zum ersten Punkt, sonst die ersten zwei Zeichen
+    has_dot = np.asarray(text.str.contains('.', regex=False), dtype=bool)
+    untergruppe = np.where(has_dot, text.str.split('.', n=1).str[0], text.str[:2])
+    untergruppe = np.where(empty, UNKNOWN, untergruppe)
+
+    # Letzter Eintrag für fehlende Codes (factorize: Position -1)
+    return np.append(hauptgruppe.astype(object), UNKNOWN), np.append(untergruppe.astype(object), UNKNOWN)
+
+
+def frame_fingerprint(df: pd.DataFrame, columns: Iterable[str] = None) -> str:
+    """
+    Inhalts-Hash (SHA-256) der für die Auswertung relevanten Spalten.
+
+    Args:
+        df: DataFrame mit BKP_Code
+        columns: Zu hashende Spalten (default: BKP_Code, BKP_Beschreibung, Kennzahlen)
+
+    Returns:
+        Hex-Digest, ändert sich bei jeder Änderung von Werten, Zeilen oder Spalten
+    """
+    if columns is None:
+        columns = ['BKP_Code'] + (['BKP_Beschreibung'] if 'BKP_Beschreibung' in df.columns else [])
+        columns += measure_columns(df.columns)
+    columns = list(columns)
+
+    digest = hashlib.sha256(repr(columns).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class AggregationCube:
+    """
+    Anzahl und Kennzahl-Summen pro Hauptgruppe, Untergruppe und Code, in einem
+    Durchgang über den DataFrame gebaut. Read-only, kann geteilt werden.
+
+    Usage:
+        cube = AggregationCube.build(df)
+        cube.totals                    # {'Anzahl': 120, 'Kosten': 1.2e6}
+        cube.hauptgruppen              # DataFrame pro Hauptgruppe
+        cube.untergruppen('C')         # DataFrame pro Untergruppe
+        cube.codes('C', 'C1')          # DataFrame pro Code (und Beschreibung)
+        df.iloc[cube.rows('C', 'C1')]  # Zeilen einer Untergruppe
+    """
+
+    def __init__(
+        self,
+        cube: pd.DataFrame,
+        measures: List[str],
+        hauptgruppe: np.ndarray,
+        untergruppe: np.ndarray,
+        order: np.ndarray
+    ):
+        """
+        Args:
+            cube: Eine Zeile pro (Hauptgruppe, Untergruppe, Code[, Beschreibung]), sortiert
+            measures: Kennzahl-Spalten im Würfel
+            hauptgruppe: Hauptgruppe pro Zeile des DataFrames
+            untergruppe: Untergruppe pro Zeile des DataFrames
+            order: Zeilenpositionen, sortiert nach Würfel-Zeile
+        """
+        self.cube = cube
+        self.measures = measures
+        self.hauptgruppe = hauptgruppe
+        self.untergruppe = untergruppe
+        self.has_beschreibung = 'BKP_Beschreibung' in cube.columns
+
+        values = ['Anzahl'] + measures
+        self.totals: Dict[str, float] = {col: cube[col].sum() for col in values}
+        self.unique_codes = cube['BKP_Code'].nunique()
+        self.hauptgruppen = cube.groupby('BKP_Hauptgruppe', sort=True)[values].sum().reset_index()
+
+        # Zeilen pro Untergruppe: die Würfel-Zeilen einer Untergruppe sind zusammenhängend
+        ends = cube['Anzahl'].to_numpy().cumsum()
+        starts = ends - cube['Anzahl'].to_numpy()
+
+        self._untergruppen: Dict[str, pd.DataFrame] = {}
+        self._codes: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self._rows: Dict[Tuple[str, str], np.ndarray] = {}
+        for hg, hg_cube in cube.groupby('BKP_Hauptgruppe', sort=True):
+            self._untergruppen[hg] = hg_cube.groupby('BKP_Untergruppe', sort=True)[values].sum().reset_index()
+            for ug, ug_cube in hg_cube.groupby('BKP_Untergruppe', sort=True):
+                first, last = ug_cube.index[0], ug_cube.index[-1]
+                self._codes[(hg, ug)] = ug_cube.reset_index(drop=True)
+                self._rows[(hg, ug)] = np.sort(order[starts[first]:ends[last]])
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> 'AggregationCube':
+        """
+        Baut den Würfel in einem Durchgang: Code und Beschreibung werden
+        faktorisiert, Anzahl und Summen per np.bincount über die Gruppen-Nummer.
+
+        Args:
+            df: DataFrame mit BKP_Code, optional BKP_Beschreibung, Kosten, Fläche (m²)/Fläche, Menge
+
+        Returns:
+            AggregationCube
+        """
+        measures = measure_columns(df.columns)
+
+        # Codes faktorisieren (fehlend: -1 → letzter Eintrag, Code None), Hierarchie nur pro eindeutigem Code
+        code_pos, code_uniques = pd.factorize(df['BKP_Code'], use_na_sentinel=True)
+        hg_unique, ug_unique = _hierarchy(code_uniques)
+        code_labels = np.append(pd.Index(code_uniques, dtype=object).astype(str).to_numpy(), None)
+        code_pos = np.where(code_pos < 0, len(code_uniques), code_pos)
+
+        keys = HIERARCHY[:]
+        if 'BKP_Beschreibung' in df.columns:
+            keys.append('BKP_Beschreibung')
+            desc_pos, desc_uniques = pd.factorize(df['BKP_Beschreibung'].fillna('').astype(str))
+        else:
+            desc_pos, desc_uniques = np.zeros(len(df), dtype=np.intp), np.array([''])
+
+        # Gruppe = (Code, Beschreibung); Anzahl und Summen pro Gruppe
+        group_pos, group_keys = pd.factorize(code_pos * len(desc_uniques) + desc_pos)
+        group_code, group_desc = np.divmod(group_keys, len(desc_uniques))
+        cube = {
+            'BKP_Hauptgruppe': hg_unique[group_code],
+            'BKP_Untergruppe': ug_unique[group_code],
+            'BKP_Code': code_labels[group_code],
+            'BKP_Beschreibung': np.asarray(desc_uniques, dtype=object)[group_desc],
+            'Anzahl': np.bincount(group_pos, minlength=len(group_keys)),
+        }
+        for col in measures:
+            values = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype=float)
+            cube[col] = np.bincount(group_pos, weights=values, minlength=len(group_keys))
+        cube = pd.DataFrame(cube)[keys + ['Anzahl'] + measures]
+
+        # Sortieren; Zeilenpositionen nach (sortierter) Würfel-Zeile
+        cube = cube.sort_values(keys, kind='stable')
+        rank = np.empty(len(cube), dtype=np.intp)
+        rank[cube.index.to_numpy()] = np.arange(len(cube))
+        order = np.argsort(rank[group_pos], kind='stable')
+        cube = cube.reset_index(drop=True)
+
+        return cls(cube, measures, hg_unique.take(code_pos), ug_unique.take(code_pos), order)
+
+    def untergruppen(self, hauptgruppe: str) -> pd.DataFrame:
+        """Anzahl und Kennzahlen pro Untergruppe einer Hauptgruppe"""
+        empty = pd.DataFrame(columns=['BKP_Untergruppe', 'Anzahl'] + self.measures)
+        return self._untergruppen.get(hauptgruppe, empty)
+
+    def codes(self, hauptgruppe: str, untergruppe: str) -> pd.DataFrame:
+        """Anzahl und Kennzahlen pro Code (und Beschreibung) einer Untergruppe"""
+        return self._codes.get((hauptgruppe, untergruppe), self.cube.iloc[:0])
+
+    def rows(self, hauptgruppe: str, untergruppe: str = None) -> np.ndarray:
+        """Zeilenpositionen (für df.iloc) einer Untergruppe oder ganzen Hauptgruppe"""
+        if untergruppe is not None:
+            return self._rows.get((hauptgruppe, untergruppe), np.empty(0, dtype=np.intp))
+        parts = [rows for (hg, _), rows in self._rows.items() if hg == hauptgruppe]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
@@ -0,0 +1,187 @@
+"""
+Persistenter Klassifizierungs-Cache für eBKPHClassifier
+Speichert Ergebnisse pro normalisierter Element-Signatur auf Disk (SQLite).
+
+Der Schlüssel besteht aus:
+- Element-Signatur (Kategorie, Typ, Familie, Zusatzinfo – normalisiert)
+- Kontext-Hash (Katalog + System Prompt + Modell)
+
+Ändert sich Katalog, Prompt oder Modell, werden alte Einträge automatisch
+nicht mehr getroffen.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Felder, die ein Element eindeutig beschreiben (Reihenfolge ist Teil der Signatur)
+SIGNATURE_FIELDS = ('kategorie', 'typ', 'familie', 'zusatzinfo')
+
+# Codes, die nie gecacht werden (Fehler, fehlende Ergebnisse)
+UNCACHEABLE_CODES = {'ERROR', 'MISSING', 'UNKNOWN', 'PARSE_ERROR'}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_value(value) -> str:
+    """Normalisiert einen Feldwert (NaN/None → '', Whitespace, Kleinschreibung)"""
+    if value is None:
+        return ''
+    text = str(value).strip()
+    if text.lower() in ('', 'nan', 'none'):
+        return ''
+    return _WHITESPACE_RE.sub(' ', text).lower()
+
+
+def element_signature(element: Dict) -> str:
+    """
+    Erzeugt die normalisierte Signatur eines Elements.
+
+    Args:
+        element: Dict mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
+
+    Returns:
+        Signatur-String (Felder mit '|' getrennt)
+    """
+    return '|'.join(normalize_value(element.get(field)) for field in SIGNATURE_FIELDS)
+
+
+def context_hash(*parts: str) -> str:
+    """Berechnet einen stabilen Hash über Katalog, System Prompt und Modell"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()[:16]
+
+
+def default_cache_path() -> str:
+    """Default-Pfad: <Repo>/Cache/ebkp_classification_cache.sqlite"""
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(repo_dir, 'Cache', 'ebkp_classification_cache.sqlite')
+
+
+class ClassificationCache:
+    """
+    Content-adressierter Cache für Klassifizierungsergebnisse.
+    Thread-safe, damit mehrere Batches parallel lesen/schreiben können.
+    """
+
+    def __init__(self, path: str = None, context: str = ''):
+        """
+        Args:
+            path: Pfad zur SQLite-Datei (default: Cache/ebkp_classification_cache.sqlite)
+            context: Kontext-Hash (siehe context_hash)
+        """
+        self.path = path or default_cache_path()
+        self.context = context
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            " key TEXT PRIMARY KEY,"
+            " signature TEXT NOT NULL,"
+            " context TEXT NOT NULL,"
+            " result TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, signature: str) -> str:
+        return hashlib.sha256(f"{self.context}\x00{signature}".encode('utf-8')).hexdigest()
+
+    def get_many(self, signatures: List[str]) -> Dict[str, Dict]:
+        """
+        Liest mehrere Signaturen auf einmal.
+
+        Returns:
+            Dict Signatur → Ergebnis (nur Treffer)
+        """
+        if not signatures:
+            return {}
+
+        keys = {self._key(sig): sig for sig in set(signatures)}
+        found = {}
+        key_list = list(keys)
+
+        with self._lock:
+            # SQLite Limit für Parameter beachten
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, result FROM classifications WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, result in rows:
+                    found[keys[key]] = json.loads(result)
+
+        return found
+
+    def get(self, signature: str) -> Optional[Dict]:
+        """Liest ein einzelnes Ergebnis (oder None)"""
+        return self.get_many([signature]).get(signature)
+
+    def put_many(self, items: Dict[str, Dict]):
+        """
+        Speichert mehrere Ergebnisse. Fehler-Ergebnisse werden übersprungen.
+
+        Args:
+            items: Dict Signatur → Ergebnis ('code', 'desc', 'conf')
+        """
+        rows = [
+            (self._key(sig), sig, self.context, json.dumps(result, ensure_ascii=False))
+            for sig, result in items.items()
+            if result.get('code') not in UNCACHEABLE_CODES
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO classifications (key, signature, context, result) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def items(self, all_contexts: bool = False) -> Iterator[Tuple[str, Dict]]:
+        """
+        Alle Einträge des aktuellen Kontexts.
+
+        Args:
+            all_contexts: Auch Einträge anderer Kontexte (älterer Katalog/Prompt/Modell)
+
+        Returns:
+            Iterator über (Signatur, Ergebnis)
+        """
+        with self._lock:
+            if all_contexts:
+                rows = self._conn.execute("SELECT signature, result FROM classifications").fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT signature, result FROM classifications WHERE context = ?", (self.context,)
+                ).fetchall()
+        for signature, result in rows:
+            yield signature, json.loads(result)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM classifications WHERE context = ?", (self.context,)
+            ).fetchone()[0]
+
+    def clear(self):
+        """Löscht alle Einträge des aktuellen Kontexts"""
+        with self._lock:
+            self._conn.execute("DELETE FROM classifications WHERE context = ?", (self.context,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
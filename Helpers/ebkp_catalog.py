@@ -0,0 +1,358 @@
+"""
+eBKP-H Katalog-Index
+
+Lädt Helpers/eBKP-H.csv einmal in eine kompakte Struktur:
+- Code → Eintrag (Beschreibung, Level, Parent) in O(1)
+- Parent/Children-Verknüpfung und Codes pro Level
+- Prefix-Lookup über sortierte Code-Liste (bisect)
+- Reparatur fast gültiger Codes ('C2' → 'C02', 'C02.01' → 'C02', Tippfehler)
+
+Der Index wird als Pickle in Cache/ebkp_catalog.pickle gespeichert und bei
+geänderter CSV (mtime/Grösse, danach SHA-256) neu gebaut. Innerhalb eines
+Prozesses wird der Katalog nur einmal geladen.
+
+Kommt ohne pandas aus, damit Validierung und Classifier-Start schnell bleiben.
+"""
+
+import os
+import re
+import csv
+import pickle
+import bisect
+import hashlib
+from typing import Dict, List, NamedTuple, Optional
+
+# Version des Pickle-Formats (erhöhen, wenn sich die Struktur ändert)
+CACHE_FORMAT = 1
+
+# Stellen pro Code-Segment ab Level 2: C02, C02.01, C02.01.001, C02.01.001.001
+SEGMENT_WIDTHS = (2, 2, 3, 3)
+
+_RAW_CODE_RE = re.compile(r'^([A-Z])(\d+)?((?:\.\d+)*)$')
+
+
+class CatalogEntry(NamedTuple):
+    """Ein Code aus dem eBKP-H Katalog"""
+    code: str
+    description: str
+    level: int
+    parent: Optional[str]
+
+
+def parent_code(code: str) -> Optional[str]:
+    """
+    Leitet den Parent-Code aus der Code-Struktur ab.
+
+    Beispiele: 'C02.01' → 'C02', 'C02' → 'C', 'C' → None
+    """
+    if '.' in code:
+        return code.rsplit('.', 1)[0]
+    if len(code) > 1:
+        return code[0]
+    return None
+
+
+def normalize_code(raw) -> str:
+    """
+    Bringt einen Code in die Katalog-Schreibweise.
+
+    Beispiele: 'c2' → 'C02', 'C 02' → 'C02', 'CO2' → 'C02', 'C2.1' → 'C02.01'
+    Nicht erkennbare Formate werden nur bereinigt (Grossbuchstaben, ohne Leerzeichen).
+    """
+    code = re.sub(r'[\s\-_]', '', str(raw).upper()).replace(',', '.').strip('.')
+    if len(code) > 1:
+        # Buchstabe O statt Ziffer 0 nach der Hauptgruppe
+        code = code[0] + code[1:].replace('O', '0')
+
+    match = _RAW_CODE_RE.match(code)
+    if not match or not match.group(2):
+        return code
+
+    letter, first, rest = match.groups()
+    segments = [first] + [seg for seg in rest.split('.') if seg]
+    padded = []
+    for seg, width in zip(segments, SEGMENT_WIDTHS):
+        if len(seg) > width:
+            seg = seg.lstrip('0') or '0'
+        padded.append(seg.zfill(width))
+    return letter + '.'.join(padded)
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Damerau-Levenshtein-Distanz (Vertauschung zweier Nachbarn zählt 1)"""
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 \
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def _deletions(code: str) -> set:
+    """Der Code selbst plus alle Varianten mit einem gelöschten Zeichen"""
+    return {code} | {code[:i] + code[i + 1:] for i in range(len(code))}
+
+
+def default_catalog_path() -> str:
+    """Default-Pfad: Helpers/eBKP-H.csv"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eBKP-H.csv')
+
+
+def default_catalog_cache_path() -> str:
+    """Default-Pfad: <Repo>/Cache/ebkp_catalog.pickle"""
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(repo_dir, 'Cache', 'ebkp_catalog.pickle')
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+class EBKPCatalog:
+    """
+    Kompakter Index über den eBKP-H Katalog.
+
+    Usage:
+        catalog = load_catalog()
+        catalog.get('C02').description
+        catalog.children_of('C')        # ['C01', 'C02', ...]
+        catalog.with_prefix('C02.')     # alle Untercodes von C02
+    """
+
+    def __init__(self, entries: List[CatalogEntry], fingerprint: str = ''):
+        """
+        Args:
+            entries: Katalog-Einträge in CSV-Reihenfolge
+            fingerprint: SHA-256 der Quell-CSV
+        """
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, CatalogEntry] = {}
+        self.children: Dict[Optional[str], List[str]] = {}
+        self.levels: Dict[int, List[str]] = {}
+
+        for entry in entries:
+            self.entries[entry.code] = entry
+            self.children.setdefault(entry.parent, []).append(entry.code)
+            self.levels.setdefault(entry.level, []).append(entry.code)
+
+        self._sorted_codes = sorted(self.entries)
+        self._near_index: Dict[int, Dict[str, set]] = {}
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> 'EBKPCatalog':
+        """Parst die Katalog-CSV (Spalten Code, Description, Level)"""
+        entries = []
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                code = (row.get('Code') or '').strip()
+                if not code:
+                    continue
+                entries.append(CatalogEntry(
+                    code=code,
+                    description=(row.get('Description') or '').strip(),
+                    level=int(row['Level']),
+                    parent=parent_code(code)
+                ))
+        return cls(entries, fingerprint=_file_hash(csv_path))
+
+    # ------------------------------------------------------------------
+    # Serialisierung (nur Basistypen, unabhängig vom Import-Pfad des Moduls)
+    # ------------------------------------------------------------------
+
+    def to_state(self) -> Dict:
+        return {
+            'fingerprint': self.fingerprint,
+            'entries': [tuple(entry) for entry in self.entries.values()],
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'EBKPCatalog':
+        return cls([CatalogEntry(*entry) for entry in state['entries']], state['fingerprint'])
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, code) -> bool:
+        return code in self.entries
+
+    def get(self, code: str) -> Optional[CatalogEntry]:
+        """Eintrag zu einem Code (oder None)"""
+        return self.entries.get(code)
+
+    def description(self, code: str, default: str = '') -> str:
+        entry = self.entries.get(code)
+        return entry.description if entry else default
+
+    def parent(self, code: str) -> Optional[str]:
+        entry = self.entries.get(code)
+        return entry.parent if entry else None
+
+    def children_of(self, code: Optional[str]) -> List[str]:
+        """Direkte Untercodes (code=None → Level 1 Hauptgruppen)"""
+        return self.children.get(code, [])
+
+    def ancestors(self, code: str) -> List[str]:
+        """Alle übergeordneten Codes, vom direkten Parent bis Level 1"""
+        result = []
+        parent = self.parent(code)
+        while parent is not None:
+            result.append(parent)
+            parent = self.parent(parent)
+        return result
+
+    def level_codes(self, level: int) -> List[str]:
+        """Alle Codes eines Levels (CSV-Reihenfolge)"""
+        return self.levels.get(level, [])
+
+    def with_prefix(self, prefix: str) -> List[str]:
+        """Alle Codes, die mit prefix beginnen (sortiert)"""
+        start = bisect.bisect_left(self._sorted_codes, prefix)
+        end = bisect.bisect_left(self._sorted_codes, prefix + '\uffff')
+        return self._sorted_codes[start:end]
+
+    # ------------------------------------------------------------------
+    # Validierung & Reparatur
+    # ------------------------------------------------------------------
+
+    def _near_codes(self, code: str, level: int) -> List[str]:
+        """
+        Codes eines Levels mit Edit-Distanz 1 in derselben Hauptgruppe.
+        Index: Lösch-Varianten → Codes (pro Level einmal aufgebaut).
+        """
+        index = self._near_index.get(level)
+        if index is None:
+            index = {}
+            for candidate in self.level_codes(level):
+                for variant in _deletions(candidate):
+                    index.setdefault(variant, set()).add(candidate)
+            self._near_index[level] = index
+
+        candidates = set()
+        for variant in _deletions(code):
+            candidates |= index.get(variant, set())
+
+        return sorted(
+            candidate for candidate in candidates
+            if candidate[0] == code[:1] and edit_distance(code, candidate) == 1
+        )
+
+    def repair(self, code: str, level: int = 2, leaf_ok: bool = False) -> Optional[str]:
+        """
+        Liefert den gültigen Katalog-Code auf 'level' für eine Modell-Antwort.
+
+        Reihenfolge:
+        1. Schreibweise normalisieren ('C2' → 'C02')
+        2. Tiefere Codes auf 'level' kürzen ('C02.01.001' → 'C02', auch erfundene Untercodes)
+        3. Eindeutiger Nachbar mit Edit-Distanz 1 in derselben Hauptgruppe ('C20' → 'C02')
+
+        Args:
+            code: Code aus der Modell-Antwort
+            level: Gewünschtes Level (default: 2)
+            leaf_ok: Codes oberhalb von 'level' ohne Untercodes sind gültig
+                     (Zweige, die nicht bis 'level' reichen)
+
+        Returns:
+            Gültiger Code oder None (nicht eindeutig reparierbar)
+        """
+        code = normalize_code(code)
+
+        entry = self.entries.get(code)
+        if entry is not None:
+            if entry.level == level:
+                return code
+            if entry.level > level:
+                return self.ancestors(code)[entry.level - level - 1]
+            if leaf_ok and not self.children_of(code):
+                return code
+            return None  # Zu grob (z.B. nur Hauptgruppe)
+
+        # Unbekannter tieferer Code: auf das Level kürzen
+        segments = code.split('.')
+        if level > 1 and len(segments) >= level - 1:
+            truncated = '.'.join(segments[:level - 1])
+            if truncated in self.entries and self.entries[truncated].level == level:
+                return truncated
+            code = truncated
+
+        near = self._near_codes(code, level)
+        return near[0] if len(near) == 1 else None
+
+    def lines(self, level: int) -> List[str]:
+        """'Code: Beschreibung' Zeilen eines Levels (z.B. für den System Prompt)"""
+        return [f"{code}: {self.entries[code].description}" for code in self.level_codes(level)]
+
+
+# Im Prozess geladene Kataloge: Pfad → (mtime_ns, Grösse, Katalog)
+_LOADED: Dict[str, tuple] = {}
+
+
+def load_catalog(csv_path: str = None, cache_path: str = None, use_cache: bool = True) -> EBKPCatalog:
+    """
+    Lädt den Katalog – aus dem Prozess-Speicher, dem Pickle-Cache oder der CSV.
+
+    Args:
+        csv_path: Pfad zur eBKP-H CSV (default: Helpers/eBKP-H.csv)
+        cache_path: Pfad zum Pickle-Cache (default: Cache/ebkp_catalog.pickle)
+        use_cache: Pickle-Cache lesen/schreiben
+
+    Returns:
+        EBKPCatalog
+    """
+    csv_path = os.path.abspath(csv_path or default_catalog_path())
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"eBKP-H Katalog nicht gefunden: {csv_path}")
+
+    stat = os.stat(csv_path)
+    loaded = _LOADED.get(csv_path)
+    if loaded and loaded[:2] == (stat.st_mtime_ns, stat.st_size):
+        return loaded[2]
+
+    catalog = None
+    needs_write = True
+    cache_path = cache_path or default_catalog_cache_path()
+
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('format') == CACHE_FORMAT and cached.get('source') == csv_path:
+                unchanged = (cached['mtime_ns'], cached['size']) == (stat.st_mtime_ns, stat.st_size)
+                # mtime geändert (z.B. Checkout), Inhalt aber gleich → Cache trotzdem gültig
+                if unchanged or cached['state']['fingerprint'] == _file_hash(csv_path):
+                    catalog = EBKPCatalog.from_state(cached['state'])
+                    needs_write = not unchanged
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError, ValueError):
+            catalog = None
+
+    if catalog is None:
+        catalog = EBKPCatalog.from_csv(csv_path)
+
+    if use_cache and needs_write:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump({
+                    'format': CACHE_FORMAT,
+                    'source': csv_path,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'state': catalog.to_state(),
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass  # Cache ist optional (z.B. schreibgeschütztes Verzeichnis)
+
+    _LOADED[csv_path] = (stat.st_mtime_ns, stat.st_size, catalog)
+    return catalog
@@ -0,0 +1,99 @@
+"""
+Checkpoint-Datei für wiederaufnehmbare classify_csv Läufe
+
+Jedes fertige Element wird sofort als eine Zeile an eine JSONL-Datei angehängt:
+    {"row": 1234, "sig": "waende|basic wall|...", "code": "C02", "desc": "...", "conf": 0.9}
+
+Der Schlüssel (Zeilen-Index, Signatur) stellt sicher, dass ein Checkpoint nur
+zum selben Input passt. Bei einem Neustart mit resume werden nur die noch
+fehlenden Elemente klassifiziert.
+"""
+
+import os
+import json
+from typing import Dict, Iterable, Tuple
+
+try:
+    from .ebkp_cache import UNCACHEABLE_CODES
+except ImportError:
+    from ebkp_cache import UNCACHEABLE_CODES
+
+# (Zeilen-Index, Signatur)
+CheckpointKey = Tuple[int, str]
+
+
+class ClassificationCheckpoint:
+    """
+    Append-only Checkpoint für Klassifizierungsergebnisse.
+
+    Usage:
+        checkpoint = ClassificationCheckpoint('export.checkpoint.jsonl')
+        done = checkpoint.load()
+        checkpoint.append([((0, 'waende|...'), {'code': 'C02', 'desc': '...', 'conf': 0.9})])
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Pfad zur Checkpoint-Datei (JSONL)
+        """
+        self.path = path
+
+    def load(self) -> Dict[CheckpointKey, Dict]:
+        """
+        Liest alle gespeicherten Ergebnisse.
+        Eine unvollständige letzte Zeile (Abbruch beim Schreiben) wird ignoriert.
+
+        Returns:
+            Dict (Zeilen-Index, Signatur) → Ergebnis ('code', 'desc', 'conf')
+        """
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    key = (int(entry['row']), entry['sig'])
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    continue
+                done[key] = {
+                    'code': entry.get('code', ''),
+                    'desc': entry.get('desc', ''),
+                    'conf': entry.get('conf', 0.0)
+                }
+
+        return done
+
+    def append(self, items: Iterable[Tuple[CheckpointKey, Dict]]):
+        """
+        Hängt fertige Ergebnisse an. Fehler-Ergebnisse werden nicht gespeichert,
+        damit sie beim Fortsetzen erneut klassifiziert werden.
+
+        Args:
+            items: Paare ((Zeilen-Index, Signatur), Ergebnis)
+        """
+        lines = [
+            json.dumps({
+                'row': int(row),
+                'sig': sig,
+                'code': result['code'],
+                'desc': result['desc'],
+                'conf': result['conf']
+            }, ensure_ascii=False) + '\n'
+            for (row, sig), result in items
+            if result.get('code') not in UNCACHEABLE_CODES
+        ]
+        if not lines:
+            return
+
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def reset(self):
+        """Startet einen neuen, leeren Checkpoint"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        open(self.path, 'w', encoding='utf-8').close()
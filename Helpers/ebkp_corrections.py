@@ -0,0 +1,198 @@
+"""
+Korrektur-Speicher für manuell korrigierte eBKP-H Codes
+
+Jede auf der Seite "BKP Bearbeiten" gespeicherte Korrektur wird pro
+normalisierter Element-Signatur auf Disk (SQLite) abgelegt. eBKPHClassifier
+fragt diesen Speicher vor Cache und API ab – exakt und unscharf (ähnliche
+Signatur derselben Kategorie) – und Korrekturen haben Vorrang vor dem Modell.
+
+Im Gegensatz zum Klassifizierungs-Cache hängen Korrekturen nicht von Katalog,
+Prompt oder Modell ab und gelten projektübergreifend.
+"""
+
+import os
+import sqlite3
+import difflib
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Mindest-Ähnlichkeit (difflib ratio) für unscharfe Treffer
+FUZZY_MIN_RATIO = 0.9
+
+
+def default_corrections_path() -> str:
+    """Default-Pfad: <Repo>/Cache/ebkp_corrections.sqlite"""
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(repo_dir, 'Cache', 'ebkp_corrections.sqlite')
+
+
+class CorrectionStore:
+    """
+    Persistente Korrekturen (Signatur → Code, Beschreibung).
+    Thread-safe, damit mehrere Batches parallel lesen können.
+
+    Usage:
+        store = CorrectionStore()
+        store.put_many({'waende|innenwand 100|basic wall|': {'code': 'G01', 'desc': '...'}})
+        store.lookup(['waende|innenwand 120|basic wall|'])  # unscharfer Treffer
+    """
+
+    def __init__(self, path: str = None, fuzzy_min_ratio: float = FUZZY_MIN_RATIO):
+        """
+        Args:
+            path: Pfad zur SQLite-Datei (default: Cache/ebkp_corrections.sqlite)
+            fuzzy_min_ratio: Mindest-Ähnlichkeit für unscharfe Treffer (None = nur exakt)
+        """
+        self.path = path or default_corrections_path()
+        self.fuzzy_min_ratio = fuzzy_min_ratio
+        self._lock = threading.Lock()
+        self._by_category = None  # Kategorie → [(Signatur, Code, Beschreibung)], für unscharfe Suche
+        self._by_category_version = None
+        self._writes = 0  # Eigene Commits (PRAGMA data_version zählt nur fremde Verbindungen)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS corrections ("
+            " signature TEXT PRIMARY KEY,"
+            " category TEXT NOT NULL,"
+            " code TEXT NOT NULL,"
+            " description TEXT NOT NULL,"
+            " updated TEXT NOT NULL,"
+            " times INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _result(code: str, desc: str, conf: float = 1.0) -> Dict:
+        return {'code': code, 'desc': desc, 'conf': conf}
+
+    def put_many(self, items: Dict[str, Dict]):
+        """
+        Speichert Korrekturen (überschreibt ältere Korrekturen derselben Signatur).
+
+        Args:
+            items: Dict Signatur → {'code', 'desc'}
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (sig, sig.split('|', 1)[0], str(item['code']).strip().upper(), item.get('desc') or '', now)
+            for sig, item in items.items()
+            if str(item.get('code') or '').strip()
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO corrections (signature, category, code, description, updated) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(signature) DO UPDATE SET "
+                " code = excluded.code, description = excluded.description,"
+                " updated = excluded.updated, times = times + 1",
+                rows
+            )
+            self._conn.commit()
+            self._writes += 1
+
+    def get_many(self, signatures: List[str]) -> Dict[str, Dict]:
+        """
+        Exakte Treffer für mehrere Signaturen.
+
+        Returns:
+            Dict Signatur → Ergebnis ('code', 'desc', 'conf'=1.0)
+        """
+        unique = list(set(signatures))
+        found = {}
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT signature, code, description FROM corrections WHERE signature IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for sig, code, desc in rows:
+                    found[sig] = self._result(code, desc)
+        return found
+
+    def _version(self) -> Tuple[int, int]:
+        """Stand der Datenbank; ändert sich bei jedem Commit, auch aus anderen Verbindungen (Lock halten)"""
+        return self._conn.execute("PRAGMA data_version").fetchone()[0], self._writes
+
+    def version(self) -> Tuple[int, int]:
+        """
+        Stand der Korrekturen, z.B. um abgeleitete Indizes neu zu bauen.
+        Ändert sich bei jedem Speichern, auch durch andere Instanzen oder Prozesse.
+        """
+        with self._lock:
+            return self._version()
+
+    def _fuzzy(self, signature: str) -> Optional[Dict]:
+        """Ähnlichste Korrektur derselben Kategorie (Confidence = Ähnlichkeit)"""
+        with self._lock:
+            version = self._version()
+            if self._by_category is None or self._by_category_version != version:
+                self._by_category = {}
+                self._by_category_version = version
+                for sig, category, code, desc in self._conn.execute(
+                    "SELECT signature, category, code, description FROM corrections"
+                ):
+                    self._by_category.setdefault(category, []).append((sig, code, desc))
+            candidates = self._by_category.get(signature.split('|', 1)[0], [])
+
+        best, best_ratio = None, self.fuzzy_min_ratio
+        matcher = difflib.SequenceMatcher(b=signature, autojunk=False)
+        for sig, code, desc in candidates:
+            matcher.set_seq1(sig)
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = (code, desc), ratio
+
+        if best is None:
+            return None
+        return self._result(best[0], best[1], round(best_ratio, 3))
+
+    def lookup(self, signatures: List[str]) -> Dict[str, Dict]:
+        """
+        Exakte und (falls aktiviert) unscharfe Treffer.
+
+        Returns:
+            Dict Signatur → Ergebnis (nur Treffer)
+        """
+        found = self.get_many(signatures)
+        if self.fuzzy_min_ratio is not None:
+            for sig in set(signatures) - set(found):
+                result = self._fuzzy(sig)
+                if result is not None:
+                    found[sig] = result
+        return found
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        """
+        Alle Korrekturen.
+
+        Returns:
+            Liste von (Signatur, Ergebnis)
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT signature, code, description FROM corrections").fetchall()
+        return [(sig, self._result(code, desc)) for sig, code, desc in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM corrections").fetchone()[0]
+
+    def clear(self):
+        """Löscht alle Korrekturen"""
+        with self._lock:
+            self._conn.execute("DELETE FROM corrections")
+            self._conn.commit()
+            self._writes += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
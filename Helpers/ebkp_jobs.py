@@ -0,0 +1,344 @@
+"""
+Hintergrund-Jobs für die Klassifizierung
+
+Die Seite "KI Klassifizierung" startet Läufe als Jobs in einem Thread-Pool
+(JobRunner) statt im Button-Handler: Reruns durch Widgets, Tab-Wechsel oder
+einen Browser-Reconnect brechen den Lauf nicht mehr ab. Die Seite fragt Status,
+Fortschritt, Teilergebnisse und Kosten über ClassificationJob.snapshot() ab.
+
+Der Runner ist prozessweit (st.cache_resource): mehrere Benutzer und Dateien
+laufen gleichzeitig, ohne sich zu blockieren. Threads statt Prozesse, weil die
+Arbeit I/O-gebunden ist (API-Requests) und Jobs Katalog, HTTP-Client und Cache
+des Classifiers teilen.
+"""
+
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    from .response_log import ResponseLog, MAX_MEMORY_ROWS
+    from .progress import Throttle, rates, total_tokens
+except ImportError:
+    from response_log import ResponseLog, MAX_MEMORY_ROWS
+    from progress import Throttle, rates, total_tokens
+
+# Gleichzeitig laufende Jobs (weitere warten in der Queue)
+MAX_JOBS = 4
+
+# Beendete Jobs in der Registry (älteste werden entfernt)
+MAX_FINISHED_JOBS = 20
+
+# Fortschritts-Einträge im Job-Log höchstens alle n Sekunden (statt einem Eintrag pro Batch)
+PROGRESS_LOG_SECONDS = 5.0
+
+# Job-Status
+QUEUED = 'wartend'
+RUNNING = 'läuft'
+DONE = 'fertig'
+FAILED = 'fehler'
+CANCELLED = 'abgebrochen'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Job wurde abgebrochen (wird aus den Callbacks des Classifiers geworfen)"""
+
+
+class ClassificationJob:
+    """
+    Zustand eines Klassifizierungs-Laufs. Wird vom Worker-Thread geschrieben und
+    von der Seite über snapshot() gelesen (thread-safe).
+
+    Usage:
+        job = runner.submit(classifier, elements, label='export.csv')
+        job.snapshot()['progress']  # 0.0 … 1.0
+        job.cancel()
+    """
+
+    def __init__(
+        self,
+        elements: List[Dict],
+        label: str = '',
+        owner: str = None,
+        context: Dict[str, Any] = None,
+        response_rows: int = MAX_MEMORY_ROWS
+    ):
+        """
+        Args:
+            elements: Liste von Dicts mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
+            label: Anzeigename (z.B. Dateiname)
+            owner: Besitzer (z.B. Streamlit-Session), für JobRunner.jobs(owner)
+            context: Beliebige Daten des Aufrufers (z.B. DataFrame, Spalten-Mapping)
+            response_rows: Ergebnis-Zeilen im Speicher, der Rest wird auf Disk ausgelagert
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.owner = owner
+        self.context = context or {}
+        self.elements = elements
+        self.total = len(elements)
+        self.results: List[Optional[Dict]] = [None] * len(elements)
+        self.done = 0
+        self.batches = 0
+        self.status = QUEUED
+        self.error = None
+        self.created = datetime.now()
+        self.started = None
+        self.finished = None
+        self.log: List[Dict] = []
+        self.responses = ResponseLog(max_rows=response_rows)
+        self.stats: Dict = {}
+        self._classifier = None
+        self._stream = False
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._progress_log = Throttle(1.0 / PROGRESS_LOG_SECONDS)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Bricht den Job nach den laufenden Requests ab"""
+        self._cancel.set()
+        if self.status == QUEUED:
+            self.add_log("Job abgebrochen (noch nicht gestartet)", "warning")
+
+    def add_log(self, message: str, level: str = "info"):
+        """Fügt einen Eintrag zum Job-Log hinzu (Format wie das Processing Log der Seite)"""
+        with self._lock:
+            self.log.append({
+                'timestamp': datetime.now().strftime("%H:%M:%S"),
+                'level': level,
+                'message': message
+            })
+
+    def _record(self, position: int, result: Dict):
+        """Ergebnis eines Elements speichern (Callback aus dem Classifier)"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+        elem = self.elements[position]
+        element_info = str(elem.get('typ') or 'N/A')
+        if elem.get('kategorie'):
+            element_info += f" ({elem['kategorie']})"
+
+        with self._lock:
+            if self.results[position] is None:
+                self.done += 1
+            self.results[position] = result
+        self.responses.append(position, element_info, result)
+
+    def _log_progress(self):
+        """Fortschritt ins Log, gedrosselt auf einen Eintrag pro PROGRESS_LOG_SECONDS"""
+        with self._lock:
+            done, batches = self.done, self.batches
+        if not self._progress_log.due() or done >= self.total:
+            return
+        message = f"{done}/{self.total} Elemente klassifiziert"
+        self.add_log(f"{message} ({batches} Batches)" if batches else message, "info")
+
+    def _batch_done(self, positions: List[int], batch_results: List[Dict]):
+        """Batch abgeschlossen (ohne Streaming: alle Elemente auf einmal)"""
+        if not self._stream:
+            for position, result in zip(positions, batch_results):
+                self._record(position, result)
+        with self._lock:
+            self.batches += 1
+        self._log_progress()
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _live_stats(self) -> Dict:
+        if self._classifier is not None and self.status == RUNNING:
+            return dict(self._classifier.stats)
+        return dict(self.stats)
+
+    def snapshot(self, responses: int = 5) -> Dict:
+        """
+        Aktueller Zustand für die Anzeige.
+
+        Args:
+            responses: Anzahl der neuesten Responses im Snapshot
+
+        Returns:
+            Dict mit 'id', 'label', 'status', 'done', 'total', 'progress', 'batches',
+            'elapsed', 'elements_per_second', 'tokens_per_second', 'eta' (Sekunden,
+            None = unbekannt), 'stats', 'error', 'log', 'latest'
+        """
+        with self._lock:
+            end = self.finished or datetime.now()
+            elapsed = (end - self.started).total_seconds() if self.started else 0.0
+            stats = self._live_stats()
+            return {
+                'id': self.id,
+                'label': self.label,
+                'status': self.status,
+                'done': self.done,
+                'total': self.total,
+                'progress': self.done / self.total if self.total else 1.0,
+                'batches': self.batches,
+                'elapsed': elapsed,
+                **rates(self.done, self.total, elapsed, total_tokens(stats)),
+                'stats': stats,
+                'error': self.error,
+                'log': list(self.log),
+                'latest': self.responses.latest(responses) if responses else [],
+            }
+
+    def partial_results(self) -> List[Optional[Dict]]:
+        """Bisherige Ergebnisse (None = noch nicht klassifiziert)"""
+        with self._lock:
+            return list(self.results)
+
+
+class JobRunner:
+    """
+    Thread-Pool plus Registry der Klassifizierungs-Jobs.
+
+    Usage:
+        runner = JobRunner()
+        job = runner.submit(classifier.session(), elements, label='export.csv',
+                            max_concurrency=4, stream=True)
+        runner.get(job.id).snapshot()
+    """
+
+    def __init__(
+        self,
+        max_jobs: int = MAX_JOBS,
+        max_finished: int = MAX_FINISHED_JOBS,
+        response_rows: int = MAX_MEMORY_ROWS
+    ):
+        """
+        Args:
+            max_jobs: Gleichzeitig laufende Jobs
+            max_finished: Beendete Jobs, die in der Registry bleiben
+            response_rows: Ergebnis-Zeilen pro Job im Speicher (Rest auf Disk, siehe ResponseLog)
+        """
+        self.max_finished = max_finished
+        self.response_rows = response_rows
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='ebkp-job')
+        self._jobs: Dict[str, ClassificationJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        classifier,
+        elements: List[Dict],
+        label: str = '',
+        owner: str = None,
+        context: Dict[str, Any] = None,
+        batch: bool = True,
+        **options
+    ) -> ClassificationJob:
+        """
+        Startet einen Job im Hintergrund.
+
+        Args:
+            classifier: eBKPHClassifier (am besten classifier.session(), eigene Statistik pro Job)
+            elements: Liste von Dicts mit 'kategorie', 'typ', 'familie', 'zusatzinfo'
+            label: Anzeigename (z.B. Dateiname)
+            owner: Besitzer (z.B. Streamlit-Session)
+            context: Beliebige Daten des Aufrufers, z.B. der DataFrame für die Ergebnisse
+            batch: Batch-Verarbeitung (classify_elements), sonst einzeln (classify_element)
+            **options: Weitere Parameter für classify_elements (batch_size, max_concurrency,
+                       debug, log_file, stream); im Einzelmodus nur debug und log_file
+
+        Returns:
+            ClassificationJob
+        """
+        job = ClassificationJob(
+            elements, label=label, owner=owner, context=context, response_rows=self.response_rows
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, classifier, batch, options)
+        return job
+
+    def get(self, job_id: str) -> Optional[ClassificationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner: str = None) -> List[ClassificationJob]:
+        """Jobs (optional nur eines Besitzers), neueste zuerst"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if owner is None or job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created, reverse=True)
+
+    def remove(self, job_id: str):
+        """Entfernt einen Job aus der Registry (laufende Jobs werden abgebrochen)"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None and job.status not in FINISHED:
+            job.cancel()
+
+    def _prune(self):
+        """Hält höchstens max_finished beendete Jobs (älteste zuerst entfernt)"""
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in FINISHED),
+            key=lambda job: job.finished
+        )
+        for job in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job.id]
+
+    def _run(self, job: ClassificationJob, classifier, batch: bool, options: Dict):
+        """Worker: klassifiziert die Elemente des Jobs und hält den Zustand aktuell"""
+        if job.cancelled:
+            job.finished = datetime.now()
+            job.status = CANCELLED
+            return
+
+        job._classifier = classifier
+        job._stream = bool(options.get('stream')) and batch
+        job.started = datetime.now()
+        job.status = RUNNING
+        job.add_log("Klassifizierung gestartet", "info")
+        job.add_log(f"Modus: {'Batch' if batch else 'Einzeln'}", "info")
+        job.add_log(f"{job.total} Elemente zu klassifizieren", "info")
+        if batch:
+            size = options.get('batch_size')
+            job.add_log(f"Batch-Verarbeitung mit Größe {size}" if size else "Adaptive Batch-Größe aktiv", "info")
+            if options.get('max_concurrency', 1) > 1:
+                job.add_log(f"Bis zu {options['max_concurrency']} Anfragen parallel", "info")
+            if job._stream:
+                job.add_log("Streaming aktiv: Ergebnisse pro Element", "info")
+
+        try:
+            if batch:
+                results = classifier.classify_elements(
+                    job.elements,
+                    on_batch_done=job._batch_done,
+                    on_element=job._record if job._stream else None,
+                    **options
+                )
+                with job._lock:
+                    job.results = results
+                    job.done = len(results)
+            else:
+                for position, elem in enumerate(job.elements):
+                    result = classifier.classify_element(
+                        **elem, debug=options.get('debug', False), log_file=options.get('log_file')
+                    )
+                    job._record(position, result)
+                    job._log_progress()
+
+            status = DONE
+            job.add_log("✓ Klassifizierung erfolgreich abgeschlossen", "success")
+        except JobCancelled:
+            status = CANCELLED
+            job.add_log(f"Job abgebrochen nach {job.done}/{job.total} Elementen", "warning")
+        except Exception as e:
+            status = FAILED
+            job.error = str(e)
+            job.add_log(f"Fehler: {e}", "error")
+
+        # Statistik und Endzeit vor dem Status setzen (snapshot() liest ohne Worker-Lock)
+        job.stats = dict(classifier.stats)
+        job.finished = datetime.now()
+        job.status = status
+        with self._lock:
+            self._prune()
@@ -0,0 +1,93 @@
+"""
+Few-Shot Beispiele für den Batch-Prompt
+
+Statt den System Prompt zu vergrössern, werden pro Batch die ähnlichsten
+bestätigten Klassifizierungen (manuelle Korrekturen, sichere Cache-Einträge)
+gesucht und kompakt in den User Prompt gestellt – begrenzt durch ein Token-Budget.
+"""
+
+from typing import Callable, Dict, Iterable, List, Tuple
+
+try:
+    from .ebkp_cache import SIGNATURE_FIELDS, element_signature
+    from .local_classifier import NgramIndex, element_text
+except ImportError:
+    from ebkp_cache import SIGNATURE_FIELDS, element_signature
+    from local_classifier import NgramIndex, element_text
+
+
+def signature_element(signature: str) -> Dict:
+    """Signatur zurück in ein Element-Dict ('kategorie', 'typ', 'familie', 'zusatzinfo')"""
+    return dict(zip(SIGNATURE_FIELDS, signature.split('|')))
+
+
+class FewShotRetriever:
+    """
+    Sucht die ähnlichsten gelabelten Beispiele für die Elemente eines Batches.
+
+    Usage:
+        retriever = FewShotRetriever([('waende|innenwand 100|basic wall|', 'G01')])
+        retriever.select(elements, max_tokens=300, estimate_tokens=len)
+        # [('waende|innenwand 100|basic wall|', 'G01')]
+    """
+
+    def __init__(self, examples: Iterable[Tuple[str, str]], per_element: int = 3, ngram: int = 3):
+        """
+        Args:
+            examples: Bestätigte Klassifizierungen als (Signatur, Code)
+            per_element: Anzahl Kandidaten pro Element (top-k)
+            ngram: Länge der Zeichen-n-Gramme
+        """
+        self.per_element = per_element
+        self.index = NgramIndex(examples, ngram)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def select(
+        self,
+        elements: List[Dict],
+        max_tokens: int,
+        estimate_tokens: Callable[[str], int],
+        format_line: Callable[[Dict, str], str] = None,
+        prefix: str = ''
+    ) -> List[Tuple[str, str]]:
+        """
+        Wählt Beispiele für einen Batch: pro Element die top-k Nachbarn, über den
+        Batch dedupliziert und nach Ähnlichkeit sortiert, bis das Token-Budget
+        erreicht ist. Beispiele mit derselben Signatur wie ein Batch-Element
+        werden übersprungen (die kennt der Cache bereits).
+
+        Args:
+            elements: Elemente des Batches
+            max_tokens: Token-Budget für alle Beispielzeilen zusammen
+            estimate_tokens: Token-Schätzung für eine Zeile
+            format_line: Formatiert (Element, Code) als Prompt-Zeile (für die Budget-Rechnung)
+            prefix: Nur Beispiele mit Codes unter diesem Prefix (z.B. Hauptgruppe 'C')
+
+        Returns:
+            Liste von (Signatur, Code), ähnlichste zuerst
+        """
+        if not len(self.index) or max_tokens <= 0:
+            return []
+
+        batch_signatures = {element_signature(elem) for elem in elements}
+        best = {}
+        for elem in elements:
+            for score, doc_id in self.index.search(element_text(elem), self.per_element):
+                if score > best.get(doc_id, 0.0):
+                    best[doc_id] = score
+
+        selected = []
+        used = 0
+        for doc_id in sorted(best, key=best.get, reverse=True):
+            signature, code = self.index.texts[doc_id], self.index.labels[doc_id]
+            if signature in batch_signatures or not code.startswith(prefix):
+                continue
+            line = format_line(signature_element(signature), code) if format_line else f"{signature} {code}"
+            tokens = estimate_tokens(line)
+            if used + tokens > max_tokens:
+                break
+            selected.append((signature, code))
+            used += tokens
+        return selected
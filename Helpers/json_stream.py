@@ -0,0 +1,68 @@
+"""
+Inkrementeller JSON-Parser für gestreamte API-Antworten
+
+Liest ein JSON Array wie [{"id":1,...},{"id":2,...}] stückweise ein und
+liefert jedes Objekt, sobald seine schliessende Klammer angekommen ist.
+Markdown-Codeblöcke oder Text vor/nach dem Array werden ignoriert.
+"""
+
+import json
+from typing import Dict, Iterator
+
+
+class JsonObjectStream:
+    """
+    Zustandsbehafteter Parser für Text-Chunks.
+
+    Usage:
+        parser = JsonObjectStream()
+        for chunk in stream.text_stream:
+            for obj in parser.feed(chunk):
+                print(obj['id'], obj['code'])
+    """
+
+    def __init__(self):
+        self._buffer = []      # Zeichen des aktuell offenen Objekts
+        self._depth = 0        # Verschachtelungstiefe von {...}
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> Iterator[Dict]:
+        """
+        Verarbeitet den nächsten Text-Chunk.
+
+        Yields:
+            Jedes vollständig empfangene Objekt der obersten Ebene
+        """
+        for char in chunk:
+            if self._depth == 0:
+                # Ausserhalb eines Objekts: nur auf den Start des nächsten warten
+                if char == '{':
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    text = ''.join(self._buffer)
+                    self._buffer = []
+                    try:
+                        obj = json.loads(text)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(obj, dict):
+                        yield obj
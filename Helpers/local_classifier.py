@@ -0,0 +1,249 @@
+"""
+Lokale lexikalische Vorklassifizierung (ohne API-Call)
+
+Char-n-gram TF-IDF Nearest-Neighbour über:
+- Katalog-Beschreibungen (ab dem Ziel-Level, Label = Vorfahre auf diesem Level)
+- bereits akzeptierte Klassifizierungen (z.B. Einträge aus dem Klassifizierungs-Cache)
+
+Elemente mit Confidence über dem Schwellenwert werden lokal beantwortet,
+nur der Rest geht an die API. Reines Python (keine zusätzlichen Abhängigkeiten).
+Der NgramIndex wird auch für die Few-Shot-Beispiele verwendet (few_shot.py).
+"""
+
+import math
+import heapq
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .ebkp_cache import SIGNATURE_FIELDS
+except ImportError:
+    from ebkp_cache import SIGNATURE_FIELDS
+
+# Umlaute wie in Revit-Exporten (Tueren, Waende) schreiben
+_TRANSLITERATION = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss', '|': ' '})
+
+
+def normalize_text(text: str) -> str:
+    """Kleinschreibung, Umlaute transliteriert, nur Buchstaben/Ziffern, einfache Leerzeichen"""
+    text = str(text).lower().translate(_TRANSLITERATION)
+    text = ''.join(char if char.isalnum() else ' ' for char in text)
+    return ' '.join(text.split())
+
+
+def char_ngrams(text: str, n: int = 3) -> Dict[str, int]:
+    """Zeichen-n-Gramme pro Wort (mit Wortgrenzen), gezählt"""
+    grams = {}
+    for word in normalize_text(text).split():
+        padded = f" {word} "
+        for i in range(max(len(padded) - n + 1, 1)):
+            gram = padded[i:i + n]
+            grams[gram] = grams.get(gram, 0) + 1
+    return grams
+
+
+def element_text(element: Dict) -> str:
+    """Alle Felder eines Elements als ein Text"""
+    return ' '.join(str(element.get(field) or '') for field in SIGNATURE_FIELDS)
+
+
+class NgramIndex:
+    """
+    TF-IDF Index auf Zeichen-n-Grammen mit invertiertem Index (Cosinus-Ähnlichkeit).
+
+    Usage:
+        index = NgramIndex([('Trennwand, Innentür', 'G01'), ('Wandkonstruktion', 'C02')])
+        index.search('innenwand gips', k=2)  # [(0.41, 0), (0.22, 1)]
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, str]], ngram: int = 3):
+        """
+        Args:
+            documents: Paare (Text, Label); Texte ohne n-Gramme werden übersprungen
+            ngram: Länge der Zeichen-n-Gramme
+        """
+        self.ngram = ngram
+        self.texts: List[str] = []
+        self.labels: List[str] = []
+
+        # Dokument-Häufigkeit pro n-Gramm → IDF
+        doc_grams = []
+        document_frequency = {}
+        for text, label in documents:
+            grams = char_ngrams(text, ngram)
+            if not grams:
+                continue
+            doc_grams.append(grams)
+            self.texts.append(text)
+            self.labels.append(label)
+            for gram in grams:
+                document_frequency[gram] = document_frequency.get(gram, 0) + 1
+
+        num_docs = len(doc_grams)
+        self.idf = {
+            gram: math.log((1 + num_docs) / (1 + df)) + 1.0
+            for gram, df in document_frequency.items()
+        }
+
+        # Invertierter Index: n-Gramm → [(Dokument, normiertes Gewicht)]
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc_id, grams in enumerate(doc_grams):
+            vector = self._vector(grams)
+            for gram, weight in vector.items():
+                self.postings.setdefault(gram, []).append((doc_id, weight))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def _vector(self, grams: Dict[str, int]) -> Dict[str, float]:
+        """L2-normierter TF-IDF Vektor (unbekannte n-Gramme werden ignoriert)"""
+        vector = {
+            gram: (1.0 + math.log(count)) * self.idf[gram]
+            for gram, count in grams.items() if gram in self.idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if norm == 0:
+            return {}
+        return {gram: weight / norm for gram, weight in vector.items()}
+
+    def search(self, text: str, k: int = 5) -> List[Tuple[float, int]]:
+        """Die k ähnlichsten Dokumente als (Cosinus-Ähnlichkeit, Dokument-Index)"""
+        query = self._vector(char_ngrams(text, self.ngram))
+        scores = {}
+        for gram, weight in query.items():
+            for doc_id, doc_weight in self.postings.get(gram, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * doc_weight
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, doc_id) for doc_id, score in best]
+
+
+class LocalClassifier:
+    """
+    TF-IDF Nearest-Neighbour Classifier auf Zeichen-n-Grammen.
+
+    Usage:
+        local = LocalClassifier(catalog, examples=[('tueren m_single-flush', 'G01')])
+        local.predict({'kategorie': 'Tueren', 'typ': '0915 x 2134mm'})
+        # {'code': 'G01', 'desc': '...', 'conf': 0.83}
+    """
+
+    def __init__(
+        self,
+        catalog,
+        examples: Iterable[Tuple[str, str]] = (),
+        level: int = 2,
+        ngram: int = 3,
+        top_k: int = 5
+    ):
+        """
+        Args:
+            catalog: EBKPCatalog
+            examples: Akzeptierte Klassifizierungen als (Text, Code); tiefere Codes
+                      zählen für ihren Vorfahren auf 'level'
+            level: Level der vorhergesagten Codes
+            ngram: Länge der Zeichen-n-Gramme
+            top_k: Anzahl Nachbarn für die Abstimmung
+        """
+        self.catalog = catalog
+        self.level = level
+        self.top_k = top_k
+
+        # Dokumente: Katalog-Beschreibungen ab 'level' plus Beispiele (Label = Code auf 'level')
+        documents = []
+        for lvl in sorted(catalog.levels):
+            if lvl < level:
+                continue
+            for code in catalog.level_codes(lvl):
+                documents.append((catalog.description(code), self._label(code)))
+        for text, code in examples:
+            label = self._label(code)
+            if label is not None:
+                documents.append((text, label))
+
+        num_catalog = sum(len(catalog.level_codes(lvl)) for lvl in catalog.levels if lvl >= level)
+        self.num_examples = len(documents) - num_catalog
+        self.index = NgramIndex(documents, ngram)
+
+    def _label(self, code: str) -> Optional[str]:
+        """Code bzw. sein Vorfahre auf 'level' (None für unbekannte oder zu grobe Codes)"""
+        entry = self.catalog.get(code)
+        if entry is None or entry.level < self.level:
+            return None
+        if entry.level == self.level:
+            return code
+        return self.catalog.ancestors(code)[entry.level - self.level - 1]
+
+    @property
+    def labels(self) -> List[str]:
+        return self.index.labels
+
+    def neighbours(self, text: str) -> List[Tuple[float, str]]:
+        """Die top_k ähnlichsten Dokumente als (Cosinus-Ähnlichkeit, Code)"""
+        return [(score, self.index.labels[doc_id]) for score, doc_id in self.index.search(text, self.top_k)]
+
+    def predict(self, element: Dict) -> Optional[Dict]:
+        """
+        Klassifiziert ein Element lokal.
+
+        Confidence = Ähnlichkeit des besten Nachbarn × Stimmenanteil seines Codes
+        unter den top_k Nachbarn (uneinige Nachbarn senken die Confidence).
+
+        Returns:
+            Dict mit 'code', 'desc', 'conf' oder None (keine Ähnlichkeit)
+        """
+        neighbours = self.neighbours(element_text(element))
+        if not neighbours:
+            return None
+
+        votes = {}
+        for score, code in neighbours:
+            votes[code] = votes.get(code, 0.0) + score
+        total = sum(votes.values())
+        if total <= 0:
+            return None
+
+        code = max(votes, key=votes.get)
+        top_score = max(score for score, label in neighbours if label == code)
+
+        return {
+            'code': code,
+            'desc': self.catalog.description(code),
+            'conf': round(top_score * votes[code] / total, 3)
+        }
+
+
+def evaluate(
+    local: LocalClassifier,
+    elements: List[Dict],
+    labels: List[str],
+    thresholds: Iterable[float] = (0.5, 0.6, 0.7, 0.8, 0.9)
+) -> List[Dict]:
+    """
+    Misst Hit-Rate und Übereinstimmung mit den API-Codes auf einem Held-out-Set.
+
+    Args:
+        local: LocalClassifier (ohne die Held-out-Elemente aufgebaut)
+        elements: Held-out Elemente
+        labels: Codes der API für diese Elemente
+        thresholds: Zu prüfende Schwellenwerte
+
+    Returns:
+        Liste von Dicts mit 'threshold', 'hit_rate', 'agreement', 'hits'
+    """
+    predictions = [local.predict(element) for element in elements]
+
+    report = []
+    for threshold in thresholds:
+        hits = [
+            (prediction['code'], label)
+            for prediction, label in zip(predictions, labels)
+            if prediction is not None and prediction['conf'] >= threshold
+        ]
+        agree = sum(code == label for code, label in hits)
+        report.append({
+            'threshold': threshold,
+            'hits': len(hits),
+            'hit_rate': len(hits) / len(elements) if elements else 0.0,
+            'agreement': agree / len(hits) if hits else 0.0,
+        })
+    return report
@@ -0,0 +1,78 @@
+"""
+Gedrosselte Fortschrittsanzeige für Klassifizierungs-Läufe
+
+Durchsatz (Elemente/s, Tokens/s) und ETA aus dem bisherigen Verlauf, plus ein
+Throttle, damit Anzeige und Log höchstens N-mal pro Sekunde aktualisiert werden –
+unabhängig davon, wie viele Batches fertig werden.
+"""
+
+import time
+from typing import Callable, Dict, Optional
+
+# Anzeige-Updates pro Sekunde (Streamlit-Fragment, tqdm)
+UPDATES_PER_SECOND = 2.0
+
+
+class Throttle:
+    """
+    Lässt ein Ereignis höchstens 'per_second' mal pro Sekunde durch.
+
+    Usage:
+        throttle = Throttle(2.0)
+        if throttle.due():
+            print(...)
+    """
+
+    def __init__(self, per_second: float = UPDATES_PER_SECOND, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            per_second: Maximale Anzahl Durchgänge pro Sekunde
+            clock: Zeitquelle (austauschbar für Tests)
+        """
+        self.interval = 1.0 / per_second
+        self._clock = clock
+        self._last = None
+
+    def due(self, force: bool = False) -> bool:
+        """True, wenn seit dem letzten Durchgang genug Zeit vergangen ist (oder force)"""
+        now = self._clock()
+        if not force and self._last is not None and now - self._last < self.interval:
+            return False
+        self._last = now
+        return True
+
+
+def total_tokens(stats: Dict) -> int:
+    """Alle verarbeiteten Tokens (Input inkl. Prompt-Cache, Output) aus der Classifier-Statistik"""
+    return sum(stats.get(key, 0) for key in ('input_tokens', 'cache_read_tokens', 'cache_write_tokens', 'output_tokens'))
+
+
+def rates(done: int, total: int, elapsed: float, tokens: int = 0) -> Dict:
+    """
+    Durchsatz und Restzeit.
+
+    Args:
+        done: Fertige Elemente
+        total: Alle Elemente
+        elapsed: Laufzeit in Sekunden
+        tokens: Bisher verarbeitete Tokens
+
+    Returns:
+        Dict mit 'elements_per_second', 'tokens_per_second', 'eta' (Sekunden, None = unbekannt)
+    """
+    elements_per_second = done / elapsed if elapsed > 0 else 0.0
+    remaining = max(total - done, 0)
+    return {
+        'elements_per_second': elements_per_second,
+        'tokens_per_second': tokens / elapsed if elapsed > 0 else 0.0,
+        'eta': remaining / elements_per_second if elements_per_second > 0 else (0.0 if not remaining else None),
+    }
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Sekunden als 'm:ss' bzw. 'h:mm:ss' ('–' = unbekannt)"""
+    if seconds is None:
+        return '–'
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
@@ -0,0 +1,341 @@
+"""
+Rate-Limit-bewusster Request Scheduler für die Anthropic API
+
+Bausteine:
+- TokenBucket: Budget pro Minute (Requests, Input-Tokens, Output-Tokens)
+- RequestScheduler: Budget-Reservierung, Retry mit Jitter-Backoff (inkl. retry-after)
+  und adaptive Parallelität (halbiert bei Throttling, steigt langsam wieder an)
+
+Die Buckets werden nach jedem Call mit den echten Werten aus response.usage
+korrigiert und – falls vorhanden – aus den anthropic-ratelimit-* Headern
+auf die Account-Limits dimensioniert.
+"""
+
+import time
+import random
+import threading
+from typing import Callable, Dict, Optional
+
+# HTTP Status Codes, bei denen ein Retry sinnvoll ist (529 = Overloaded)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Header → Bucket-Name (Anthropic Rate-Limit Header)
+LIMIT_HEADERS = {
+    'anthropic-ratelimit-requests-limit': 'requests',
+    'anthropic-ratelimit-input-tokens-limit': 'input_tokens',
+    'anthropic-ratelimit-output-tokens-limit': 'output_tokens',
+}
+
+
+class TokenBucket:
+    """
+    Einfacher Token Bucket mit Kapazität pro Minute.
+    Nicht selbst thread-safe – der RequestScheduler hält den Lock.
+    """
+
+    def __init__(self, per_minute: Optional[float] = None, headroom: float = 0.9, now: float = None):
+        """
+        Args:
+            per_minute: Limit pro Minute (None = unbegrenzt)
+            headroom: Anteil des Limits, der genutzt wird (knapp unter dem Account-Limit bleiben)
+            now: Startzeit (default: time.monotonic())
+        """
+        self.headroom = headroom
+        self.capacity = None
+        self.rate = None
+        self.tokens = 0.0
+        self.updated = time.monotonic() if now is None else now
+        self.set_limit(per_minute)
+
+    def set_limit(self, per_minute: Optional[float]):
+        """Setzt ein neues Limit (z.B. aus Response-Headern)"""
+        if per_minute is None:
+            self.capacity = None
+            return
+
+        capacity = float(per_minute) * self.headroom
+        if self.capacity is None:
+            self.tokens = capacity
+        else:
+            self.tokens = min(self.tokens, capacity)
+        self.capacity = capacity
+        self.rate = capacity / 60.0
+
+    def _refill(self, now: float):
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Sekunden bis 'amount' verfügbar ist (0 = sofort)"""
+        self._refill(now)
+        if self.capacity is None:
+            return 0.0
+        amount = min(amount, self.capacity)  # Grosse Requests nicht ewig blockieren
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if self.capacity is not None:
+            self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Korrigiert eine Schätzung nachträglich (positiv = mehr verbraucht als reserviert)"""
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, 'status_code', None)
+
+
+def is_retryable(error: Exception) -> bool:
+    """True für Throttling (429/529), Server-Fehler und Verbindungsabbrüche"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # APIConnectionError / APITimeoutError haben keinen Status Code
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Liest retry-after(-ms) aus der Fehler-Response (falls vorhanden)"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class RequestScheduler:
+    """
+    Plant API-Requests so, dass der Durchsatz knapp unter den Account-Limits bleibt.
+
+    Usage:
+        scheduler = RequestScheduler(requests_per_minute=50)
+        response = scheduler.call(lambda: client.messages.create(...),
+                                  input_tokens=1500, output_tokens=800)
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        input_tokens_per_minute: Optional[float] = None,
+        output_tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            requests_per_minute: Request-Limit (None = aus Headern lernen / unbegrenzt)
+            input_tokens_per_minute: Input-Token-Limit (None = aus Headern lernen / unbegrenzt)
+            output_tokens_per_minute: Output-Token-Limit (None = aus Headern lernen / unbegrenzt)
+            max_concurrency: Obergrenze gleichzeitiger Requests
+            max_retries: Maximale Anzahl Retries pro Request
+            base_delay: Basis für exponentielles Backoff (Sekunden)
+            max_delay: Obergrenze für Backoff (Sekunden)
+            sleep: Sleep-Funktion (austauschbar für Tests)
+            clock: Zeitquelle (austauschbar für Tests, zusammen mit sleep)
+        """
+        self._sleep = sleep
+        self._clock = clock
+        self.buckets: Dict[str, TokenBucket] = {
+            'requests': TokenBucket(requests_per_minute, now=clock()),
+            'input_tokens': TokenBucket(input_tokens_per_minute, now=clock()),
+            'output_tokens': TokenBucket(output_tokens_per_minute, now=clock()),
+        }
+        # Explizit gesetzte Limits werden nicht durch Header überschrieben
+        self._fixed_limits = {
+            name for name, value in (
+                ('requests', requests_per_minute),
+                ('input_tokens', input_tokens_per_minute),
+                ('output_tokens', output_tokens_per_minute),
+            ) if value is not None
+        }
+
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = self.max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._success_streak = 0
+        self._last_decrease = 0.0
+
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'throttled': 0,
+            'failed': 0,
+            'wait_seconds': 0.0,
+            'min_concurrency': self.concurrency,
+        }
+
+    # ------------------------------------------------------------------
+    # Budget & Parallelität
+    # ------------------------------------------------------------------
+
+    def _acquire_slot(self):
+        with self._slot_free:
+            while self._in_flight >= self.concurrency:
+                self._slot_free.wait()
+            self._in_flight += 1
+
+    def _release_slot(self):
+        with self._slot_free:
+            self._in_flight -= 1
+            self._slot_free.notify_all()
+
+    def _acquire_budget(self, input_tokens: float, output_tokens: float):
+        """Blockiert, bis alle drei Buckets genug Budget haben, und reserviert es"""
+        needed = {'requests': 1, 'input_tokens': input_tokens, 'output_tokens': output_tokens}
+
+        while True:
+            with self._lock:
+                now = self._clock()
+                wait = max(self._paused_until - now, 0.0)
+                for name, amount in needed.items():
+                    wait = max(wait, self.buckets[name].wait_time(amount, now))
+
+                if wait <= 0:
+                    for name, amount in needed.items():
+                        self.buckets[name].consume(amount)
+                    return
+
+                self.stats['wait_seconds'] += wait
+
+            self._sleep(wait)
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Exponentielles Backoff mit Full Jitter, retry-after ist die Untergrenze"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _on_throttle(self, delay: float):
+        """Throttling: alle Requests pausieren und Parallelität halbieren"""
+        with self._lock:
+            now = self._clock()
+            self.stats['throttled'] += 1
+            self._paused_until = max(self._paused_until, now + delay)
+            self._success_streak = 0
+
+            # Nur einmal pro Backoff-Fenster reduzieren (parallele 429 zählen als eines)
+            if now - self._last_decrease > delay:
+                self.concurrency = max(1, self.concurrency // 2)
+                self._last_decrease = now
+                self.stats['min_concurrency'] = min(self.stats['min_concurrency'], self.concurrency)
+
+    def _on_success(self):
+        """Additives Wachstum: nach 'concurrency' Erfolgen einen Slot mehr"""
+        with self._slot_free:
+            self._success_streak += 1
+            if self.concurrency < self.max_concurrency and self._success_streak >= self.concurrency:
+                self.concurrency += 1
+                self._success_streak = 0
+                self._slot_free.notify_all()
+
+    # ------------------------------------------------------------------
+    # Limits & Usage
+    # ------------------------------------------------------------------
+
+    def update_limits(self, headers):
+        """Dimensioniert die Buckets aus anthropic-ratelimit-* Headern"""
+        if not headers:
+            return
+        with self._lock:
+            for header, name in LIMIT_HEADERS.items():
+                if name in self._fixed_limits:
+                    continue
+                value = headers.get(header)
+                if not value:
+                    continue
+                try:
+                    limit = float(value)
+                except ValueError:
+                    continue
+                bucket = self.buckets[name]
+                if bucket.capacity is None or abs(bucket.capacity - limit * bucket.headroom) > 1e-6:
+                    bucket.set_limit(limit)
+
+    def record_usage(self, usage, input_tokens: float, output_tokens: float):
+        """Korrigiert die reservierten Tokens mit den echten Werten aus response.usage"""
+        if usage is None:
+            return
+        actual_input = (getattr(usage, 'input_tokens', 0) or 0) + \
+            (getattr(usage, 'cache_creation_input_tokens', 0) or 0)
+        actual_output = getattr(usage, 'output_tokens', 0) or 0
+
+        with self._lock:
+            self.buckets['input_tokens'].adjust(actual_input - input_tokens)
+            self.buckets['output_tokens'].adjust(actual_output - output_tokens)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def call(self, request: Callable, input_tokens: float = 0, output_tokens: float = 0):
+        """
+        Führt einen API-Request unter Rate-Limit-Kontrolle aus.
+
+        Args:
+            request: Funktion ohne Argumente, die den API-Call ausführt.
+                     Liefert sie eine Raw-Response (mit .headers/.parse()),
+                     werden die Limits aus den Headern gelernt.
+            input_tokens: Geschätzte Input-Tokens
+            output_tokens: Geschätzte Output-Tokens
+
+        Returns:
+            Geparste Response
+
+        Raises:
+            Letzte Exception, wenn nicht retrybar oder max_retries erreicht
+        """
+        attempt = 0
+        while True:
+            self._acquire_slot()
+            try:
+                self._acquire_budget(input_tokens, output_tokens)
+                with self._lock:
+                    self.stats['requests'] += 1
+                result = request()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    with self._lock:
+                        self.stats['failed'] += 1
+                    raise
+
+                delay = self._backoff_delay(attempt, retry_after_seconds(e))
+                if _status_code(e) in (429, 529):
+                    self._on_throttle(delay)
+                with self._lock:
+                    self.stats['retries'] += 1
+                attempt += 1
+            else:
+                self.update_limits(getattr(result, 'headers', None))
+                response = result.parse() if hasattr(result, 'parse') else result
+                self.record_usage(getattr(response, 'usage', None), input_tokens, output_tokens)
+                self._on_success()
+                return response
+            finally:
+                self._release_slot()
+
+            self._sleep(delay)
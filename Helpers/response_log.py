@@ -0,0 +1,215 @@
+"""
+Kompaktes Protokoll der Klassifizierungs-Ergebnisse (Tab "KI Responses")
+
+Statt einem Dict pro Element in st.session_state werden die Ergebnisse spaltenweise
+gespeichert (array/interned Strings). Über max_rows hinaus werden die ältesten
+Zeilen in eine temporäre JSONL-Datei ausgelagert; ein Byte-Offset pro Zeile
+erlaubt direkten Zugriff. Für die Filter "Fehler" und "niedrige Konfidenz"
+werden Zeilen-Indizes beim Anhängen gepflegt, damit eine Seite (offset, limit)
+unabhängig von der Laufgrösse in O(limit) gelesen wird.
+"""
+
+import os
+import json
+import time
+import weakref
+import tempfile
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, List
+
+try:
+    from .ebkp_cache import UNCACHEABLE_CODES
+except ImportError:
+    from ebkp_cache import UNCACHEABLE_CODES
+
+# Zeilen im Speicher, darüber wird die ältere Hälfte auf Disk ausgelagert
+MAX_MEMORY_ROWS = 10_000
+
+# Confidence unter diesem Wert gilt als niedrig (Filter 'low')
+LOW_CONFIDENCE = 0.7
+
+# Filter: 'all' = alle Zeilen, 'errors' = ERROR/MISSING/..., 'low' = Confidence < LOW_CONFIDENCE
+VIEWS = ('all', 'errors', 'low')
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ResponseLog:
+    """
+    Spaltenweises, begrenztes Protokoll mit Auslagerung auf Disk.
+    Thread-safe (Worker-Thread schreibt, Seite liest).
+
+    Usage:
+        log = ResponseLog(max_rows=10_000)
+        log.append(0, 'Innenwand (Waende)', {'code': 'C02', 'desc': '...', 'conf': 0.9})
+        log.rows('errors', offset=0, limit=50)
+    """
+
+    def __init__(self, max_rows: int = MAX_MEMORY_ROWS, spill_dir: str = None,
+                 low_confidence: float = LOW_CONFIDENCE):
+        """
+        Args:
+            max_rows: Zeilen im Speicher (ältere werden ausgelagert)
+            spill_dir: Verzeichnis für die Auslagerungsdatei (default: System-Temp)
+            low_confidence: Schwelle für den Filter 'low'
+        """
+        self.max_rows = max(max_rows, 2)
+        self.spill_dir = spill_dir
+        self.low_confidence = low_confidence
+        self._lock = threading.Lock()
+
+        # Spalten der Zeilen im Speicher (Zeile n liegt bei Index n - self._spilled)
+        self._positions = array('l')
+        self._times = array('d')
+        self._confs = array('f')
+        self._codes: List[str] = []
+        self._descs: List[str] = []
+        self._elements: List[str] = []
+        self._strings: Dict[str, str] = {}  # Interning für Codes/Beschreibungen
+
+        # Indizes (globale Zeilennummern) für die Filter
+        self._views = {'errors': array('l'), 'low': array('l')}
+
+        # Ausgelagerte Zeilen 0 .. self._spilled-1
+        self._spilled = 0
+        self._offsets = array('q')
+        self._spill_path = None
+        self._spill = None
+        self._finalizer = None
+
+    def _intern(self, text: str) -> str:
+        return self._strings.setdefault(text, text)
+
+    def append(self, position: int, element: str, result: Dict, timestamp: float = None):
+        """
+        Hängt ein Ergebnis an.
+
+        Args:
+            position: Position des Elements im Input (0-basiert)
+            element: Anzeigetext des Elements (z.B. 'Innenwand (Waende)')
+            result: Dict mit 'code', 'desc', 'conf'
+            timestamp: Unix-Zeit (default: jetzt)
+        """
+        code = str(result.get('code', ''))
+        conf = float(result.get('conf') or 0.0)
+
+        with self._lock:
+            row = self._spilled + len(self._positions)
+            self._positions.append(position)
+            self._times.append(timestamp or time.time())
+            self._confs.append(conf)
+            self._codes.append(self._intern(code))
+            self._descs.append(self._intern(str(result.get('desc', ''))))
+            self._elements.append(element)
+
+            if code in UNCACHEABLE_CODES:
+                self._views['errors'].append(row)
+            if conf < self.low_confidence:
+                self._views['low'].append(row)
+
+            if len(self._positions) > self.max_rows:
+                self._spill_oldest(len(self._positions) - self.max_rows // 2)
+
+    def _spill_oldest(self, count: int):
+        """Lagert die ältesten 'count' Zeilen aus dem Speicher in die JSONL-Datei aus"""
+        if self._spill is None:
+            fd, self._spill_path = tempfile.mkstemp(prefix='ebkp_responses_', suffix='.jsonl', dir=self.spill_dir)
+            self._spill = os.fdopen(fd, 'w+b')
+            self._finalizer = weakref.finalize(self, _remove_file, self._spill_path)
+
+        self._spill.seek(0, os.SEEK_END)
+        for i in range(count):
+            self._offsets.append(self._spill.tell())
+            self._spill.write(json.dumps([
+                self._positions[i], self._times[i], self._confs[i],
+                self._codes[i], self._descs[i], self._elements[i]
+            ], ensure_ascii=False).encode('utf-8') + b'\n')
+        self._spill.flush()
+
+        del self._positions[:count]
+        del self._times[:count]
+        del self._confs[:count]
+        del self._codes[:count]
+        del self._descs[:count]
+        del self._elements[:count]
+        self._spilled += count
+
+    def _row(self, row: int) -> Dict:
+        """Zeile als Dict (aus dem Speicher oder per Offset von Disk)"""
+        i = row - self._spilled
+        if i >= 0:
+            values = (self._positions[i], self._times[i], self._confs[i],
+                      self._codes[i], self._descs[i], self._elements[i])
+        else:
+            self._spill.seek(self._offsets[row])
+            values = json.loads(self._spill.readline())
+
+        position, timestamp, conf, code, desc, element = values
+        return {
+            'row': row,
+            'request_num': position + 1,
+            'timestamp': datetime.fromtimestamp(timestamp).strftime("%H:%M:%S.%f")[:-3],
+            'element': element,
+            'code': code,
+            'desc': desc,
+            'conf': round(conf, 3),
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._spilled + len(self._positions)
+
+    @property
+    def spilled(self) -> int:
+        """Anzahl ausgelagerter Zeilen"""
+        return self._spilled
+
+    def count(self, view: str = 'all') -> int:
+        """Anzahl Zeilen im Filter ('all', 'errors', 'low')"""
+        if view == 'all':
+            return len(self)
+        with self._lock:
+            return len(self._views[view])
+
+    def rows(self, view: str = 'all', offset: int = 0, limit: int = 50, newest_first: bool = True) -> List[Dict]:
+        """
+        Eine Seite von Zeilen.
+
+        Args:
+            view: Filter ('all', 'errors', 'low')
+            offset: Anzahl zu überspringender Zeilen (in Anzeige-Reihenfolge)
+            limit: Zeilen pro Seite
+            newest_first: Neueste zuerst
+
+        Returns:
+            Liste von Dicts mit 'row', 'request_num', 'timestamp', 'element', 'code', 'desc', 'conf'
+        """
+        with self._lock:
+            total = self._spilled + len(self._positions) if view == 'all' else len(self._views[view])
+            if newest_first:
+                indices = range(total - 1 - offset, max(total - 1 - offset - limit, -1), -1)
+            else:
+                indices = range(offset, min(offset + limit, total))
+
+            if view == 'all':
+                return [self._row(i) for i in indices]
+            return [self._row(self._views[view][i]) for i in indices]
+
+    def latest(self, count: int = 5) -> List[Dict]:
+        """Die neuesten Zeilen (älteste zuerst)"""
+        return list(reversed(self.rows('all', 0, count, newest_first=True)))
+
+    def close(self):
+        """Schliesst und löscht die Auslagerungsdatei"""
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+                self._finalizer()
@@ -3,10 +3,20 @@ Streamlit App zur Visualisierung und Interaktion mit dem Datenverarbeitungsproze
 Zeigt ausgewertete Daten nach eBKP-H gegliedert mit aufklappbaren Bereichen.
 '''
 
+import io
+import os
+import sys
+from functools import partial
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+# Füge Parent-Verzeichnis zum Path hinzu für Imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from Helpers.ebkp_aggregation import EBKP_HAUPTGRUPPEN, AggregationCube, frame_fingerprint, flaeche_column
+
 # Seitenkonfiguration
 st.set_page_config(
     page_title="eBKP-H Auswertung",
@@ -14,37 +24,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# eBKP-H Hauptgruppen Definition
-EBKP_HAUPTGRUPPEN = {
-    'C': 'Bauwerk - Rohbau',
-    'D': 'Bauwerk - Technik',
-    'E': 'Bauwerk - Ausbau',
-    'F': 'Umgebung',
-    'G': 'Baunebenkosten'
-}
-
-
-def extract_bkp_hauptgruppe(bkp_code: str) -> str:
-    """Extrahiert die Hauptgruppe aus dem BKP-Code (z.B. 'C' aus 'C1.1')"""
-    if pd.isna(bkp_code) or not bkp_code:
-        return 'Unbekannt'
-    bkp_str = str(bkp_code).strip()
-    if bkp_str and bkp_str[0].upper() in EBKP_HAUPTGRUPPEN:
-        return bkp_str[0].upper()
-    return 'Unbekannt'
-
-
-def extract_bkp_untergruppe(bkp_code: str) -> str:
-    """Extrahiert die Untergruppe aus dem BKP-Code (z.B. 'C1' aus 'C1.1')"""
-    if pd.isna(bkp_code) or not bkp_code:
-        return 'Unbekannt'
-    bkp_str = str(bkp_code).strip()
-    # Nimm alles bis zum ersten Punkt oder bis zu zwei Zeichen
-    if '.' in bkp_str:
-        return bkp_str.split('.')[0]
-    elif len(bkp_str) >= 2:
-        return bkp_str[:2]
-    return bkp_str
+# Zeilen pro Seite in Detail- und Rohdatentabellen
+DETAIL_PAGE_SIZE = 100
+
+# Untergruppen pro Seite innerhalb einer Hauptgruppe
+UNTERGRUPPEN_PAGE_SIZE = 25
+
+
+@st.cache_data(max_entries=4, show_spinner="CSV-Datei wird gelesen...")
+def read_csv(data: bytes) -> pd.DataFrame:
+    """Liest die hochgeladene CSV einmal pro Inhalt (versucht verschiedene Trennzeichen)"""
+    try:
+        return pd.read_csv(io.BytesIO(data), sep=';', encoding='utf-8-sig')
+    except:
+        return pd.read_csv(io.BytesIO(data), encoding='utf-8-sig')
+
+
+@st.cache_resource(max_entries=8, show_spinner="Auswertung wird berechnet...")
+def get_cube(fingerprint: str, _df: pd.DataFrame) -> AggregationCube:
+    """Aggregations-Würfel pro Inhalts-Hash des DataFrames (Reruns ohne Änderung rechnen nichts neu)"""
+    return AggregationCube.build(_df)
 
 
 def format_currency(value: float) -> str:
@@ -71,59 +70,105 @@ def calculate_grouped_totals(df: pd.DataFrame, group_column: str) -> pd.DataFram
     return grouped.reset_index()
 
 
-def display_bkp_hierarchy(df: pd.DataFrame, hauptgruppe: str):
-    """Zeigt die BKP-Hierarchie für eine Hauptgruppe an"""
-    hauptgruppe_df = df[df['BKP_Hauptgruppe'] == hauptgruppe].copy()
+def format_measure(row: dict, measures: list) -> str:
+    """Hauptkennzahl einer aggregierten Zeile (Kosten, sonst Fläche, sonst Anzahl)"""
+    flaeche_col = flaeche_column(measures)
+    if 'Kosten' in measures:
+        return format_currency(row['Kosten'])
+    elif flaeche_col:
+        return f"{row[flaeche_col]:,.2f} m²".replace(',', "'")
+    return f"{row['Anzahl']} Stk."
+
+
+def lazy_expander(label: str, key: str, expanded: bool = False):
+    """
+    Expander, dessen Inhalt nur im geöffneten Zustand gerendert werden soll.
+    Auf-/Zuklappen löst einen Rerun aus; im Block 'if expander.open:' prüfen.
+    """
+    return st.expander(label, expanded=expanded, key=key, on_change="rerun")
+
+
+def paginate(total: int, page_size: int, key: str) -> slice:
+    """
+    Seitenauswahl (nur bei mehr als einer Seite) für eine Liste oder Tabelle.
+
+    Args:
+        total: Anzahl Einträge
+        page_size: Einträge pro Seite
+        key: Widget-Key der Seitenauswahl
+
+    Returns:
+        Bereich der aktuellen Seite (für rows[...] / df.iloc[...])
+    """
+    num_pages = max(1, (total + page_size - 1) // page_size)
+    page = 1
+    if num_pages > 1:
+        col1, col2 = st.columns([1, 4])
+        with col1:
+            page = st.number_input("Seite", min_value=1, max_value=num_pages, value=1, step=1, key=key)
+        with col2:
+            st.caption(f"Seite {page} von {num_pages:,} ({total:,} Einträge)")
+    offset = (page - 1) * page_size
+    return slice(offset, min(offset + page_size, total))
+
 
-    if hauptgruppe_df.empty:
+def display_bkp_hierarchy(df: pd.DataFrame, cube: AggregationCube, hauptgruppe: str):
+    """
+    Zeigt die BKP-Hierarchie für eine Hauptgruppe an (Totale aus dem Aggregations-Würfel).
+    Untergruppen erscheinen als aggregierte Zeilen; Codes und Detailtabelle werden
+    erst beim Öffnen gerendert, die Detailtabelle seitenweise.
+    """
+    untergruppen = cube.untergruppen(hauptgruppe)
+
+    if untergruppen.empty:
         st.info(f"Keine Daten für Hauptgruppe {hauptgruppe}")
         return
 
     # Berechne Totale
-    if 'Kosten' in hauptgruppe_df.columns:
-        total = hauptgruppe_df['Kosten'].sum()
+    anzahl = untergruppen['Anzahl'].sum()
+    flaeche_col = flaeche_column(cube.measures)
+    if 'Kosten' in cube.measures:
+        total = untergruppen['Kosten'].sum()
         st.metric("Zwischentotal", format_currency(total),
-                 delta=f"{len(hauptgruppe_df)} Elemente")
-    elif 'Fläche (m²)' in hauptgruppe_df.columns or 'Fläche' in hauptgruppe_df.columns:
-        flaeche_col = 'Fläche (m²)' if 'Fläche (m²)' in hauptgruppe_df.columns else 'Fläche'
-        total = hauptgruppe_df[flaeche_col].sum()
+                 delta=f"{anzahl} Elemente")
+    elif flaeche_col:
+        total = untergruppen[flaeche_col].sum()
         st.metric("Zwischentotal Fläche", f"{total:,.2f} m²".replace(',', "'"),
-                 delta=f"{len(hauptgruppe_df)} Elemente")
+                 delta=f"{anzahl} Elemente")
     else:
-        st.metric("Anzahl Elemente", len(hauptgruppe_df))
-
-    # Gruppiere nach Untergruppe
-    untergruppen = hauptgruppe_df.groupby('BKP_Untergruppe')
-
-    for untergruppe, ug_df in untergruppen:
-        with st.expander(f"**{untergruppe}** - {len(ug_df)} Elemente", expanded=False):
-            # Zeige BKP-Beschreibungen
-            if 'BKP_Beschreibung' in ug_df.columns:
-                beschreibungen = ug_df.groupby(['BKP_Code', 'BKP_Beschreibung'])
-
-                for (code, beschr), beschr_df in beschreibungen:
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.write(f"**{code}**: {beschr}")
-                    with col2:
-                        if 'Kosten' in beschr_df.columns:
-                            kosten = beschr_df['Kosten'].sum()
-                            st.write(f"*{format_currency(kosten)}*")
-                        elif 'Fläche (m²)' in beschr_df.columns or 'Fläche' in beschr_df.columns:
-                            flaeche_col = 'Fläche (m²)' if 'Fläche (m²)' in beschr_df.columns else 'Fläche'
-                            flaeche = beschr_df[flaeche_col].sum()
-                            st.write(f"*{flaeche:,.2f} m²*")
-                        else:
-                            st.write(f"*{len(beschr_df)} Stk.*")
-            else:
-                # Fallback: Zeige einfach die Codes
-                codes = ug_df['BKP_Code'].value_counts()
-                for code, count in codes.items():
-                    st.write(f"**{code}**: {count} Elemente")
+        st.metric("Anzahl Elemente", anzahl)
+
+    rows = untergruppen.to_dict('records')
+    for ug_row in rows[paginate(len(rows), UNTERGRUPPEN_PAGE_SIZE, key=f"ug_page_{hauptgruppe}")]:
+        untergruppe = ug_row['BKP_Untergruppe']
+        label = f"**{untergruppe}** - {ug_row['Anzahl']} Elemente"
+        if cube.measures:
+            label += f" | {format_measure(ug_row, cube.measures)}"
+
+        expander = lazy_expander(label, key=f"ug_{hauptgruppe}_{untergruppe}")
+        with expander:
+            if not expander.open:
+                continue
+
+            codes = cube.codes(hauptgruppe, untergruppe)
+            codes = codes[codes['BKP_Code'].notna()]  # Zeilen ohne Code nur in Anzahl und Totalen
+
+            # Codes (und Beschreibungen) als eine Tabelle statt einer Zeile pro Code
+            columns = ['BKP_Code'] + (['BKP_Beschreibung'] if cube.has_beschreibung else [])
+            if not cube.has_beschreibung:
+                codes = codes.sort_values('Anzahl', ascending=False, kind='stable')
+            st.dataframe(
+                codes[columns + ['Anzahl'] + cube.measures],
+                hide_index=True,
+                use_container_width=True,
+                column_config={col: st.column_config.NumberColumn(format="%.2f") for col in cube.measures}
+            )
 
-            # Detailtabelle
-            with st.expander("📋 Details anzeigen", expanded=False):
-                st.dataframe(ug_df, use_container_width=True, height=300)
+            # Detailtabelle (seitenweise, nur auf Anfrage)
+            if st.toggle("📋 Details anzeigen", key=f"details_{hauptgruppe}_{untergruppe}"):
+                positions = cube.rows(hauptgruppe, untergruppe)
+                page = paginate(len(positions), DETAIL_PAGE_SIZE, key=f"details_page_{hauptgruppe}_{untergruppe}")
+                st.dataframe(df.iloc[positions[page]], use_container_width=True, height=300)
 
 
 # Haupttitel
@@ -182,12 +227,8 @@ if use_auto_data:
 
 elif uploaded_file is not None:
     try:
-        # CSV einlesen (versuche verschiedene Trennzeichen)
-        try:
-            df = pd.read_csv(uploaded_file, sep=';', encoding='utf-8-sig')
-        except:
-            uploaded_file.seek(0)
-            df = pd.read_csv(uploaded_file, encoding='utf-8-sig')
+        # CSV einlesen (einmal pro Dateiinhalt)
+        df = read_csv(uploaded_file.getvalue())
 
         # Prüfe ob BKP_Code Spalte existiert
         if 'BKP_Code' not in df.columns:
@@ -213,9 +254,14 @@ elif uploaded_file is not None:
 # Verarbeite Daten wenn vorhanden
 if df is not None:
     try:
-        # Extrahiere BKP-Hierarchie
-        df['BKP_Hauptgruppe'] = df['BKP_Code'].apply(extract_bkp_hauptgruppe)
-        df['BKP_Untergruppe'] = df['BKP_Code'].apply(extract_bkp_untergruppe)
+        # Aggregation in einem Durchgang, gecacht pro Inhalts-Hash
+        fingerprint = frame_fingerprint(df)
+        cube = get_cube(fingerprint, df)
+        flaeche_col = flaeche_column(cube.measures)
+
+        # BKP-Hierarchie (für Detailtabellen und Export)
+        df['BKP_Hauptgruppe'] = cube.hauptgruppe
+        df['BKP_Untergruppe'] = cube.untergruppe
 
         # Übersichts-Metriken
         st.subheader("📈 Übersicht")
@@ -223,23 +269,19 @@ if df is not None:
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
-            st.metric("Gesamt Elemente", len(df))
+            st.metric("Gesamt Elemente", cube.totals['Anzahl'])
 
         with col2:
-            unique_codes = df['BKP_Code'].nunique()
-            st.metric("Verschiedene BKP-Codes", unique_codes)
+            st.metric("Verschiedene BKP-Codes", cube.unique_codes)
 
         with col3:
-            hauptgruppen_count = df['BKP_Hauptgruppe'].nunique()
-            st.metric("Hauptgruppen", hauptgruppen_count)
+            st.metric("Hauptgruppen", len(cube.hauptgruppen))
 
         with col4:
-            if 'Kosten' in df.columns:
-                gesamtkosten = df['Kosten'].sum()
-                st.metric("Gesamtkosten", format_currency(gesamtkosten))
-            elif 'Fläche (m²)' in df.columns or 'Fläche' in df.columns:
-                flaeche_col = 'Fläche (m²)' if 'Fläche (m²)' in df.columns else 'Fläche'
-                gesamtflaeche = df[flaeche_col].sum()
+            if 'Kosten' in cube.measures:
+                st.metric("Gesamtkosten", format_currency(cube.totals['Kosten']))
+            elif flaeche_col:
+                gesamtflaeche = cube.totals[flaeche_col]
                 st.metric("Gesamtfläche", f"{gesamtflaeche:,.2f} m²".replace(',', "'"))
 
         st.markdown("---")
@@ -249,7 +291,9 @@ if df is not None:
 
         with col1:
             st.subheader("📊 Verteilung nach Hauptgruppe")
-            hauptgruppen_dist = df['BKP_Hauptgruppe'].value_counts().reset_index()
+            hauptgruppen_dist = cube.hauptgruppen[['BKP_Hauptgruppe', 'Anzahl']].sort_values(
+                'Anzahl', ascending=False, kind='stable'
+            )
             hauptgruppen_dist.columns = ['Hauptgruppe', 'Anzahl']
             hauptgruppen_dist['Bezeichnung'] = hauptgruppen_dist['Hauptgruppe'].map(
                 lambda x: EBKP_HAUPTGRUPPEN.get(x, 'Unbekannt')
@@ -267,8 +311,8 @@ if df is not None:
         with col2:
             st.subheader("💰 Kosten/Mengen nach Hauptgruppe")
 
-            if 'Kosten' in df.columns:
-                kosten_dist = df.groupby('BKP_Hauptgruppe')['Kosten'].sum().reset_index()
+            if 'Kosten' in cube.measures:
+                kosten_dist = cube.hauptgruppen[['BKP_Hauptgruppe', 'Kosten']].copy()
                 kosten_dist['Bezeichnung'] = kosten_dist['BKP_Hauptgruppe'].map(
                     lambda x: EBKP_HAUPTGRUPPEN.get(x, 'Unbekannt')
                 )
@@ -282,9 +326,8 @@ if df is not None:
                 )
                 fig2.update_traces(texttemplate='CHF %{y:,.0f}', textposition='outside')
                 st.plotly_chart(fig2, use_container_width=True)
-            elif 'Fläche (m²)' in df.columns or 'Fläche' in df.columns:
-                flaeche_col = 'Fläche (m²)' if 'Fläche (m²)' in df.columns else 'Fläche'
-                flaeche_dist = df.groupby('BKP_Hauptgruppe')[flaeche_col].sum().reset_index()
+            elif flaeche_col:
+                flaeche_dist = cube.hauptgruppen[['BKP_Hauptgruppe', flaeche_col]].copy()
                 flaeche_dist['Bezeichnung'] = flaeche_dist['BKP_Hauptgruppe'].map(
                     lambda x: EBKP_HAUPTGRUPPEN.get(x, 'Unbekannt')
                 )
@@ -307,28 +350,34 @@ if df is not None:
         st.subheader("🏗️ Detaillierte eBKP-H Gliederung")
 
         # Sortiere Hauptgruppen alphabetisch
-        vorhandene_hauptgruppen = sorted(df['BKP_Hauptgruppe'].unique())
+        vorhandene_hauptgruppen = list(cube.hauptgruppen['BKP_Hauptgruppe'])
 
         for hauptgruppe in vorhandene_hauptgruppen:
             hauptgruppe_name = EBKP_HAUPTGRUPPEN.get(hauptgruppe, f'Gruppe {hauptgruppe}')
 
-            with st.expander(
+            # Inhalt nur rendern, wenn die Gruppe offen ist
+            expander = lazy_expander(
                 f"**{hauptgruppe} - {hauptgruppe_name}**",
+                key=f"hg_{hauptgruppe}",
                 expanded=(hauptgruppe == vorhandene_hauptgruppen[0])  # Erste Gruppe ausgeklappt
-            ):
-                display_bkp_hierarchy(df, hauptgruppe)
+            )
+            with expander:
+                if expander.open:
+                    display_bkp_hierarchy(df, cube, hauptgruppe)
 
         st.markdown("---")
 
-        # Rohdaten und Export
-        with st.expander("📑 Rohdaten anzeigen", expanded=False):
-            st.dataframe(df, use_container_width=True)
+        # Rohdaten und Export (seitenweise, nur wenn geöffnet)
+        expander = lazy_expander("📑 Rohdaten anzeigen", key="rohdaten")
+        with expander:
+            if expander.open:
+                st.dataframe(df.iloc[paginate(len(df), DETAIL_PAGE_SIZE, key="rohdaten_page")],
+                             use_container_width=True)
 
-            # Export-Button
-            csv_export = df.to_csv(index=False, sep=';', encoding='utf-8-sig')
+            # Export-Button (CSV wird erst beim Klick erzeugt, nicht bei jedem Rerun)
             st.download_button(
                 label="📥 Daten als CSV herunterladen",
-                data=csv_export,
+                data=partial(df.to_csv, index=False, sep=';', encoding='utf-8-sig'),
                 file_name="ebkp_auswertung.csv",
                 mime="text/csv"
             )
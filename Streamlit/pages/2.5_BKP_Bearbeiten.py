@@ -6,8 +6,18 @@ Ermöglicht manuelle Korrekturen der KI-klassifizierten BKP-Codes
 import streamlit as st
 import pandas as pd
 import re
+import sys
+import os
 from datetime import datetime
 
+# Füge Parent-Verzeichnis zum Path hinzu für Imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from Helpers.ebkp_catalog import load_catalog
+from Helpers.ebkp_cache import element_signature
+from Helpers.ebkp_corrections import CorrectionStore
+from Helpers.eBKP_H_Classifier import extract_elements
+
 # Seitenkonfiguration
 st.set_page_config(
     page_title="BKP Bearbeiten",
@@ -15,41 +25,19 @@ st.set_page_config(
     layout="wide"
 )
 
-# Bekannte BKP-Codes für Validierung (Auszug)
-VALID_BKP_CODES = {
-    'C': 'Elektroinstallationen',
-    'C1': 'Starkstrom',
-    'C11': 'Starkstromhauptverteilung',
-    'C12': 'Installationsverteilungen',
-    'C13': 'Steckdosen',
-    'C14': 'Leuchten',
-    'C15': 'Sicherheitsbeleuchtung',
-    'C2': 'Schwachstrom',
-    'C21': 'Telefon/Daten',
-    'C22': 'Alarm/Sicherheit',
-    'D': 'Heizung/Lüftung/Klima/Sanitär',
-    'D1': 'Heizung',
-    'D2': 'Lüftung/Klima',
-    'D3': 'Sanitär',
-    'D31': 'Kalt-/Warmwasser',
-    'D32': 'Abwasser',
-    'E': 'Bauwerk - Rohbau',
-    'E1': 'Fundament',
-    'E2': 'Wände/Stützen',
-    'E21': 'Tragende Wände',
-    'E22': 'Trennwände',
-    'E3': 'Decken',
-    'F': 'Bauwerk - Technik',
-    'F1': 'Fenster/Fenstertüren',
-    'F2': 'Aussentüren',
-    'F3': 'Innentüren',
-    'G': 'Baunebenkosten'
-}
+# eBKP-H Katalog für Validierung (einmal pro Prozess geladen, O(1) Lookup)
+catalog = load_catalog()
+
+# Korrektur-Speicher: gespeicherte Korrekturen nutzt der Classifier vor der API
+corrections = CorrectionStore()
+
+# Format eines eBKP-H Codes: C, C02, C02.01, C02.01.001, C02.01.001.001
+EBKP_CODE_PATTERN = re.compile(r'^[A-Z](\d{2}(\.\d{2}(\.\d{3}(\.\d{3})?)?)?)?$')
 
 
 def validate_bkp_code(code: str) -> dict:
     """
-    Validiert einen BKP-Code
+    Validiert einen BKP-Code gegen den eBKP-H Katalog
 
     Returns:
         dict mit 'valid', 'message', 'known_code'
@@ -59,16 +47,60 @@ def validate_bkp_code(code: str) -> dict:
 
     code = str(code).strip().upper()
 
-    # Prüfe Format: Muss mit C/D/E/F/G beginnen
-    if not re.match(r'^[CDEFG]', code):
-        return {'valid': False, 'message': 'Muss mit C/D/E/F/G beginnen', 'known_code': False}
+    # Prüfe ob Code im Katalog ist
+    entry = catalog.get(code)
+    if entry is not None and entry.level == 1:
+        # Nur Hauptgruppe: der Classifier liefert mindestens Level 2
+        return {'valid': False, 'message': f'Nur Hauptgruppe ({entry.description}), z.B. {code}02',
+                'known_code': True}
+    if entry is not None:
+        return {'valid': True, 'message': entry.description, 'known_code': True}
+
+    # Prüfe Format: Hauptgruppe + Level-Stellen (z.B. C02.01)
+    if not EBKP_CODE_PATTERN.match(code):
+        return {'valid': False, 'message': 'Kein eBKP-H Format (z.B. C02)', 'known_code': False}
+
+    # Code hat gültiges Format, ist aber nicht im Katalog (würde als Korrektur nie greifen)
+    return {'valid': False, 'message': 'Code nicht im eBKP-H Katalog', 'known_code': False}
+
+
+def save_corrections(original: pd.DataFrame, edited: pd.DataFrame) -> int:
+    """
+    Speichert akzeptierte Korrekturen im Korrektur-Speicher: Zeilen mit geändertem
+    Code oder als bearbeitet markierte Zeilen mit gültigem Code.
 
-    # Prüfe ob Code bekannt ist
-    if code in VALID_BKP_CODES:
-        return {'valid': True, 'message': VALID_BKP_CODES[code], 'known_code': True}
+    Args:
+        original: Zeilen vor der Bearbeitung
+        edited: Zeilen aus dem Editor (gleicher Index)
 
-    # Code hat gültiges Format, ist aber nicht in der Liste
-    return {'valid': True, 'message': 'Format OK, Code unbekannt', 'known_code': False}
+    Returns:
+        Anzahl gespeicherter Signaturen (0 ohne Spalten-Zuordnung)
+    """
+    column_mapping = st.session_state.get('column_mapping')
+    if not column_mapping:
+        return 0
+
+    codes = edited['BKP_Code'].astype(str).str.strip().str.upper()
+    changed = codes != original.loc[edited.index, 'BKP_Code'].astype(str).str.strip().str.upper()
+    accepted = edited.index[(changed | edited['Bearbeitet'].fillna(False).astype(bool)).to_numpy()]
+    accepted = [idx for idx in accepted if validate_bkp_code(codes[idx])['valid']]
+    if not accepted:
+        return 0
+
+    elements = extract_elements(original.loc[accepted], column_mapping)
+    items = {}
+    for idx, element in zip(accepted, elements):
+        # Beschreibung aus dem Katalog, ausser die Zelle selbst wurde bearbeitet
+        # (sonst bliebe bei reiner Code-Änderung die alte Modell-Beschreibung stehen)
+        desc = catalog.description(codes[idx])
+        if 'BKP_Beschreibung' in edited.columns:
+            new_desc = edited.loc[idx, 'BKP_Beschreibung']
+            old_desc = original.loc[idx, 'BKP_Beschreibung'] if 'BKP_Beschreibung' in original.columns else None
+            if isinstance(new_desc, str) and new_desc.strip() and new_desc.strip() != str(old_desc or '').strip():
+                desc = new_desc.strip()
+        items[element_signature(element)] = {'code': codes[idx], 'desc': desc}
+    corrections.put_many(items)
+    return len(items)
 
 
 # Haupttitel
@@ -145,6 +177,10 @@ with st.sidebar:
     )
 
     st.markdown("---")
+    st.caption(f"💾 {len(corrections)} gespeicherte Korrekturen – werden bei der nächsten "
+               f"Klassifizierung ohne API-Call übernommen")
+    if not st.session_state.get('column_mapping'):
+        st.caption("⚠️ Keine Spalten-Zuordnung: Korrekturen werden nur in dieser Sitzung gespeichert")
 
     # BKP-Referenz
     with st.expander("📖 BKP-Referenz"):
@@ -180,7 +216,7 @@ if conf_filter == "Nur niedrige Konfidenz":
     filtered_df = filtered_df[filtered_df['KI_Konfidenz'] < conf_threshold]
     st.info(f"📌 Zeige {len(filtered_df)} Elemente mit Konfidenz < {conf_threshold:.0%}")
 elif conf_filter == "Nur Fehler":
-    filtered_df = filtered_df[filtered_df['BKP_Code'].isin(['ERROR', 'PARSE_ERROR', 'UNKNOWN'])]
+    filtered_df = filtered_df[filtered_df['BKP_Code'].isin(['ERROR', 'PARSE_ERROR', 'UNKNOWN', 'MISSING'])]
     st.warning(f"⚠️ {len(filtered_df)} Elemente mit Fehlern")
 
 # Gruppen-Filter
@@ -191,7 +227,7 @@ if show_groups:
         'E - Rohbau': 'E',
         'F - Technik': 'F',
         'G - Nebenkosten': 'G',
-        'Fehler': ['ERROR', 'PARSE_ERROR', 'UNKNOWN']
+        'Fehler': ['ERROR', 'PARSE_ERROR', 'UNKNOWN', 'MISSING']
     }
 
     groups_to_show = []
@@ -285,18 +321,14 @@ for idx, row in edited_df.iterrows():
 
 validation_df = pd.DataFrame(validation_results)
 
-# Zeige Validierungs-Statistik
-col1, col2, col3 = st.columns(3)
+# Zeige Validierungs-Statistik (gültig = im Katalog)
+col1, col2 = st.columns(2)
 
 with col1:
     valid_count = validation_df['Valid'].sum()
     st.metric("✅ Gültige Codes", f"{valid_count}/{len(validation_df)}")
 
 with col2:
-    known_count = validation_df['Known'].sum()
-    st.metric("📚 Bekannte Codes", f"{known_count}/{len(validation_df)}")
-
-with col3:
     invalid_count = len(validation_df) - valid_count
     if invalid_count > 0:
         st.metric("⚠️ Ungültige Codes", invalid_count, delta_color="inverse")
@@ -311,13 +343,6 @@ if not invalid_codes.empty:
     for _, row in invalid_codes.iterrows():
         st.error(f"Zeile {row['Index']}: `{row['Code']}` - {row['Message']}")
 
-# Zeige unbekannte aber gültige Codes
-unknown_valid = validation_df[validation_df['Valid'] & ~validation_df['Known']]
-if not unknown_valid.empty:
-    with st.expander(f"ℹ️ {len(unknown_valid)} gültige aber unbekannte Codes"):
-        for _, row in unknown_valid.iterrows():
-            st.info(f"Zeile {row['Index']}: `{row['Code']}` - {row['Message']}")
-
 # Speichern
 st.markdown("---")
 
@@ -334,6 +359,9 @@ with col1:
 
 with col2:
     if st.button("💾 Speichern", type="primary", use_container_width=True, disabled=not changes_made):
+        # Korrekturen dauerhaft speichern (vor dem Überschreiben der Original-Codes)
+        saved = save_corrections(df, edited_df)
+
         # Aktualisiere die Original-Daten
         for idx in filtered_df.index:
             if idx in edited_df.index:
@@ -344,7 +372,7 @@ with col2:
         # Speichere zurück in Session State
         st.session_state.classification_results = df
 
-        st.success("✅ Änderungen gespeichert!")
+        st.success(f"✅ Änderungen gespeichert! ({saved} Korrekturen für künftige Klassifizierungen)")
         st.balloons()
 
         # Kurze Pause für User Feedback
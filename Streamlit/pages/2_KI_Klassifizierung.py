@@ -7,7 +7,6 @@ import streamlit as st
 import pandas as pd
 import sys
 import os
-import time
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
@@ -16,7 +15,11 @@ import plotly.graph_objects as go
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 try:
-    from Helpers.eBKP_H_Classifier import eBKPHClassifier
+    from Helpers.eBKP_H_Classifier import eBKPHClassifier, extract_elements, load_env, MODEL
+    from Helpers.ebkp_catalog import load_catalog
+    from Helpers.ebkp_jobs import JobRunner, QUEUED, RUNNING, DONE, FINISHED
+    from Helpers.response_log import ResponseLog
+    from Helpers.progress import UPDATES_PER_SECOND, format_duration
 except ImportError:
     st.error("eBKP_H_Classifier konnte nicht importiert werden. Stellen Sie sicher, dass Helpers/eBKP_H_Classifier.py existiert.")
     st.stop()
@@ -36,9 +39,24 @@ if 'processing_log' not in st.session_state:
 if 'total_cost' not in st.session_state:
     st.session_state.total_cost = 0.0
 if 'api_responses' not in st.session_state:
-    st.session_state.api_responses = []
+    st.session_state.api_responses = ResponseLog()  # spaltenweise, begrenzt (Rest auf Disk)
 if 'active_tab' not in st.session_state:
     st.session_state.active_tab = 0
+if 'usage_stats' not in st.session_state:
+    st.session_state.usage_stats = None
+if 'column_mapping' not in st.session_state:
+    st.session_state.column_mapping = None
+if 'job_ids' not in st.session_state:
+    st.session_state.job_ids = []  # Hintergrund-Jobs dieser Session
+if 'active_job' not in st.session_state:
+    st.session_state.active_job = None  # zuletzt gestarteter Job (wird nach Abschluss übernommen)
+if 'applied_job' not in st.session_state:
+    st.session_state.applied_job = None  # Job, dessen Ergebnisse angezeigt werden
+if 'celebrate' not in st.session_state:
+    st.session_state.celebrate = False
+
+# Sekunden zwischen Status-Abfragen laufender Jobs (höchstens UPDATES_PER_SECOND Anzeige-Updates)
+JOB_POLL_SECONDS = 1.0 / UPDATES_PER_SECOND
 
 
 def estimate_cost(num_elements: int, batch_mode: bool = True, batch_size: int = 40) -> dict:
@@ -81,6 +99,17 @@ def estimate_cost(num_elements: int, batch_mode: bool = True, batch_size: int =
     }
 
 
+def usage_cost(stats: dict) -> float:
+    """Berechnet die tatsächlichen Kosten aus dem gemessenen Token-Verbrauch"""
+    # Claude Haiku Pricing: Cache-Write 1.25x, Cache-Read 0.1x des Input-Preises
+    return (
+        stats.get('input_tokens', 0) / 1_000_000 * 0.80 +
+        stats.get('cache_write_tokens', 0) / 1_000_000 * 1.00 +
+        stats.get('cache_read_tokens', 0) / 1_000_000 * 0.08 +
+        stats.get('output_tokens', 0) / 1_000_000 * 4.00
+    )
+
+
 def add_log(message: str, level: str = "info"):
     """Fügt einen Eintrag zum Processing Log hinzu"""
     timestamp = datetime.now().strftime("%H:%M:%S")
@@ -91,47 +120,30 @@ def add_log(message: str, level: str = "info"):
     })
 
 
-def add_api_response(request_num: int, element_info: str, response: str, parsed_result: dict):
-    """Speichert eine API-Response für Echtzeit-Anzeige"""
-    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-    st.session_state.api_responses.append({
-        'timestamp': timestamp,
-        'request_num': request_num,
-        'element': element_info,
-        'raw_response': response,
-        'parsed_result': parsed_result
-    })
-
-
 def display_log():
-    """Zeigt das Processing Log an (theme-aware)"""
+    """Zeigt das Processing Log als eine Tabelle an (ein Widget statt eines pro Eintrag, theme-aware)"""
     if st.session_state.processing_log:
-        # Zeige Log-Einträge mit nativen Streamlit-Komponenten für Dark Mode Support
-        for log_entry in st.session_state.processing_log:
-            timestamp = log_entry['timestamp']
-            message = log_entry['message']
-            level = log_entry['level']
-
-            # Icons für Level
-            level_icons = {
-                'info': 'ℹ️',
-                'success': '✅',
-                'warning': '⚠️',
-                'error': '❌'
-            }
-
-            icon = level_icons.get(level, 'ℹ️')
-            log_text = f"{icon} **{timestamp}** | {message}"
-
-            # Zeige mit entsprechendem Streamlit-Widget (auto Dark Mode)
-            if level == 'error':
-                st.error(log_text, icon=icon)
-            elif level == 'warning':
-                st.warning(log_text, icon=icon)
-            elif level == 'success':
-                st.success(log_text, icon=icon)
-            else:
-                st.info(log_text, icon=icon)
+        # Icons für Level
+        level_icons = {
+            'info': 'ℹ️',
+            'success': '✅',
+            'warning': '⚠️',
+            'error': '❌'
+        }
+
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    '': level_icons.get(entry['level'], 'ℹ️'),
+                    'Zeit': entry['timestamp'],
+                    'Meldung': entry['message']
+                }
+                for entry in st.session_state.processing_log
+            ]),
+            hide_index=True,
+            use_container_width=True,
+            height=min(35 * len(st.session_state.processing_log) + 38, 400)
+        )
 
 
 # API-Key Prüfung
@@ -140,10 +152,173 @@ def get_api_key():
     # Prüfe Session State zuerst
     if 'api_key' in st.session_state and st.session_state.api_key:
         return st.session_state.api_key
-    # Fallback auf Umgebungsvariable
+    # Fallback auf Umgebungsvariable (inkl. .env)
+    load_env()
     return os.getenv('ANTHROPIC_API_KEY')
 
 
+@st.cache_resource(show_spinner="eBKP-H Classifier wird initialisiert...")
+def get_classifier(api_key: str, model: str, catalog_fingerprint: str):
+    """
+    Ein Classifier pro API-Key, Modell und Katalog-Stand, geteilt über Reruns und
+    Benutzer: Katalog, System Prompt und HTTP-Client (Keep-Alive) werden nur einmal
+    aufgebaut. Pro Lauf wird mit .session() eine Kopie mit eigener Statistik verwendet.
+    """
+    return eBKPHClassifier(api_key=api_key, model=model)
+
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    """Prozessweiter Job-Runner: Klassifizierungen laufen unabhängig von Reruns und Sessions"""
+    return JobRunner()
+
+
+def apply_job(job):
+    """Übernimmt Log, Responses, Token-Verbrauch und (falls fertig) Ergebnisse eines beendeten Jobs"""
+    snapshot = job.snapshot(responses=0)
+    context = job.context
+
+    st.session_state.processing_log = snapshot['log']
+    st.session_state.api_responses = job.responses  # Referenz, keine Kopie
+    st.session_state.usage_stats = dict(snapshot['stats'])
+    st.session_state.usage_stats['elements_per_second'] = snapshot['elements_per_second']
+    st.session_state.total_cost = context.get('estimated_cost', 0.0)
+    st.session_state.applied_job = job.id
+
+    if job.status != DONE:
+        return
+
+    # Ergebnisse zum DataFrame hinzufügen
+    df = context['frame'].copy()
+    df['BKP_Code'] = [r['code'] for r in job.results]
+    df['BKP_Beschreibung'] = [r['desc'] for r in job.results]
+    df['KI_Konfidenz'] = [r['conf'] for r in job.results]
+
+    st.session_state.classification_results = df
+    st.session_state.column_mapping = context['column_mapping']  # für Korrekturen (BKP Bearbeiten)
+    st.session_state.celebrate = True
+
+    usage = st.session_state.usage_stats
+    if usage:
+        add_log(f"Tokens: Input {usage['input_tokens']:,}, Output {usage['output_tokens']:,}, "
+               f"Cache-Read {usage['cache_read_tokens']:,}, "
+               f"Cache-Write {usage['cache_write_tokens']:,}", "info")
+    add_log(f"Durchschnittliche Konfidenz: {df['KI_Konfidenz'].mean():.1%}", "success")
+    add_log(f"📊 {len(st.session_state.api_responses)} API-Responses aufgezeichnet", "success")
+    add_log(f"📝 Detailliertes Log gespeichert: {context['log_filename']}", "success")
+
+
+def job_monitor():
+    """
+    Status, Fortschritt, neueste Ergebnisse und Kosten der Jobs dieser Session.
+    Läuft als Fragment mit run_every, solange ein Job läuft; der aktive Job wird
+    nach Abschluss automatisch übernommen.
+    """
+    runner = get_job_runner()
+    jobs = [job for job in map(runner.get, st.session_state.job_ids) if job is not None]
+    if not jobs:
+        return
+
+    st.subheader("⏳ Klassifizierungs-Jobs")
+    status_icons = {QUEUED: '🕒', RUNNING: '⚙️', DONE: '✅'}
+
+    for job in reversed(jobs):
+        snapshot = job.snapshot()
+        with st.container(border=True):
+            col1, col2 = st.columns([4, 1])
+
+            with col1:
+                icon = status_icons.get(snapshot['status'], '⚠️')
+                st.markdown(f"{icon} **{snapshot['label']}** – {snapshot['status']}")
+                st.progress(
+                    snapshot['progress'],
+                    text=f"{snapshot['done']}/{snapshot['total']} Elemente ({snapshot['batches']} Batches) | "
+                         f"{snapshot['elements_per_second']:.1f} Elemente/s | "
+                         f"{snapshot['tokens_per_second']:,.0f} Tokens/s | "
+                         f"ETA {format_duration(snapshot['eta'])} | "
+                         f"Kosten bisher ${usage_cost(snapshot['stats']):.4f}"
+                )
+                if snapshot['status'] in (QUEUED, RUNNING) and snapshot['latest']:
+                    st.caption(" | ".join(
+                        f"#{r['request_num']}: {r['code']} ({r['conf']:.0%}) {r['element'][:30]}"
+                        for r in reversed(snapshot['latest'])
+                    ))
+                if snapshot['error']:
+                    st.error(f"Fehler bei der Klassifizierung: {snapshot['error']}")
+
+            with col2:
+                if snapshot['status'] in (QUEUED, RUNNING):
+                    if st.button("⏹️ Abbrechen", key=f"cancel_{job.id}", use_container_width=True):
+                        job.cancel()
+                else:
+                    if st.session_state.applied_job != job.id and st.button(
+                        "📥 Übernehmen", key=f"apply_{job.id}", use_container_width=True
+                    ):
+                        apply_job(job)
+                        st.rerun()
+                    if st.button("🗑️ Entfernen", key=f"remove_{job.id}", use_container_width=True):
+                        runner.remove(job.id)
+                        st.session_state.job_ids.remove(job.id)
+                        if st.query_params.get('job') == job.id:
+                            del st.query_params['job']
+                        st.rerun()
+
+    # Aktiven Job nach Abschluss übernehmen (ganze Seite neu aufbauen: Ergebnisse, Tabs)
+    active = runner.get(st.session_state.active_job) if st.session_state.active_job else None
+    if active is not None and active.status in FINISHED and st.session_state.applied_job != active.id:
+        apply_job(active)
+        st.rerun()
+
+
+def display_completion():
+    """Abschluss-Hinweise für den übernommenen Job (Log-Download, nächste Schritte)"""
+    job = get_job_runner().get(st.session_state.applied_job) if st.session_state.applied_job else None
+    if job is None or job.status != DONE or st.session_state.classification_results is None:
+        return
+
+    st.success("✓ Klassifizierung erfolgreich abgeschlossen!")
+
+    # Download-Button für Log-Datei
+    log_path = job.context['log_path']
+    if os.path.exists(log_path):
+        with open(log_path, 'r', encoding='utf-8') as f:
+            log_content = f.read()
+        st.download_button(
+            label="📥 API-Response-Log herunterladen",
+            data=log_content,
+            file_name=job.context['log_filename'],
+            mime="text/plain",
+            help="Enthält alle API-Requests und Responses für Debugging"
+        )
+
+    if st.session_state.celebrate:
+        st.balloons()
+        st.session_state.celebrate = False
+
+    # Automatischer Workflow-Hinweis
+    st.info("""
+    ### 🎉 Ihre Daten wurden klassifiziert!
+
+    **Nächste Schritte:**
+    1. **Ergebnisse prüfen** → Wechseln Sie zum Tab "Ergebnisse"
+    2. **KI Responses ansehen** → Tab "KI Responses" für Details
+    3. **Zur Auswertung** → Ihre Daten sind automatisch für die eBKP-H Auswertung verfügbar!
+
+    → Gehen Sie zur Seite **"eBKP Auswertung"** in der Seitenleiste links.
+    """)
+
+    # Direct Action Buttons
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("📊 Zu den Ergebnissen", type="primary", use_container_width=True):
+            st.session_state.active_tab = 1  # Tab "Ergebnisse"
+            st.rerun()
+
+    with col2:
+        # Verwende Link statt HTML-Button für bessere Dark Mode Kompatibilität
+        st.page_link("pages/1_eBKP_Auswertung.py", label="🔍 Zur eBKP-H Auswertung", icon="📊")
+
+
 # Haupttitel
 st.title("🤖 KI-Klassifizierung")
 st.markdown("Automatische BKP-Zuordnung mit Claude AI")
@@ -157,6 +332,12 @@ if not current_api_key:
 
 st.markdown("---")
 
+# Job aus der URL wiederfinden (Seite neu geladen, neue Session)
+job_param = st.query_params.get('job')
+if job_param and job_param not in st.session_state.job_ids and get_job_runner().get(job_param):
+    st.session_state.job_ids.append(job_param)
+    st.session_state.active_job = job_param
+
 # Sidebar für Einstellungen
 with st.sidebar:
     st.header("⚙️ Einstellungen")
@@ -169,15 +350,39 @@ with st.sidebar:
     )
 
     batch_size = 40
+    max_concurrency = 1
+    adaptive_batching = False
+    use_streaming = False
     if use_batch:
+        adaptive_batching = st.toggle(
+            "Adaptive Batch-Größe",
+            value=True,
+            help="Batch-Größe und max_tokens werden aus dem gemessenen Token-Verbrauch bestimmt"
+        )
+
         batch_size = st.slider(
             "Batch-Größe",
             min_value=20,
             max_value=50,
             value=40,
+            disabled=adaptive_batching,
             help="Anzahl Elemente pro API-Anfrage (30-50 empfohlen für eBKP-H)"
         )
 
+        max_concurrency = st.slider(
+            "Parallele Anfragen",
+            min_value=1,
+            max_value=8,
+            value=4,
+            help="Maximale Anzahl gleichzeitig laufender API-Anfragen"
+        )
+
+        use_streaming = st.toggle(
+            "Streaming",
+            value=True,
+            help="Ergebnisse erscheinen pro Element, sobald Claude sie geschrieben hat (nicht erst pro Batch)"
+        )
+
     # Debug-Modus
     debug_mode = st.toggle(
         "Debug-Modus",
@@ -218,6 +423,14 @@ with st.sidebar:
 tab1, tab2, tab3, tab4 = st.tabs(["📤 Upload & Klassifizierung", "📊 Ergebnisse", "🔍 KI Responses", "📝 Monitoring"])
 
 with tab1:
+    # Laufende und beendete Jobs (aktualisiert sich selbst, solange ein Job läuft)
+    jobs_running = any(
+        job is not None and job.status not in FINISHED
+        for job in map(get_job_runner().get, st.session_state.job_ids)
+    )
+    st.fragment(run_every=JOB_POLL_SECONDS if jobs_running else None)(job_monitor)()
+    display_completion()
+
     st.subheader("CSV-Datei hochladen")
 
     uploaded_file = st.file_uploader(
@@ -315,253 +528,55 @@ with tab1:
                 st.markdown("---")
 
                 if st.button("🚀 Klassifizierung starten", type="primary", use_container_width=True):
-                    # Log und API responses zurücksetzen
-                    st.session_state.processing_log = []
-                    st.session_state.api_responses = []  # Reset API responses
-                    st.session_state.total_cost = cost_estimate['total_cost']
-
-                    add_log("Klassifizierung gestartet", "info")
-                    add_log(f"Modus: {'Batch' if use_batch else 'Einzeln'}", "info")
-                    add_log(f"{num_elements} Elemente zu klassifizieren", "info")
-
-                    # Progress Bar und Live-Response-Container
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-
-                    # Live API Response Display Container
-                    with st.expander("🔍 API Responses (Live)", expanded=True):
-                        live_response_container = st.empty()
-
                     try:
-                        # Classifier initialisieren mit API-Key aus Session State
-                        add_log("eBKP-H Classifier initialisieren...", "info")
-
-                        # API-Key holen
+                        # Geteilten Classifier holen (neu nur bei anderem Key/Modell/Katalog)
                         api_key = get_api_key()
-
-                        # Classifier mit API-Key initialisieren
-                        classifier = eBKPHClassifier(api_key=api_key)
+                        classifier = get_classifier(api_key, MODEL, load_catalog().fingerprint).session()
 
                         # Log-Datei für API-Responses erstellen
-                        from datetime import datetime
                         log_filename = f"ebkp_classification_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
                         log_path = os.path.join(os.path.dirname(__file__), '..', '..', 'Logs', log_filename)
                         os.makedirs(os.path.dirname(log_path), exist_ok=True)
 
-                        add_log(f"API-Response-Log wird gespeichert: {log_filename}", "info")
-
-                        results = []
+                        # Elemente vorbereiten (vektorisiert)
+                        column_mapping = {
+                            'kategorie': category_column,
+                            'typ': type_column,
+                            'familie': family_column,
+                            'zusatzinfo': info_column
+                        }
+                        elements = extract_elements(df, column_mapping)
 
+                        options = {'debug': debug_mode, 'log_file': log_path}
                         if use_batch:
-                            # Batch-Verarbeitung
-                            add_log(f"Batch-Verarbeitung mit Größe {batch_size}", "info")
-
-                            total_batches = (num_elements + batch_size - 1) // batch_size
-
-                            for batch_idx in range(0, num_elements, batch_size):
-                                batch_end = min(batch_idx + batch_size, num_elements)
-                                batch_df = df.iloc[batch_idx:batch_end]
-
-                                current_batch = (batch_idx // batch_size) + 1
-                                status_text.text(f"Verarbeite Batch {current_batch}/{total_batches}...")
-
-                                # Elemente für Batch vorbereiten
-                                batch_elements = []
-                                for _, row in batch_df.iterrows():
-                                    elem = {
-                                        'kategorie': row[category_column] if category_column else '',
-                                        'typ': row[type_column] if type_column else '',
-                                        'familie': row[family_column] if family_column else '',
-                                        'zusatzinfo': row[info_column] if info_column else ''
-                                    }
-                                    batch_elements.append(elem)
-
-                                # Batch klassifizieren (mit Debug-Modus und Logging)
-                                batch_results = classifier.classify_batch(
-                                    batch_elements,
-                                    debug=debug_mode,
-                                    log_file=log_path
-                                )
-
-                                # Formatiere Ergebnisse für Kompatibilität mit bestehendem Code
-                                batch_results = [
-                                    {
-                                        'bkp_code': r['code'],
-                                        'bkp_description': r['desc'],
-                                        'confidence': r['conf'],
-                                        'raw_response': f'{{"code": "{r["code"]}", "desc": "{r["desc"]}", "conf": {r["conf"]}}}'
-                                    }
-                                    for r in batch_results
-                                ]
-
-                                # Speichere API-Responses für jedes Element im Batch
-                                for elem_idx, (elem, result) in enumerate(zip(batch_elements, batch_results)):
-                                    element_info = elem.get('typ', 'N/A')
-                                    if elem.get('kategorie'):
-                                        element_info += f" ({elem['kategorie']})"
-
-                                    # Speichere Response
-                                    add_api_response(
-                                        request_num=batch_idx + elem_idx + 1,
-                                        element_info=element_info,
-                                        response=result.get('raw_response', 'N/A'),
-                                        parsed_result={
-                                            'bkp_code': result['bkp_code'],
-                                            'bkp_description': result['bkp_description'],
-                                            'confidence': result['confidence']
-                                        }
-                                    )
-
-                                results.extend(batch_results)
-
-                                # Progress aktualisieren
-                                progress = (batch_end / num_elements)
-                                progress_bar.progress(progress)
-
-                                # Live-Update: Zeige neueste Responses
-                                if st.session_state.api_responses:
-                                    latest_responses = st.session_state.api_responses[-5:]  # Zeige letzte 5
-                                    live_response_container.markdown(
-                                        f"**Letzte {len(latest_responses)} Responses:**\n\n" +
-                                        "\n".join([
-                                            f"- Request #{r['request_num']}: {r['parsed_result']['bkp_code']} "
-                                            f"({r['parsed_result']['confidence']:.0%}) - {r['element'][:30]}..."
-                                            for r in latest_responses
-                                        ])
-                                    )
-
-                                add_log(f"Batch {current_batch}/{total_batches} abgeschlossen "
-                                       f"({len(batch_results)} Elemente)", "success")
-
-                                # Kurze Pause zwischen Batches
-                                time.sleep(0.5)
-
-                        else:
-                            # Einzelverarbeitung
-                            add_log("Einzelverarbeitung gestartet", "info")
-
-                            for idx, row in df.iterrows():
-                                status_text.text(f"Verarbeite Element {idx + 1}/{num_elements}...")
-
-                                # Klassifiziere Element
-                                result = classifier.classify_element(
-                                    kategorie=row[category_column] if category_column else '',
-                                    typ=row[type_column] if type_column else '',
-                                    familie=row[family_column] if family_column else '',
-                                    zusatzinfo=row[info_column] if info_column else '',
-                                    debug=debug_mode
-                                )
-
-                                # Speichere API-Response
-                                element_info = row[type_column] if type_column else 'N/A'
-                                if category_column and row[category_column]:
-                                    element_info += f" ({row[category_column]})"
-
-                                # Formatiere für Kompatibilität
-                                formatted_result = {
-                                    'bkp_code': result['code'],
-                                    'bkp_description': result['desc'],
-                                    'confidence': result['conf'],
-                                    'raw_response': f'{{"code": "{result["code"]}", "desc": "{result["desc"]}", "conf": {result["conf"]}}}'
-                                }
-
-                                add_api_response(
-                                    request_num=idx + 1,
-                                    element_info=element_info,
-                                    response=formatted_result['raw_response'],
-                                    parsed_result={
-                                        'bkp_code': formatted_result['bkp_code'],
-                                        'bkp_description': formatted_result['bkp_description'],
-                                        'confidence': formatted_result['confidence']
-                                    }
-                                )
-
-                                results.append(formatted_result)
-
-                                # Progress aktualisieren
-                                progress = ((idx + 1) / num_elements)
-                                progress_bar.progress(progress)
-
-                                # Live-Update: Zeige neueste Responses
-                                if (idx + 1) % 5 == 0 or idx == num_elements - 1:  # Update alle 5 Elemente
-                                    latest_responses = st.session_state.api_responses[-5:]
-                                    live_response_container.markdown(
-                                        f"**Letzte {len(latest_responses)} Responses:**\n\n" +
-                                        "\n".join([
-                                            f"- Request #{r['request_num']}: {r['parsed_result']['bkp_code']} "
-                                            f"({r['parsed_result']['confidence']:.0%}) - {r['element'][:30]}..."
-                                            for r in latest_responses
-                                        ])
-                                    )
-
-                                if (idx + 1) % 10 == 0:
-                                    add_log(f"{idx + 1}/{num_elements} Elemente klassifiziert", "info")
-
-                        # Ergebnisse zum DataFrame hinzufügen
-                        df['BKP_Code'] = [r['bkp_code'] for r in results]
-                        df['BKP_Beschreibung'] = [r['bkp_description'] for r in results]
-                        df['KI_Konfidenz'] = [r['confidence'] for r in results]
-
-                        # In Session State speichern
-                        st.session_state.classification_results = df
-
-                        progress_bar.progress(1.0)
-                        status_text.text("Klassifizierung abgeschlossen!")
-
-                        add_log(f"✓ Klassifizierung erfolgreich abgeschlossen", "success")
-                        add_log(f"Durchschnittliche Konfidenz: {df['KI_Konfidenz'].mean():.1%}", "success")
-                        add_log(f"📊 {len(st.session_state.api_responses)} API-Responses aufgezeichnet", "success")
-                        add_log(f"📝 Detailliertes Log gespeichert: {log_filename}", "success")
-
-                        # Live-Container Final Update
-                        live_response_container.success(
-                            f"✅ Klassifizierung abgeschlossen! {len(st.session_state.api_responses)} API-Responses aufgezeichnet.\n\n"
-                            f"➡️ Wechseln Sie zum Tab **'KI Responses'** für Details."
-                        )
-
-                        # Success Message mit nächsten Schritten
-                        st.success("✓ Klassifizierung erfolgreich abgeschlossen!")
-
-                        # Download-Button für Log-Datei
-                        if os.path.exists(log_path):
-                            with open(log_path, 'r', encoding='utf-8') as f:
-                                log_content = f.read()
-                            st.download_button(
-                                label="📥 API-Response-Log herunterladen",
-                                data=log_content,
-                                file_name=log_filename,
-                                mime="text/plain",
-                                help="Enthält alle API-Requests und Responses für Debugging"
+                            options.update(
+                                batch_size=None if adaptive_batching else batch_size,
+                                max_concurrency=max_concurrency,
+                                stream=use_streaming
                             )
 
-                        st.balloons()
-
-                        # Automatischer Workflow-Hinweis
-                        st.info("""
-                        ### 🎉 Ihre Daten wurden klassifiziert!
-
-                        **Nächste Schritte:**
-                        1. **Ergebnisse prüfen** → Wechseln Sie zum Tab "Ergebnisse"
-                        2. **KI Responses ansehen** → Tab "KI Responses" für Details
-                        3. **Zur Auswertung** → Ihre Daten sind automatisch für die eBKP-H Auswertung verfügbar!
-
-                        → Gehen Sie zur Seite **"eBKP Auswertung"** in der Seitenleiste links.
-                        """)
-
-                        # Direct Action Buttons
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            if st.button("📊 Zu den Ergebnissen", type="primary", use_container_width=True):
-                                st.session_state.active_tab = 1  # Tab "Ergebnisse"
-                                st.rerun()
-
-                        with col2:
-                            # Verwende Link statt HTML-Button für bessere Dark Mode Kompatibilität
-                            st.page_link("pages/1_eBKP_Auswertung.py", label="🔍 Zur eBKP-H Auswertung", icon="📊")
+                        # Im Hintergrund starten: Reruns (Widgets, Tabs, Reconnect) brechen den Lauf nicht ab
+                        job = get_job_runner().submit(
+                            classifier,
+                            elements,
+                            label=uploaded_file.name,
+                            context={
+                                'frame': df.copy(),
+                                'column_mapping': column_mapping,
+                                'log_filename': log_filename,
+                                'log_path': log_path,
+                                'estimated_cost': cost_estimate['total_cost']
+                            },
+                            batch=use_batch,
+                            **options
+                        )
+                        st.session_state.job_ids.append(job.id)
+                        st.session_state.active_job = job.id
+                        st.query_params['job'] = job.id  # Job nach Neuladen der Seite wiederfinden
+                        st.rerun()
 
                     except Exception as e:
-                        add_log(f"Fehler: {str(e)}", "error")
-                        st.error(f"Fehler bei der Klassifizierung: {str(e)}")
+                        st.error(f"Fehler beim Starten der Klassifizierung: {str(e)}")
 
             else:
                 st.warning("⚠️ Bitte wählen Sie mindestens die 'Element-Typ' Spalte aus")
@@ -723,37 +738,54 @@ with tab2:
         st.info("Noch keine Klassifizierung durchgeführt. Wechseln Sie zum Tab 'Upload & Klassifizierung'.")
 
 with tab3:
-    st.subheader("🔍 KI API Responses (Echtzeit)")
+    st.subheader("🔍 KI API Responses")
+
+    responses = st.session_state.api_responses
 
-    if st.session_state.api_responses:
-        st.info(f"💬 {len(st.session_state.api_responses)} API-Anfragen aufgezeichnet")
+    if len(responses):
+        info = f"💬 {len(responses):,} Ergebnisse aufgezeichnet"
+        if responses.spilled:
+            info += f" ({responses.spilled:,} ältere auf Disk ausgelagert)"
+        st.info(info)
 
         # Anzeige-Optionen
-        col1, col2 = st.columns([3, 1])
+        col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+
+        view_labels = {
+            'all': "Alle",
+            'errors': "Nur Fehler",
+            'low': f"Konfidenz < {responses.low_confidence:.0%}"
+        }
 
         with col1:
-            show_mode = st.radio(
-                "Ansicht",
-                ["Neueste zuerst", "Älteste zuerst", "Nur Fehler"],
+            view = st.radio(
+                "Filter",
+                list(view_labels),
+                format_func=lambda v: f"{view_labels[v]} ({responses.count(v):,})",
                 horizontal=True
             )
 
         with col2:
-            if st.button("🗑️ Responses löschen", use_container_width=True):
-                st.session_state.api_responses = []
-                st.rerun()
+            newest_first = st.toggle("Neueste zuerst", value=True)
 
-        st.markdown("---")
+        with col3:
+            page_size = st.selectbox("Pro Seite", [25, 50, 100], index=0)
+
+        num_pages = max(1, (responses.count(view) + page_size - 1) // page_size)
 
-        # Responses anzeigen
-        responses = st.session_state.api_responses.copy()
+        with col4:
+            page = st.number_input("Seite", min_value=1, max_value=num_pages, value=1, step=1)
+
+        st.caption(f"Seite {page} von {num_pages:,}")
 
-        if show_mode == "Neueste zuerst":
-            responses = reversed(responses)
-        elif show_mode == "Nur Fehler":
-            responses = [r for r in responses if r['parsed_result'].get('bkp_code') in ['ERROR', 'PARSE_ERROR', 'UNKNOWN']]
+        if st.button("🗑️ Responses löschen"):
+            st.session_state.api_responses = ResponseLog()
+            st.rerun()
+
+        st.markdown("---")
 
-        for idx, response in enumerate(responses):
+        # Nur die aktuelle Seite lesen und rendern (unabhängig von der Laufgrösse)
+        for idx, response in enumerate(responses.rows(view, (page - 1) * page_size, page_size, newest_first)):
             with st.expander(
                 f"Request #{response['request_num']} | {response['timestamp']} | Element: {response['element'][:50]}...",
                 expanded=(idx < 3)  # Erste 3 aufgeklappt
@@ -768,20 +800,22 @@ with tab3:
 
                 with col2:
                     st.markdown("**📥 Parsed Result:**")
-                    result = response['parsed_result']
 
                     # Farbe je nach Ergebnis
-                    if result.get('bkp_code') == 'ERROR':
-                        st.error(f"❌ Error: {result.get('bkp_description', 'Unknown error')}")
-                    elif result.get('confidence', 0) < 0.7:
-                        st.warning(f"⚠️ BKP: {result.get('bkp_code')} (Konfidenz: {result.get('confidence', 0):.1%})")
+                    if response['code'] == 'ERROR':
+                        st.error(f"❌ Error: {response['desc'] or 'Unknown error'}")
+                    elif response['conf'] < 0.7:
+                        st.warning(f"⚠️ BKP: {response['code']} (Konfidenz: {response['conf']:.1%})")
                     else:
-                        st.success(f"✓ BKP: {result.get('bkp_code')} (Konfidenz: {result.get('confidence', 0):.1%})")
+                        st.success(f"✓ BKP: {response['code']} (Konfidenz: {response['conf']:.1%})")
 
-                    st.text(f"Beschreibung: {result.get('bkp_description', 'N/A')}")
+                    st.text(f"Beschreibung: {response['desc'] or 'N/A'}")
 
                 st.markdown("**🔍 Raw API Response:**")
-                st.code(response['raw_response'], language="json")
+                st.code(
+                    f'{{"code": "{response["code"]}", "desc": "{response["desc"]}", "conf": {response["conf"]}}}',
+                    language="json"
+                )
 
     else:
         st.info("Noch keine API-Responses aufgezeichnet. Starten Sie eine Klassifizierung im Tab 'Upload & Klassifizierung'.")
@@ -789,12 +823,12 @@ with tab3:
         st.markdown("""
         ### 💡 Was wird hier angezeigt?
 
-        Dieser Tab zeigt alle API-Anfragen und -Antworten in Echtzeit:
+        Dieser Tab zeigt die Ergebnisse der KI-Klassifizierung pro Element, seitenweise:
         - **Request Info**: Zeitstempel und Element-Details
         - **Parsed Result**: Interpretiertes Ergebnis mit BKP-Code und Konfidenz
-        - **Raw Response**: Unverarbeitete API-Antwort von Claude
+        - **Filter**: Alle, nur Fehler oder niedrige Konfidenz
 
-        So können Sie die KI-Klassifizierung live nachvollziehen!
+        So können Sie die KI-Klassifizierung nachvollziehen!
         """)
 
 with tab4:
@@ -821,6 +855,38 @@ with tab4:
             with col3:
                 st.metric("Währung", "USD")
 
+        # Gemessener Token-Verbrauch inkl. Prompt Caching
+        usage = st.session_state.usage_stats
+        if usage:
+            st.markdown("---")
+            st.subheader("🧮 Token-Verbrauch (gemessen)")
+            col1, col2, col3, col4, col5 = st.columns(5)
+
+            with col1:
+                st.metric("Input Tokens", f"{usage['input_tokens']:,}")
+
+            with col2:
+                st.metric("Output Tokens", f"{usage['output_tokens']:,}")
+
+            with col3:
+                st.metric("Cache-Read Tokens", f"{usage['cache_read_tokens']:,}")
+
+            with col4:
+                st.metric("Cache-Write Tokens", f"{usage['cache_write_tokens']:,}")
+
+            with col5:
+                st.metric("Tatsächliche Kosten", f"${usage_cost(usage):.4f}")
+
+            prompt_tokens = usage['input_tokens'] + usage['cache_read_tokens'] + usage['cache_write_tokens']
+            if prompt_tokens:
+                st.caption(f"Prompt-Cache-Anteil: {usage['cache_read_tokens'] / prompt_tokens:.1%} der Input-Tokens "
+                          f"aus dem Cache gelesen | {usage['api_calls']} API-Calls")
+
+            truncation_rate = usage['truncated_batches'] / max(usage['api_calls'], 1)
+            st.caption(f"Durchsatz: {usage.get('elements_per_second', 0):.1f} Elemente/s | "
+                      f"Ø {usage['output_tokens_per_element']:.1f} Output-Tokens/Element | "
+                      f"Truncation-Rate: {truncation_rate:.1%}")
+
         # Log Export
         st.markdown("---")
         if st.button("🗑️ Log löschen", type="secondary"):
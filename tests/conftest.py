@@ -0,0 +1,10 @@
+"""
+Gemeinsame Test-Einstellungen: Repo-Verzeichnis auf den Importpfad (Helpers.*)
+"""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
@@ -0,0 +1,196 @@
+"""
+Fake Anthropic Client für Tests (ohne Netzwerk)
+
+Beantwortet Batch-Prompts deterministisch: jedes Element erhält den Code aus
+seinem 'Typ' (Tests verwenden gültige Katalog-Codes als Typ). Unterstützt
+messages.with_raw_response.create, messages.stream und messages.batches,
+künstliche Latenz, gescriptete Fehler und zählt gleichzeitige Requests.
+"""
+
+import re
+import json
+import time
+import threading
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from anthropic import APIStatusError
+
+_ELEMENT_LINE = re.compile(r'^(\d+)\. (.*)$', re.MULTILINE)
+_TYP = re.compile(r'Typ: ([^,]+)')
+
+
+class FakeAPIError(APIStatusError):
+    """anthropic.APIStatusError mit status_code und Response-Headern, ohne HTTP-Response"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str] = None):
+        Exception.__init__(self, f"HTTP {status_code}")
+        self.message = f"HTTP {status_code}"
+        self.body = None
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def answer(prompt: str, conf: float = 0.9) -> str:
+    """JSON-Antwort für einen Batch-Prompt: Code = Typ des Elements"""
+    objects = []
+    for number, line in _ELEMENT_LINE.findall(prompt):
+        typ = _TYP.search(line)
+        objects.append({'id': int(number), 'code': typ.group(1).strip() if typ else 'X', 'desc': '', 'conf': conf})
+    return json.dumps(objects)
+
+
+def message(text: str) -> SimpleNamespace:
+    """Message-Objekt wie von messages.create"""
+    return SimpleNamespace(
+        content=[SimpleNamespace(text=text)],
+        usage=SimpleNamespace(input_tokens=100, output_tokens=20,
+                              cache_read_input_tokens=0, cache_creation_input_tokens=0),
+        stop_reason='end_turn'
+    )
+
+
+class _Stream:
+    """Kontext-Manager wie messages.stream(...)"""
+
+    def __init__(self, text: str, chunk: int = 7):
+        self.response = SimpleNamespace(headers={})
+        self._text = text
+        self._chunk = chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        for start in range(0, len(self._text), self._chunk):
+            yield self._text[start:start + self._chunk]
+
+    def get_final_message(self):
+        return message(self._text)
+
+
+class _Batches:
+    """messages.batches: create → retrieve (gescriptete Status) → results"""
+
+    def __init__(self, statuses: List[str], outcomes: Dict[str, str]):
+        self.statuses = list(statuses)
+        self.outcomes = outcomes  # custom_id → 'errored' / 'expired' / 'canceled'
+        self.jobs: Dict[str, List[Dict]] = {}
+        self.created = 0
+        self.retrieved = 0
+
+    def create(self, requests: List[Dict]):
+        self.created += 1
+        batch_id = f"msgbatch_{self.created:03d}"
+        self.jobs[batch_id] = requests
+        return SimpleNamespace(id=batch_id)
+
+    def retrieve(self, batch_id: str):
+        self.retrieved += 1
+        if batch_id not in self.jobs:
+            raise FakeAPIError(404)
+        status = self.statuses.pop(0) if self.statuses else 'ended'
+        if isinstance(status, BaseException):
+            raise status
+        return SimpleNamespace(
+            id=batch_id, processing_status=status,
+            request_counts=SimpleNamespace(succeeded=0, processing=len(self.jobs[batch_id]))
+        )
+
+    def results(self, batch_id: str):
+        for request in self.jobs[batch_id]:
+            outcome = self.outcomes.get(request['custom_id'])
+            if outcome:
+                result = SimpleNamespace(type=outcome)
+            else:
+                prompt = request['params']['messages'][0]['content']
+                result = SimpleNamespace(type='succeeded', message=message(answer(prompt)))
+            yield SimpleNamespace(custom_id=request['custom_id'], result=result)
+
+
+class _Messages:
+    def __init__(self, client: 'FakeClient'):
+        self._client = client
+        self.with_raw_response = self
+        self.batches = client.batches
+
+    def create(self, **params):
+        return self._client._respond(params, lambda text: message(text))
+
+    def stream(self, **params):
+        return self._client._respond(params, lambda text: _Stream(text))
+
+
+class FakeClient:
+    """
+    Usage:
+        client = FakeClient(latency=0.05, errors=[FakeAPIError(429, {'retry-after': '1'})])
+        classifier = make_classifier(client)
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        errors: List[Optional[BaseException]] = None,
+        batch_statuses: List = None,
+        batch_outcomes: Dict[str, str] = None,
+        respond: Callable[[str], str] = answer
+    ):
+        """
+        Args:
+            latency: Sekunden pro Request
+            errors: Fehler für die ersten Requests der Reihe nach (None = Erfolg)
+            batch_statuses: processing_status pro batches.retrieve (Exception = wird geworfen)
+            batch_outcomes: custom_id → Ergebnis-Typ für nicht erfolgreiche Batch-Requests
+            respond: Prompt → Antworttext (default: answer; z.B. für abgeschnittene Antworten)
+        """
+        self.latency = latency
+        self.respond = respond
+        self.errors = list(errors or [])
+        self.batches = _Batches(batch_statuses or ['ended'], batch_outcomes or {})
+        self.messages = _Messages(self)
+        self.prompts: List[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def with_options(self, **options):
+        return self
+
+    def _respond(self, params: Dict, build):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            error = self.errors.pop(0) if self.errors else None
+            prompt = params['messages'][0]['content']
+            self.prompts.append(prompt)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if error is not None:
+                raise error
+            return build(self.respond(prompt))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def make_classifier(client: FakeClient, **options):
+    """Classifier mit Fake-Client, ohne persistenten Cache und Korrekturen (sofern nicht übergeben)"""
+    from Helpers.eBKP_H_Classifier import eBKPHClassifier
+
+    options.setdefault('use_cache', False)
+    options.setdefault('use_corrections', False)
+    return eBKPHClassifier(api_key='test', client=client, **options)
+
+
+def elements_for(codes: List[str]) -> List[Dict]:
+    """Eindeutige Elemente, deren Typ der erwartete Code ist"""
+    return [
+        {'kategorie': 'Waende', 'typ': code, 'familie': 'Basic Wall', 'zusatzinfo': f"Nr {i}"}
+        for i, code in enumerate(codes)
+    ]
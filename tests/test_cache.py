@@ -0,0 +1,68 @@
+"""
+Klassifizierungs-Cache: Treffer und Misses, Kontext-Hash (Modell, Prompt) und
+ein zweiter identischer Lauf ohne API-Calls.
+"""
+
+from Helpers.ebkp_cache import ClassificationCache, context_hash
+from Helpers.ebkp_catalog import load_catalog
+from fake_anthropic import FakeClient, make_classifier, elements_for
+
+
+def _codes(n: int):
+    return load_catalog().level_codes(2)[:n]
+
+
+def _classifier(client, tmp_path, **options):
+    return make_classifier(client, use_cache=True, cache_path=str(tmp_path / 'cache.sqlite'), **options)
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ClassificationCache(str(tmp_path / 'cache.sqlite'), context='ctx')
+    cache.put_many({
+        'waende|a|b|': {'code': 'C02', 'desc': 'Wand', 'conf': 0.9},
+        'waende|x|y|': {'code': 'ERROR', 'desc': 'HTTP 500', 'conf': 0.0},  # wird nicht gecacht
+    })
+
+    assert cache.get_many(['waende|a|b|', 'waende|x|y|', 'waende|c|d|']) == {
+        'waende|a|b|': {'code': 'C02', 'desc': 'Wand', 'conf': 0.9}
+    }
+    assert cache.get('waende|c|d|') is None
+    assert len(cache) == 1
+
+    # Anderer Kontext: gleiche Datei, keine Treffer
+    other = ClassificationCache(str(tmp_path / 'cache.sqlite'), context='anderer')
+    assert other.get_many(['waende|a|b|']) == {}
+    assert len(list(other.items(all_contexts=True))) == 1
+
+
+def test_context_hash_changes_with_model_and_prompt(tmp_path):
+    client = FakeClient()
+    base = _classifier(client, tmp_path).cache.context
+
+    assert _classifier(client, tmp_path).cache.context == base
+    assert _classifier(client, tmp_path, model='anderes-modell').cache.context != base
+    assert _classifier(client, tmp_path, hierarchical=True).cache.context != base
+    assert context_hash('katalog', 'prompt', 'modell') != context_hash('katalog', 'prompt 2', 'modell')
+
+
+def test_second_identical_run_makes_no_api_calls(tmp_path):
+    codes = _codes(6)
+    elements = elements_for(codes)
+
+    first = FakeClient()
+    first_run = _classifier(first, tmp_path)
+    first_results = first_run.classify_elements(elements, batch_size=2)
+    assert len(first.prompts) == 3
+    assert first_run.stats['cache_misses'] == 6
+
+    second = FakeClient()
+    second_run = _classifier(second, tmp_path)
+    assert second_run.classify_elements(elements, batch_size=2) == first_results
+    assert second.prompts == []
+    assert second_run.stats['api_calls'] == 0
+    assert second_run.stats['cache_hits'] == 6
+
+    # Anderes Modell: eigener Kontext, alles wieder Misses
+    third = FakeClient()
+    _classifier(third, tmp_path, model='anderes-modell').classify_elements(elements, batch_size=2)
+    assert len(third.prompts) == 3
@@ -0,0 +1,89 @@
+"""
+classify_bulk gegen einen Fake-Client mit messages.batches:
+create → retrieve → results, Fortsetzen über die Job-Datei nach einem Abbruch,
+sowie errored/expired Requests.
+"""
+
+import json
+
+import pytest
+
+from Helpers.ebkp_catalog import load_catalog
+from fake_anthropic import FakeClient, make_classifier, elements_for
+
+
+def _codes(n: int):
+    level_2 = load_catalog().level_codes(2)
+    return [level_2[(i * 5) % len(level_2)] for i in range(n)]
+
+
+def test_create_poll_and_merge_results(tmp_path):
+    codes = _codes(6)
+    job_file = tmp_path / 'run.bulkjob.json'
+    client = FakeClient(batch_statuses=['in_progress', 'in_progress', 'ended'])
+    classifier = make_classifier(client)
+
+    results = classifier.classify_bulk(elements_for(codes), str(job_file), batch_size=2, poll_interval=0)
+
+    assert [r['code'] for r in results] == codes
+    assert client.batches.created == 1
+    assert client.batches.retrieved == 3
+    assert len(client.batches.jobs['msgbatch_001']) == 3
+
+    job = json.loads(job_file.read_text(encoding='utf-8'))
+    assert job['batch_id'] == 'msgbatch_001'
+    assert job['status'] == 'merged'
+    assert job['mapping'] == {'batch-00000': [0, 1], 'batch-00001': [2, 3], 'batch-00002': [4, 5]}
+    assert classifier.stats['api_calls'] == 1
+
+
+def test_resume_from_job_file_after_interruption(tmp_path):
+    codes = _codes(6)
+    elements = elements_for(codes)
+    job_file = tmp_path / 'run.bulkjob.json'
+    client = FakeClient(batch_statuses=['in_progress', KeyboardInterrupt()])
+
+    with pytest.raises(KeyboardInterrupt):
+        make_classifier(client).classify_bulk(elements, str(job_file), batch_size=2, poll_interval=0)
+
+    job = json.loads(job_file.read_text(encoding='utf-8'))
+    assert job['batch_id'] == 'msgbatch_001' and 'status' not in job
+
+    # Neuer Lauf (neuer Prozess): pollt den bestehenden Job weiter statt neu zu erstellen
+    client.batches.statuses = ['in_progress', 'ended']
+    classifier = make_classifier(client)
+    results = classifier.classify_bulk(elements, str(job_file), batch_size=2, poll_interval=0)
+
+    assert [r['code'] for r in results] == codes
+    assert client.batches.created == 1
+    assert classifier.stats.get('api_calls', 0) == 0
+    assert json.loads(job_file.read_text(encoding='utf-8'))['status'] == 'merged'
+
+
+def test_job_file_for_other_input_creates_new_job(tmp_path):
+    job_file = tmp_path / 'run.bulkjob.json'
+    client = FakeClient()
+
+    make_classifier(client).classify_bulk(elements_for(_codes(4)), str(job_file), batch_size=2, poll_interval=0)
+    results = make_classifier(client).classify_bulk(
+        elements_for(_codes(6)[2:]), str(job_file), batch_size=2, poll_interval=0
+    )
+
+    assert client.batches.created == 2
+    assert json.loads(job_file.read_text(encoding='utf-8'))['batch_id'] == 'msgbatch_002'
+    assert [r['code'] for r in results] == _codes(6)[2:]
+
+
+def test_errored_and_expired_requests_become_error_rows(tmp_path):
+    codes = _codes(6)
+    client = FakeClient(batch_outcomes={'batch-00001': 'errored', 'batch-00002': 'expired'})
+    classifier = make_classifier(client)
+
+    results = classifier.classify_bulk(
+        elements_for(codes), str(tmp_path / 'run.bulkjob.json'), batch_size=2, poll_interval=0
+    )
+
+    assert [r['code'] for r in results[:2]] == codes[:2]
+    assert [r['code'] for r in results[2:]] == ['ERROR'] * 4
+    assert [r['desc'] for r in results[2:]] == ['Batch errored'] * 2 + ['Batch expired'] * 2
+    assert all(r['conf'] == 0.0 for r in results[2:])
@@ -0,0 +1,108 @@
+"""
+classify_csv: Chunk-Modus und ganze Datei ergeben dieselben Element-Signaturen
+(gemappte Spalten werden als Text gelesen, nicht pro Chunk typisiert), und der
+Streamlit-Upload mit Typ-Erkennung ergibt dieselben Signaturen.
+Ein abgebrochener Lauf wird aus dem Checkpoint fortgesetzt.
+"""
+
+import pytest
+
+from Helpers.ebkp_catalog import load_catalog
+from Helpers.ebkp_checkpoint import ClassificationCheckpoint
+from fake_anthropic import FakeClient, answer, make_classifier
+
+# Zusatzinfo numerisch; die Lücke in Zeile 4 macht die Spalte beim Lesen
+# der ganzen Datei zu float ('223.0'), im ersten Chunk bliebe sie int ('223')
+ZUSATZINFO = ['223', '224', '225', '', '226', '223']
+
+
+def _write_csv(path):
+    codes = load_catalog().level_codes(2)[:len(ZUSATZINFO)]
+    lines = ['Kategorie;Typ;Familie;Zusatzinfo']
+    lines += [f"Waende;{code};Basic Wall;{info}" for code, info in zip(codes, ZUSATZINFO)]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return codes
+
+
+def _signatures(tmp_path, name, **options):
+    input_csv = tmp_path / 'export.csv'
+    checkpoint_file = tmp_path / f'{name}.checkpoint.jsonl'
+    classifier = make_classifier(FakeClient())
+    classifier.classify_csv(
+        str(input_csv), output_csv=str(tmp_path / f'{name}.csv'), batch_size=2,
+        show_progress=False, checkpoint_file=str(checkpoint_file), **options
+    )
+    return sorted(ClassificationCheckpoint(str(checkpoint_file)).load())
+
+
+def test_chunked_and_full_read_produce_same_signatures(tmp_path):
+    _write_csv(tmp_path / 'export.csv')
+
+    full = _signatures(tmp_path, 'full')
+    chunked = _signatures(tmp_path, 'chunked', chunksize=3)
+
+    assert full == chunked
+    assert [sig.split('|')[-1] for _, sig in full] == ZUSATZINFO
+    assert (tmp_path / 'full.csv').read_text(encoding='utf-8-sig') == \
+        (tmp_path / 'chunked.csv').read_text(encoding='utf-8-sig')
+
+
+def test_upload_read_with_type_inference_gives_same_signatures(tmp_path):
+    # Streamlit-Upload liest ohne dtype: Zusatzinfo wird float ('223.0' ohne Normalisierung)
+    import pandas as pd
+    from Helpers.ebkp_cache import element_signature
+    from Helpers.eBKP_H_Classifier import extract_elements
+
+    _write_csv(tmp_path / 'export.csv')
+    mapping = {'kategorie': 'Kategorie', 'typ': 'Typ', 'familie': 'Familie', 'zusatzinfo': 'Zusatzinfo'}
+
+    inferred = pd.read_csv(tmp_path / 'export.csv', sep=';')
+    as_text = pd.read_csv(tmp_path / 'export.csv', sep=';', dtype=str)
+    assert inferred['Zusatzinfo'].dtype == float
+
+    signatures = [element_signature(e) for e in extract_elements(inferred, mapping)]
+    assert signatures == [element_signature(e) for e in extract_elements(as_text, mapping)]
+    assert [sig.split('|')[-1] for sig in signatures] == ZUSATZINFO
+
+
+def test_extract_elements_keeps_fractional_numbers():
+    import pandas as pd
+    from Helpers.eBKP_H_Classifier import extract_elements
+
+    df = pd.DataFrame({'Typ': [223.0, None, 1.5, -4.0]})
+    assert [e['typ'] for e in extract_elements(df, {'typ': 'Typ'})] == ['223', '', '1.5', '-4']
+
+
+def test_resume_sends_only_remaining_rows(tmp_path):
+    import pandas as pd
+
+    codes = _write_csv(tmp_path / 'export.csv')
+    options = dict(
+        output_csv=str(tmp_path / 'out.csv'), batch_size=2, show_progress=False,
+        checkpoint_file=str(tmp_path / 'out.checkpoint.jsonl')
+    )
+
+    def interrupt_second_request(prompt):
+        if len(first.prompts) > 1:
+            raise KeyboardInterrupt()
+        return answer(prompt)
+
+    first = FakeClient(respond=interrupt_second_request)
+    with pytest.raises(KeyboardInterrupt):
+        make_classifier(first).classify_csv(str(tmp_path / 'export.csv'), **options)
+    assert not (tmp_path / 'out.csv').exists()
+
+    second = FakeClient()
+    classifier = make_classifier(second)
+    classifier.classify_csv(str(tmp_path / 'export.csv'), resume=True, **options)
+
+    # Zeilen 0 und 1 aus dem Checkpoint, nur 2–5 an die API
+    sent = '\n'.join(second.prompts)
+    assert [code in sent for code in codes] == [False, False, True, True, True, True]
+    assert len(second.prompts) == 2
+    assert classifier.stats['resumed_elements'] == 2
+
+    out = pd.read_csv(tmp_path / 'out.csv', sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    assert out['Typ'].tolist() == codes
+    assert out['eBKP_Code'].tolist() == codes
+    assert out['Zusatzinfo'].tolist() == ZUSATZINFO
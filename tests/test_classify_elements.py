@@ -0,0 +1,85 @@
+"""
+classify_elements gegen einen Fake-Endpunkt mit künstlicher Latenz:
+Reihenfolge, Obergrenze der parallelen Requests und Zeitgewinn gegenüber seriell,
+sowie welche Fehler zu ERROR-Zeilen werden und welche propagieren.
+"""
+
+import time
+
+import pytest
+
+from Helpers.ebkp_catalog import load_catalog
+from Helpers.ebkp_jobs import JobCancelled
+from fake_anthropic import FakeAPIError, FakeClient, make_classifier, elements_for
+
+LATENCY = 0.05
+
+
+def _codes(n: int):
+    level_2 = load_catalog().level_codes(2)
+    return [level_2[(i * 7) % len(level_2)] for i in range(n)]
+
+
+def _run(max_concurrency: int, codes):
+    client = FakeClient(latency=LATENCY)
+    classifier = make_classifier(client)
+    start = time.perf_counter()
+    results = classifier.classify_elements(elements_for(codes), batch_size=2, max_concurrency=max_concurrency)
+    return results, client, time.perf_counter() - start
+
+
+def test_results_in_input_order():
+    codes = _codes(24)
+    results, _, _ = _run(4, codes)
+    assert [r['code'] for r in results] == codes
+
+
+def test_in_flight_never_exceeds_max_concurrency():
+    codes = _codes(24)
+    for max_concurrency in (1, 3, 4):
+        _, client, _ = _run(max_concurrency, codes)
+        assert client.max_in_flight <= max_concurrency
+    assert client.max_in_flight > 1
+
+
+def test_parallel_faster_than_serial():
+    codes = _codes(24)
+    serial_results, serial_client, serial_time = _run(1, codes)
+    parallel_results, parallel_client, parallel_time = _run(4, codes)
+
+    assert serial_results == parallel_results
+    assert len(serial_client.prompts) == len(parallel_client.prompts) == 12
+    # 12 Requests à 50 ms: seriell ≥ 0.6 s, mit 4 parallel ~0.15 s
+    assert serial_time >= 12 * LATENCY
+    assert parallel_time < serial_time / 2
+
+
+def test_api_error_becomes_error_rows():
+    codes = _codes(4)
+    client = FakeClient(errors=[FakeAPIError(400)])
+    results = make_classifier(client).classify_elements(elements_for(codes), batch_size=2)
+
+    assert [r['code'] for r in results] == ['ERROR', 'ERROR'] + codes[2:]
+    assert results[0]['desc'] == 'HTTP 400'
+
+
+def test_callback_errors_propagate_from_stream():
+    # Jeder Callback wirft nur beim ersten Element: würde der Fehler im Request
+    # geschluckt, käme der Batch still als ERROR zurück
+    codes = _codes(4)
+
+    for error in (JobCancelled, ValueError):
+        calls = []
+
+        def on_element(position, result):
+            calls.append(position)
+            if len(calls) == 1:
+                raise error()
+
+        client = FakeClient()
+        with pytest.raises(error):
+            make_classifier(client).classify_elements(
+                elements_for(codes), batch_size=2, max_concurrency=1, stream=True, on_element=on_element
+            )
+        assert calls == [0]
+        assert len(client.prompts) == 1
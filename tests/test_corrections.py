@@ -0,0 +1,109 @@
+"""
+Manuelle Korrekturen: nur Katalog-Codes werden angewendet, und Änderungen
+aus anderen Instanzen (andere Seite, anderer Prozess) werden sichtbar,
+auch in den geteilten Few-Shot- und lokalen Indizes.
+"""
+
+from Helpers.ebkp_cache import element_signature
+from Helpers.ebkp_catalog import load_catalog
+from Helpers.ebkp_corrections import CorrectionStore
+from fake_anthropic import FakeClient, make_classifier, elements_for
+
+
+def _codes(n: int):
+    return load_catalog().level_codes(2)[:n]
+
+
+def _classifier(client, tmp_path, **options):
+    return make_classifier(
+        client, use_corrections=True, corrections_path=str(tmp_path / 'corrections.sqlite'), **options
+    )
+
+
+def test_corrections_with_unknown_codes_are_ignored(tmp_path):
+    codes = _codes(2)
+    elements = elements_for(codes)
+    store = CorrectionStore(str(tmp_path / 'corrections.sqlite'), fuzzy_min_ratio=None)
+    store.put_many({
+        element_signature(elements[0]): {'code': codes[1], 'desc': 'korrigiert'},
+        element_signature(elements[1]): {'code': 'Z99', 'desc': 'nicht im Katalog'},
+    })
+
+    client = FakeClient()
+    classifier = _classifier(client, tmp_path)
+    results = classifier.classify_elements(elements, batch_size=2)
+
+    assert [r['code'] for r in results] == [codes[1], codes[1]]
+    assert results[0]['desc'] == 'korrigiert'
+    assert len(client.prompts) == 1 and 'Nr 1' in client.prompts[0] and 'Nr 0' not in client.prompts[0]
+    assert classifier.stats['corrected_elements'] == 1
+    assert [code for _, code in classifier._confirmed_examples()] == [codes[1]]
+
+
+def test_fuzzy_lookup_sees_corrections_from_other_store(tmp_path):
+    path = str(tmp_path / 'corrections.sqlite')
+    reader = CorrectionStore(path)
+    writer = CorrectionStore(path)
+    code = _codes(1)[0]
+
+    assert reader.lookup(['waende|innenwand 120|basic wall|']) == {}  # Index aufgebaut (leer)
+    version = reader.version()
+
+    writer.put_many({'waende|innenwand 100|basic wall|': {'code': code, 'desc': 'korrigiert'}})
+
+    assert reader.version() != version
+    found = reader.lookup(['waende|innenwand 120|basic wall|'])
+    assert found['waende|innenwand 120|basic wall|']['code'] == code
+
+    writer.clear()
+    assert reader.lookup(['waende|innenwand 120|basic wall|']) == {}
+
+
+def test_version_changes_on_own_writes(tmp_path):
+    store = CorrectionStore(str(tmp_path / 'corrections.sqlite'))
+    version = store.version()
+    store.put_many({'waende|a|b|': {'code': _codes(1)[0]}})
+    assert store.version() != version
+    assert store.version() == store.version()
+
+
+def test_indexes_rebuilt_when_corrections_change(tmp_path):
+    classifier = _classifier(FakeClient(), tmp_path)
+    retriever = classifier._few_shot_retriever()
+    local = classifier._local_classifier()
+    assert len(retriever) == 0
+
+    # Unveränderte Korrekturen: Indizes werden wiederverwendet, auch von session() Kopien
+    run = classifier.session()
+    assert run._few_shot_retriever() is retriever
+    assert run._local_classifier() is local
+
+    # Korrektur über einen anderen Speicher (z.B. Seite "BKP Bearbeiten")
+    CorrectionStore(str(tmp_path / 'corrections.sqlite')).put_many(
+        {'waende|innenwand 100|basic wall|': {'code': _codes(1)[0]}}
+    )
+
+    run = classifier.session()
+    assert len(run._few_shot_retriever()) == 1
+    assert run._local_classifier().num_examples == local.num_examples + 1
+    assert classifier._few_shot_retriever() is run._few_shot_retriever()
+
+
+def test_corrections_are_brought_to_target_level(tmp_path):
+    codes = _codes(3)
+    elements = elements_for(codes)
+    catalog = load_catalog()
+    store = CorrectionStore(str(tmp_path / 'corrections.sqlite'), fuzzy_min_ratio=None)
+    store.put_many({
+        element_signature(elements[0]): {'code': 'C02.01', 'desc': 'Level 3'},
+        element_signature(elements[1]): {'code': 'C', 'desc': 'nur Hauptgruppe'},
+        element_signature(elements[2]): {'code': 'C02', 'desc': 'eigene Beschreibung'},
+    })
+
+    client = FakeClient()
+    results = _classifier(client, tmp_path).classify_elements(elements, batch_size=3)
+
+    assert results[0] == {'code': 'C02', 'desc': catalog.description('C02'), 'conf': 1.0}
+    assert results[1]['code'] == codes[1]           # Hauptgruppe → Miss, API-Antwort
+    assert results[2]['desc'] == 'eigene Beschreibung'
+    assert len(client.prompts) == 1 and 'Nr 1' in client.prompts[0] and 'Nr 0' not in client.prompts[0]
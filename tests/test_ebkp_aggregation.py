@@ -0,0 +1,97 @@
+"""
+AggregationCube gegen ein einfaches df.groupby auf einem kleinen DataFrame.
+"""
+
+import numpy as np
+import pandas as pd
+
+from Helpers.ebkp_aggregation import AggregationCube, EBKP_HAUPTGRUPPEN, UNKNOWN
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'BKP_Code': ['C1.1', 'C1.2', 'C1.1', 'D5.1', None, 'C2.1', 'X9', '', 'D5.1', 'C1.1'],
+        'BKP_Beschreibung': ['Wand', 'Decke', 'Wand', 'Lüftung', None, 'Dach', 'Fremd', '', 'Lüftung', 'Wand alt'],
+        'Kosten': [100.0, 200.0, 50.0, 10.0, 5.0, 70.0, 1.0, 2.0, 20.0, 7.0],
+        'Fläche (m²)': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0],
+        'Menge': ['1', '2', 'x', '4', '5', '6', '7', '8', '9', '10'],  # 'x' → 0
+    })
+
+
+def _reference(df: pd.DataFrame) -> pd.DataFrame:
+    """Hierarchie-Spalten zeilenweise, Kennzahlen numerisch (wie die Seite vor dem Würfel)"""
+    def hauptgruppe(code):
+        code = str(code).strip() if isinstance(code, str) else ''
+        return code[0].upper() if code and code[0].upper() in EBKP_HAUPTGRUPPEN else UNKNOWN
+
+    def untergruppe(code):
+        code = str(code).strip() if isinstance(code, str) else ''
+        if not code:
+            return UNKNOWN
+        return code.split('.', 1)[0] if '.' in code else code[:2]
+
+    ref = df.copy()
+    ref['BKP_Hauptgruppe'] = df['BKP_Code'].map(hauptgruppe)
+    ref['BKP_Untergruppe'] = df['BKP_Code'].map(untergruppe)
+    ref['Menge'] = pd.to_numeric(df['Menge'], errors='coerce').fillna(0)
+    return ref
+
+
+MEASURES = ['Kosten', 'Fläche (m²)', 'Menge']
+
+
+def test_totals_and_groups_match_groupby():
+    df = _frame()
+    ref = _reference(df)
+    cube = AggregationCube.build(df)
+
+    assert cube.measures == MEASURES
+    assert cube.totals['Anzahl'] == len(df)
+    for col in MEASURES:
+        assert cube.totals[col] == ref[col].sum()
+
+    expected = ref.groupby('BKP_Hauptgruppe')[MEASURES].sum()
+    expected['Anzahl'] = ref.groupby('BKP_Hauptgruppe').size()
+    actual = cube.hauptgruppen.set_index('BKP_Hauptgruppe')
+    pd.testing.assert_frame_equal(
+        actual[['Anzahl'] + MEASURES], expected[['Anzahl'] + MEASURES], check_dtype=False, check_names=False
+    )
+
+    for hg, hg_ref in ref.groupby('BKP_Hauptgruppe'):
+        expected = hg_ref.groupby('BKP_Untergruppe')[MEASURES].sum()
+        expected['Anzahl'] = hg_ref.groupby('BKP_Untergruppe').size()
+        actual = cube.untergruppen(hg).set_index('BKP_Untergruppe')
+        pd.testing.assert_frame_equal(
+            actual[['Anzahl'] + MEASURES], expected[['Anzahl'] + MEASURES], check_dtype=False, check_names=False
+        )
+
+
+def test_codes_match_groupby():
+    ref = _reference(_frame())
+    cube = AggregationCube.build(_frame())
+
+    # Fehlende Codes (None) bilden eine eigene Zeile in 'Unbekannt'
+    ref['BKP_Code'] = ref['BKP_Code'].fillna('<fehlt>')
+    ref['BKP_Beschreibung'] = ref['BKP_Beschreibung'].fillna('')
+    for (hg, ug), ug_ref in ref.groupby(['BKP_Hauptgruppe', 'BKP_Untergruppe']):
+        expected = ug_ref.groupby(['BKP_Code', 'BKP_Beschreibung'])['Kosten'].agg(['size', 'sum'])
+        actual = cube.codes(hg, ug).fillna({'BKP_Code': '<fehlt>'}).set_index(['BKP_Code', 'BKP_Beschreibung'])
+        assert actual['Anzahl'].to_dict() == expected['size'].to_dict()
+        assert actual['Kosten'].to_dict() == expected['sum'].to_dict()
+
+
+def test_rows_match_boolean_masks():
+    df = _frame()
+    ref = _reference(df)
+    cube = AggregationCube.build(df)
+
+    for (hg, ug), group in ref.groupby(['BKP_Hauptgruppe', 'BKP_Untergruppe']):
+        rows = cube.rows(hg, ug)
+        np.testing.assert_array_equal(rows, np.flatnonzero(ref.index.isin(group.index)))
+        assert df.iloc[rows]['Kosten'].sum() == group['Kosten'].sum()
+
+    for hg, group in ref.groupby('BKP_Hauptgruppe'):
+        np.testing.assert_array_equal(cube.rows(hg), np.flatnonzero(ref.index.isin(group.index)))
+
+    assert cube.rows('E').size == 0 and cube.rows('C', 'C9').size == 0
+    assert sorted(np.concatenate([cube.rows(hg) for hg in ref['BKP_Hauptgruppe'].unique()])) == list(range(len(df)))
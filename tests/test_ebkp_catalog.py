@@ -0,0 +1,47 @@
+"""
+EBKPCatalog.repair: Schreibweise, Kürzen auf das Ziel-Level, Tippfehler mit
+Edit-Distanz 1 und Verweigern bei mehrdeutigen Treffern.
+"""
+
+import pytest
+
+from Helpers.ebkp_catalog import CatalogEntry, EBKPCatalog, load_catalog
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return load_catalog()
+
+
+@pytest.mark.parametrize('raw, level, expected', [
+    ('C02', 2, 'C02'),             # bereits gültig
+    ('C2', 2, 'C02'),              # Null-Auffüllung
+    ('c2', 2, 'C02'),              # Kleinschreibung
+    ('C 02', 2, 'C02'),            # Leerzeichen
+    ('CO2', 2, 'C02'),             # Buchstabe O statt Ziffer 0
+    ('C02.01.001', 2, 'C02'),      # tieferer Code → auf Level 2 gekürzt
+    ('C02.99', 2, 'C02'),          # erfundener Untercode → Elternteil
+    ('C02.01.001', 3, 'C02.01'),   # auf Level 3 gekürzt
+    ('C2.1', 3, 'C02.01'),
+    ('C20', 2, 'C02'),             # Vertauschung, eindeutiger Nachbar
+    ('Z', 2, None),                # nur Hauptgruppe: zu grob
+    ('C06', 2, None),              # Tippfehler mehrdeutig (C01…C05)
+    ('X01', 2, None),              # unbekannte Hauptgruppe
+    ('C02', 3, None),              # zu grob für Level 3
+])
+def test_repair(catalog, raw, level, expected):
+    assert catalog.repair(raw, level=level) == expected
+
+
+def test_repair_leaf_ok_accepts_branch_without_children():
+    catalog = EBKPCatalog([
+        CatalogEntry('C', 'Rohbau', 1, None),
+        CatalogEntry('C01', 'Mit Untercodes', 2, 'C'),
+        CatalogEntry('C01.01', 'Untercode', 3, 'C01'),
+        CatalogEntry('C02', 'Ohne Untercodes', 2, 'C'),
+    ])
+
+    assert catalog.repair('C02', level=3) is None
+    assert catalog.repair('C02', level=3, leaf_ok=True) == 'C02'
+    assert catalog.repair('C01', level=3, leaf_ok=True) is None  # hat Untercodes
+    assert catalog.repair('C1.1', level=3) == 'C01.01'
@@ -0,0 +1,95 @@
+"""
+Antworten parsen und gezielt nachfragen: wohlgeformte Objekte werden auch aus
+kaputten oder abgeschnittenen Antworten über ihre 'id' gerettet, und nur die
+fehlenden IDs gehen in einem zweiten, kleineren Request erneut an die API.
+"""
+
+import json
+
+from Helpers.eBKP_H_Classifier import MAX_REASKS
+from Helpers.ebkp_catalog import load_catalog
+from fake_anthropic import FakeClient, answer, make_classifier, elements_for
+
+
+def _codes(n: int):
+    return load_catalog().level_codes(2)[:n]
+
+
+def _objects(*pairs):
+    return [{'id': number, 'code': code, 'desc': '', 'conf': 0.9} for number, code in pairs]
+
+
+def _parse(text: str, num_elements: int):
+    return make_classifier(FakeClient())._parse_batch_response(text, num_elements)
+
+
+def test_truncated_array_keeps_complete_objects():
+    codes = _codes(3)
+    text = json.dumps(_objects((1, codes[0]), (2, codes[1]), (3, codes[2])))
+    truncated = text[:text.index(codes[2]) + 1]  # mitten im dritten Objekt abgeschnitten
+
+    results = _parse(truncated, 3)
+
+    assert [r and r['code'] for r in results] == [codes[0], codes[1], None]
+
+
+def test_results_assigned_by_id_not_order():
+    codes = _codes(4)
+    text = json.dumps(_objects((3, codes[2]), (1, codes[0]), (3, codes[3]), (9, codes[1])))
+
+    results = _parse(f"```json\n{text}\n```", 4)
+
+    # Doppelte ID: erstes gültiges Objekt gilt; ID ausserhalb des Batches wird ignoriert
+    assert [r and r['code'] for r in results] == [codes[0], None, codes[2], None]
+
+
+def test_invalid_object_does_not_block_duplicate_id():
+    codes = _codes(2)
+    text = json.dumps(_objects((1, 'Z99.99.999'), (1, codes[0]), (2, codes[1])))
+    assert [r['code'] for r in _parse(text, 2)] == codes[:2]
+
+
+def test_only_missing_ids_are_reasked():
+    codes = _codes(5)
+    prompts = []
+
+    def respond(prompt):
+        prompts.append(prompt)
+        if len(prompts) > 1:
+            return answer(prompt)
+        # Erste Antwort: Elemente 1, 3, 5 – davon das letzte abgeschnitten
+        objects = json.loads(answer(prompt))
+        text = json.dumps([objects[0], objects[2], objects[4]])
+        return text[:-20]
+
+    client = FakeClient(respond=respond)
+    classifier = make_classifier(client)
+    results = classifier.classify_elements(elements_for(codes), batch_size=5)
+
+    assert [r['code'] for r in results] == codes
+    assert len(prompts) == 2
+    retry = prompts[1]
+    assert 'Klassifiziere diese 3 Bauelemente' in retry
+    assert [f"Nr {i}" in retry for i in range(5)] == [False, True, False, True, True]
+    assert retry.index('Nr 1') < retry.index('Nr 3') < retry.index('Nr 4')
+    assert classifier.stats['reasked_elements'] == 3
+    assert classifier.stats['missing_elements'] == 0
+
+
+def test_unanswered_elements_become_missing_after_max_reasks():
+    codes = _codes(3)
+
+    def respond(prompt):
+        # Element 'Nr 2' wird nie beantwortet
+        objects = json.loads(answer(prompt))
+        lines = [line for line in prompt.splitlines() if line[:1].isdigit()]
+        return json.dumps([obj for obj, line in zip(objects, lines) if 'Nr 2' not in line])
+
+    client = FakeClient(respond=respond)
+    classifier = make_classifier(client)
+    results = classifier.classify_elements(elements_for(codes), batch_size=3)
+
+    assert [r['code'] for r in results] == codes[:2] + ['MISSING']
+    assert len(client.prompts) == 1 + MAX_REASKS
+    assert all('Klassifiziere diese 1 Bauelemente' in p for p in client.prompts[1:])
+    assert classifier.stats['missing_elements'] == 1
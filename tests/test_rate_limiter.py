@@ -0,0 +1,132 @@
+"""
+RequestScheduler gegen einen Fake-Client mit gescripteten 429-Antworten.
+Zeit läuft über eine Fake-Uhr: sleep() wird aufgezeichnet und schiebt die Uhr vor.
+"""
+
+import random
+
+import pytest
+
+from Helpers import rate_limiter
+from Helpers.rate_limiter import RequestScheduler
+from fake_anthropic import FakeAPIError, FakeClient
+
+PARAMS = {'model': 'test', 'max_tokens': 100, 'messages': [{'role': 'user', 'content': '1. Typ: C01'}]}
+
+
+class FakeClock:
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _scheduler(clock: FakeClock, **options) -> RequestScheduler:
+    return RequestScheduler(sleep=clock.sleep, clock=clock, **options)
+
+
+def _call(scheduler: RequestScheduler, client: FakeClient):
+    return scheduler.call(lambda: client.messages.create(**PARAMS), input_tokens=10, output_tokens=10)
+
+
+def test_retry_after_is_honored():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, base_delay=0.01)
+    client = FakeClient(errors=[FakeAPIError(429, {'retry-after': '5'})])
+
+    response = _call(scheduler, client)
+
+    assert response.content[0].text
+    assert clock.sleeps == [5.0]
+    assert scheduler.stats['retries'] == 1 and scheduler.stats['throttled'] == 1
+
+
+def test_retry_after_ms_takes_precedence():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, base_delay=0.01)
+    client = FakeClient(errors=[FakeAPIError(429, {'retry-after-ms': '1500', 'retry-after': '9'})])
+
+    _call(scheduler, client)
+
+    assert clock.sleeps == [1.5]
+
+
+def test_backoff_grows_exponentially(monkeypatch):
+    # Jitter auf die Obergrenze fixieren: 1, 2, 4, 8 Sekunden
+    monkeypatch.setattr(rate_limiter.random, 'uniform', lambda low, high: high)
+    clock = FakeClock()
+    scheduler = _scheduler(clock, base_delay=1.0, max_delay=60.0)
+    client = FakeClient(errors=[FakeAPIError(503)] * 4)
+
+    _call(scheduler, client)
+
+    assert clock.sleeps == [1.0, 2.0, 4.0, 8.0]
+
+
+def test_backoff_is_jittered_below_the_growing_cap():
+    random.seed(7)
+    clock = FakeClock()
+    scheduler = _scheduler(clock, base_delay=1.0, max_delay=60.0)
+    client = FakeClient(errors=[FakeAPIError(429)] * 6)
+
+    _call(scheduler, client)
+
+    assert len(clock.sleeps) == 6
+    for attempt, delay in enumerate(clock.sleeps):
+        assert 0.0 <= delay <= 2 ** attempt
+    assert clock.sleeps != [2.0 ** attempt for attempt in range(6)]  # nicht deterministisch
+    assert max(clock.sleeps[3:]) > max(clock.sleeps[:2])
+
+
+def test_concurrency_halves_on_429_and_recovers_additively():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, max_concurrency=8, base_delay=0.01)
+    client = FakeClient(errors=[FakeAPIError(429, {'retry-after': '2'})])
+
+    _call(scheduler, client)
+    assert scheduler.concurrency == 4
+    assert scheduler.stats['min_concurrency'] == 4
+
+    # Additiv: nach 'concurrency' Erfolgen in Folge ein Slot mehr
+    history = [scheduler.concurrency]
+    for _ in range(3 + 5 + 6 + 7):
+        _call(scheduler, client)
+        history.append(scheduler.concurrency)
+
+    # Der erfolgreiche Retry zählt bereits als erster Erfolg bei 4
+    assert history[2] == 4 and history[3] == 5
+    assert history[7] == 5 and history[8] == 6   # 5 weitere bei 5
+    assert history[13] == 6 and history[14] == 7
+    assert history[20] == 7 and history[21] == 8
+    assert all(b - a in (0, 1) for a, b in zip(history, history[1:]))
+
+
+def test_raises_after_max_retries():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, max_retries=3, base_delay=0.01)
+    client = FakeClient(errors=[FakeAPIError(429, {'retry-after': '1'})] * 10)
+
+    with pytest.raises(FakeAPIError) as error:
+        _call(scheduler, client)
+
+    assert error.value.status_code == 429
+    assert len(client.prompts) == 4          # 1 Versuch + 3 Retries
+    assert len(clock.sleeps) == 3
+    assert scheduler.stats['retries'] == 3 and scheduler.stats['failed'] == 1
+
+
+def test_non_retryable_error_is_raised_immediately():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    client = FakeClient(errors=[FakeAPIError(400)])
+
+    with pytest.raises(FakeAPIError):
+        _call(scheduler, client)
+
+    assert clock.sleeps == [] and len(client.prompts) == 1